@@ -3,15 +3,23 @@
 analytics.py
 ------------
 Funções de análise financeira: maior rentabilidade, menor rentabilidade (MM3M), maior tendência de crescimento.
+Por padrão usam o fechamento ajustado por proventos e desdobramentos (`ajustado=False` usa o fechamento original).
 """
 
 import datetime
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
 from assets.database import listar_historicos, listar_ativos
 
-def ativo_maior_rentabilidade_12m():
+def _fechamento(h, ajustado: bool):
+    """
+    Fechamento do registro; o ajustado cai no original quando ainda não foi preenchido.
+    """
+    if ajustado and h.preco_fechamento_ajustado is not None:
+        return h.preco_fechamento_ajustado
+    return h.preco_fechamento
+
+def ativo_maior_rentabilidade_12m(ajustado: bool = True):
     """
     Retorna o ativo com maior rentabilidade nos últimos 12 meses.
     Returns:
@@ -27,8 +35,8 @@ def ativo_maior_rentabilidade_12m():
         if len(historicos) < 2:
             continue
         historicos.sort(key=lambda h: h.data)
-        preco_ini = historicos[0].preco_fechamento
-        preco_fim = historicos[-1].preco_fechamento
+        preco_ini = _fechamento(historicos[0], ajustado)
+        preco_fim = _fechamento(historicos[-1], ajustado)
         if preco_ini and preco_fim and preco_ini > 0:
             rent = (preco_fim - preco_ini) / preco_ini
             if rent > melhor_rent:
@@ -36,7 +44,7 @@ def ativo_maior_rentabilidade_12m():
                 melhor_ativo = ativo.ticker
     return melhor_ativo, melhor_rent
 
-def ativo_menor_rentabilidade_mm3m():
+def ativo_menor_rentabilidade_mm3m(ajustado: bool = True):
     """
     Retorna o ativo com menor rentabilidade pela média móvel de 3 meses.
     Returns:
@@ -52,7 +60,7 @@ def ativo_menor_rentabilidade_mm3m():
         if len(historicos) < 2:
             continue
         historicos.sort(key=lambda h: h.data)
-        precos = [h.preco_fechamento for h in historicos]
+        precos = [_fechamento(h, ajustado) for h in historicos]
         mm3 = pd.Series(precos).rolling(window=3).mean().dropna()
         if len(mm3) == 0:
             continue
@@ -62,13 +70,14 @@ def ativo_menor_rentabilidade_mm3m():
             pior_ativo = ativo.ticker
     return pior_ativo, pior_rent
 
-def ativo_maior_tendencia_crescimento_1m():
+def ativo_maior_tendencia_crescimento_1m(ajustado: bool = True):
     """
     Retorna o ativo com maior tendência de crescimento para o próximo mês (regressão linear).
     Returns:
         tuple: (ticker, tendencia)
     """
     """Retorna o ativo com maior tendência de crescimento para o próximo mês (regressão linear)."""
+    from sklearn.linear_model import LinearRegression
     hoje = datetime.date.today()
     tres_meses_atras = hoje - datetime.timedelta(days=90)
     melhor_ativo = None
@@ -79,7 +88,7 @@ def ativo_maior_tendencia_crescimento_1m():
             continue
         historicos.sort(key=lambda h: h.data)
         datas = np.array([(h.data - tres_meses_atras).days for h in historicos]).reshape(-1, 1)
-        precos = np.array([h.preco_fechamento for h in historicos])
+        precos = np.array([_fechamento(h, ajustado) for h in historicos])
         if len(datas) < 2:
             continue
         reg = LinearRegression().fit(datas, precos)
@@ -0,0 +1,261 @@
+"""
+api.py
+------
+API HTTP somente leitura (tornado) com os dados do pipeline, para ferramentas que hoje
+precisariam raspar o dashboard ou abrir o `streamlit_pipeline.db` diretamente.
+
+Endpoints (GET):
+    /api/historico/<ticker>?inicio=AAAA-MM-DD&fim=AAAA-MM-DD   histórico do ativo
+    /api/fechamentos?tickers=A,B&inicio=...&fim=...            matriz de fechamentos (datas comuns)
+    /api/eventos/<ticker>                                      proventos e desdobramentos do ativo
+    /api/precos?tickers=A,B                                    preços atuais
+    /api/destaques                                             destaques do analytics
+    /metrics                                                   métricas do processo (texto Prometheus)
+
+Formato: `?formato=json|arrow|parquet` ou cabeçalho Accept (application/vnd.apache.arrow.stream,
+application/vnd.apache.parquet); o padrão é JSON. O ETag vem da versão dos dados (tabela
+`versoes_dados`), então um If-None-Match válido recebe 304 sem consultar o banco. Respostas
+JSON são comprimidas com gzip; Arrow IPC usa compressão zstd interna e Parquet já é comprimido.
+Histórico e fechamentos aceitam `?ajustado=1` (preços ajustados por proventos e desdobramentos).
+
+Uso:
+    python -m assets.api --porta 8502
+"""
+
+import argparse
+import datetime
+import hashlib
+import io
+import json
+
+import pandas as pd
+import tornado.ioloop
+import tornado.log
+import tornado.web
+
+from assets.data_cache import carregar_analytics, carregar_fechamentos, carregar_historico, carregar_tickers, versoes
+from assets.database import chave_historico, consultar_precos_atuais, criar_banco, listar_eventos_corporativos
+from assets.metrics import metricas
+
+FORMATOS = {
+    'json': 'application/json; charset=UTF-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def _serializar_tabela(df: pd.DataFrame, formato: str) -> bytes:
+    """
+    Serializa o DataFrame no formato pedido (JSON em registros, Arrow IPC stream ou Parquet).
+    """
+    if formato == 'json':
+        if 'Data' in df.columns:
+            df = df.assign(Data=df['Data'].map(lambda d: d.isoformat()))
+        return df.to_json(orient='records', date_format='iso').encode('utf-8')
+    import pyarrow as pa
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    buffer = io.BytesIO()
+    if formato == 'arrow':
+        opcoes = pa.ipc.IpcWriteOptions(compression='zstd')
+        with pa.ipc.new_stream(buffer, tabela.schema, options=opcoes) as escritor:
+            escritor.write_table(tabela)
+    else:
+        import pyarrow.parquet as pq
+        pq.write_table(tabela, buffer, compression='zstd')
+    return buffer.getvalue()
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    """
+    Negociação de formato, ETag pela versão dos dados e erros em JSON.
+    """
+
+    def formato(self) -> str:
+        formato = self.get_query_argument('formato', None)
+        if formato is None:
+            self.add_header('Vary', 'Accept')
+            accept = self.request.headers.get('Accept', '')
+            formato = next((f for f, tipo in FORMATOS.items() if f != 'json' and tipo in accept), 'json')
+        if formato not in FORMATOS:
+            raise tornado.web.HTTPError(400, reason=f"Formato inválido: {formato}")
+        return formato
+
+    def data_argumento(self, nome: str):
+        valor = self.get_query_argument(nome, None)
+        if not valor:
+            return None
+        try:
+            return datetime.date.fromisoformat(valor)
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason=f"Data inválida em '{nome}': {valor}")
+
+    def ajustado_argumento(self) -> bool:
+        return self.get_query_argument('ajustado', '0').lower() in ('1', 'true', 'sim')
+
+    async def tickers_cadastrados(self, versoes_atuais: dict) -> list:
+        # A leitura (cache ou SQLAlchemy) roda no executor para não bloquear o IOLoop
+        return await tornado.ioloop.IOLoop.current().run_in_executor(None, carregar_tickers, versoes_atuais)
+
+    async def tickers_argumento(self, versoes_atuais: dict) -> list:
+        valor = self.get_query_argument('tickers', '')
+        tickers = [t.strip().upper() for t in valor.split(',') if t.strip()]
+        return tickers or await self.tickers_cadastrados(versoes_atuais)
+
+    def verificar_etag(self, *partes) -> bool:
+        """
+        Define o ETag a partir das partes (versões dos dados + parâmetros da consulta).
+        Returns:
+            bool: True se o cliente já tem a versão atual (a resposta 304 já foi preparada).
+        """
+        etag = '"' + hashlib.sha1(repr(partes).encode('utf-8')).hexdigest() + '"'
+        self.set_header('ETag', etag)
+        self.set_header('Cache-Control', 'no-cache')
+        if self.check_etag_header():
+            self.set_status(304)
+            return True
+        return False
+
+    def compute_etag(self):
+        # O ETag é definido pela versão dos dados em verificar_etag (ou, sem versão, pelo corpo)
+        return None if self._headers.get('ETag') else super().compute_etag()
+
+    def responder_tabela(self, df: pd.DataFrame, formato: str) -> None:
+        self.set_header('Content-Type', FORMATOS[formato])
+        self.write(_serializar_tabela(df, formato))
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        self.set_header('Content-Type', FORMATOS['json'])
+        self.finish(json.dumps({'erro': self._reason, 'status': status_code}))
+
+
+def _recortar(df: pd.DataFrame, inicio, fim, coluna: str = None) -> pd.DataFrame:
+    datas = df[coluna] if coluna else df.index.to_series()
+    mascara = pd.Series(True, index=df.index)
+    if inicio:
+        mascara &= datas >= inicio
+    if fim:
+        mascara &= datas <= fim
+    return df[mascara.to_numpy()]
+
+
+class HistoricoHandler(BaseHandler):
+    async def get(self, ticker: str):
+        ticker = ticker.upper()
+        formato = self.formato()
+        inicio, fim = self.data_argumento('inicio'), self.data_argumento('fim')
+        ajustado = self.ajustado_argumento()
+        versoes_atuais = await tornado.ioloop.IOLoop.current().run_in_executor(None, versoes)
+        if ticker not in await self.tickers_cadastrados(versoes_atuais):
+            raise tornado.web.HTTPError(404, reason=f"Ativo não encontrado: {ticker}")
+        if self.verificar_etag('historico', ticker, versoes_atuais.get(chave_historico(ticker), 0), inicio, fim, ajustado, formato):
+            return
+        df = await tornado.ioloop.IOLoop.current().run_in_executor(
+            None, lambda: _recortar(carregar_historico(ticker, None, versoes_atuais, ajustado), inicio, fim, 'Data')
+        )
+        self.responder_tabela(df, formato)
+
+
+class FechamentosHandler(BaseHandler):
+    async def get(self):
+        formato = self.formato()
+        inicio, fim = self.data_argumento('inicio'), self.data_argumento('fim')
+        ajustado = self.ajustado_argumento()
+        versoes_atuais = await tornado.ioloop.IOLoop.current().run_in_executor(None, versoes)
+        tickers = await self.tickers_argumento(versoes_atuais)
+        desconhecidos = sorted(set(tickers) - set(await self.tickers_cadastrados(versoes_atuais)))
+        if desconhecidos:
+            raise tornado.web.HTTPError(404, reason=f"Ativos não encontrados: {', '.join(desconhecidos)}")
+        versao = tuple((t, versoes_atuais.get(chave_historico(t), 0)) for t in tickers)
+        if self.verificar_etag('fechamentos', versao, inicio, fim, ajustado, formato):
+            return
+        df = await tornado.ioloop.IOLoop.current().run_in_executor(
+            None, lambda: _recortar(carregar_fechamentos(tickers, versoes_atuais, ajustado), inicio, fim)
+        )
+        self.responder_tabela(df.rename_axis('Data').reset_index(), formato)
+
+
+class EventosHandler(BaseHandler):
+    async def get(self, ticker: str):
+        ticker = ticker.upper()
+        formato = self.formato()
+        versoes_atuais = await tornado.ioloop.IOLoop.current().run_in_executor(None, versoes)
+        if ticker not in await self.tickers_cadastrados(versoes_atuais):
+            raise tornado.web.HTTPError(404, reason=f"Ativo não encontrado: {ticker}")
+        # Eventos novos sempre incrementam a versão do histórico do ativo
+        if self.verificar_etag('eventos', ticker, versoes_atuais.get(chave_historico(ticker), 0), formato):
+            return
+        df = await tornado.ioloop.IOLoop.current().run_in_executor(None, listar_eventos_corporativos, ticker)
+        self.responder_tabela(df, formato)
+
+
+class PrecosHandler(BaseHandler):
+    async def get(self):
+        # Preços não têm versão própria (mudam a cada ciclo): o ETag é calculado sobre o corpo
+        formato = self.formato()
+        versoes_atuais = await tornado.ioloop.IOLoop.current().run_in_executor(None, versoes)
+        tickers = await self.tickers_argumento(versoes_atuais)
+        precos = await tornado.ioloop.IOLoop.current().run_in_executor(None, consultar_precos_atuais, tickers)
+        df = pd.DataFrame(
+            [{'ticker': t, **p} for t, p in precos.items()],
+            columns=['ticker', 'preco', 'variacao', 'variacao_percentual', 'atualizado_em']
+        )
+        self.responder_tabela(df, formato)
+
+
+class DestaquesHandler(BaseHandler):
+    async def get(self):
+        formato = self.formato()
+        versoes_atuais = await tornado.ioloop.IOLoop.current().run_in_executor(None, versoes)
+        if self.verificar_etag('destaques', versoes_atuais.get('analytics', 0), formato):
+            return
+        destaques = await tornado.ioloop.IOLoop.current().run_in_executor(None, carregar_analytics, versoes_atuais)
+        df = pd.DataFrame(
+            [{'tipo': tipo, **d} for tipo, d in destaques.items()], columns=['tipo', 'ticker', 'valor']
+        )
+        self.responder_tabela(df, formato)
+
+
+class MetricasHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(metricas.texto_prometheus())
+
+
+def _registrar_requisicao(handler: tornado.web.RequestHandler) -> None:
+    """
+    Log de acesso do tornado, registrando também a latência de cada requisição nas métricas.
+    """
+    tornado.log.access_log.info(
+        '%d %s %.2fms', handler.get_status(), handler._request_summary(), 1000.0 * handler.request.request_time()
+    )
+    rota = type(handler).__name__.replace('Handler', '').lower()
+    metricas.observar('api_requisicao', handler.request.request_time(), rota=rota, status=handler.get_status())
+
+
+def criar_app() -> tornado.web.Application:
+    """
+    Cria a aplicação tornado com as rotas da API (respostas comprimidas com gzip).
+    """
+    return tornado.web.Application([
+        (r'/api/historico/([^/]+)', HistoricoHandler),
+        (r'/api/fechamentos', FechamentosHandler),
+        (r'/api/eventos/([^/]+)', EventosHandler),
+        (r'/api/precos', PrecosHandler),
+        (r'/api/destaques', DestaquesHandler),
+        (r'/metrics', MetricasHandler),
+    ], compress_response=True, log_function=_registrar_requisicao)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API somente leitura dos dados do pipeline.")
+    parser.add_argument('--porta', type=int, default=8502)
+    parser.add_argument('--endereco', default='127.0.0.1')
+    args = parser.parse_args()
+    criar_banco()
+    criar_app().listen(args.porta, address=args.endereco)
+    print(f"[api] Servindo em http://{args.endereco}:{args.porta}/api")
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+carteira.py
+-----------
+Análise de risco da carteira (posições da tabela `posicoes`) com operações matriciais sobre a
+matriz de retornos alinhada (datas x ativos), sem laços por ativo, para que a aba continue
+interativa com centenas de posições:
+
+- pesos pelo valor de mercado (quantidade x último fechamento) ou pelos pesos alvo;
+- série de retornos da carteira (R @ w), retorno e volatilidade anualizados;
+- VaR e CVaR de 1 dia, históricos (quantil da série) e paramétricos (normal);
+- beta da carteira e de cada ativo em relação a um ativo de referência;
+- contribuição de cada ativo para o risco: w_i * (Σw)_i / σ, que soma a volatilidade da carteira.
+
+O resultado é guardado no cache compartilhado pela versão das posições e dos históricos
+(ver `data_cache.carregar_analise_carteira`).
+"""
+
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from assets.metrics import cronometrado
+
+DIAS_UTEIS_ANO = 252
+NIVEIS_CONFIANCA = (0.95, 0.99)
+ORIGENS_PESO = {'valor': "Valor de mercado (quantidades)", 'alvo': "Pesos alvo"}
+# Ativo de referência padrão do beta (se estiver cadastrado)
+REFERENCIA_PADRAO = os.environ.get('CARTEIRA_REFERENCIA', '^BVSP')
+COLUNAS_CONTRIBUICAO = ['Ticker', 'Peso', 'Volatilidade', 'Beta', 'Contribuição', 'Contribuição (%)']
+
+
+def pesos_carteira(posicoes: pd.DataFrame, ultimos_precos: pd.Series, origem: str = 'valor') -> pd.Series:
+    """
+    Pesos normalizados da carteira (somam 1).
+    Args:
+        posicoes (pd.DataFrame): Colunas Ticker, Quantidade e Peso alvo (ver `database.listar_posicoes`).
+        ultimos_precos (pd.Series): Último fechamento por ticker.
+        origem (str): 'valor' (quantidade x preço) ou 'alvo' (pesos alvo informados).
+    Returns:
+        pd.Series: Peso por ticker (apenas posições com peso positivo); vazia se não houver nenhuma.
+    """
+    posicoes = posicoes.set_index('Ticker')
+    if origem == 'alvo':
+        brutos = posicoes['Peso alvo']
+    else:
+        brutos = posicoes['Quantidade'] * ultimos_precos.reindex(posicoes.index)
+    brutos = pd.to_numeric(brutos, errors='coerce').dropna()
+    brutos = brutos[brutos > 0]
+    if brutos.empty:
+        return brutos.astype(float)
+    return brutos / brutos.sum()
+
+
+def _var_cvar_historico(serie: np.ndarray, nivel: float) -> tuple:
+    var = -np.quantile(serie, 1 - nivel)
+    cauda = serie[serie <= -var]
+    return float(var), float(-cauda.mean()) if len(cauda) else float(var)
+
+
+def _var_cvar_parametrico(media: float, desvio: float, nivel: float) -> tuple:
+    normal = NormalDist()
+    z = normal.inv_cdf(1 - nivel)
+    return float(-(media + z * desvio)), float(-(media - desvio * normal.pdf(z) / (1 - nivel)))
+
+
+@cronometrado('carteira_analise')
+def analisar_carteira(fechamentos: pd.DataFrame, pesos: pd.Series, referencia: pd.Series = None, nivel: float = 0.95) -> dict:
+    """
+    Calcula as métricas de risco da carteira sobre a matriz de fechamentos alinhada.
+    Args:
+        fechamentos (pd.DataFrame): Índice data, uma coluna de fechamento por ticker (datas comuns).
+        pesos (pd.Series): Peso por ticker (ver `pesos_carteira`); tickers sem fechamento são ignorados.
+        referencia (pd.Series, opcional): Fechamentos do ativo de referência para o beta (índice data).
+        nivel (float): Nível de confiança do VaR/CVaR.
+    Returns:
+        dict: 'retornos' (pd.Series diária da carteira), 'retorno_referencia' (pd.Series ou None),
+        'retorno_anual', 'volatilidade_anual', 'var_historico', 'cvar_historico', 'var_parametrico',
+        'cvar_parametrico' (perdas de 1 dia, fração do valor da carteira), 'beta', 'nivel', 'dias',
+        'ativos' e 'contribuicoes' (DataFrame com COLUNAS_CONTRIBUICAO); None se não houver dados.
+    """
+    tickers = [t for t in fechamentos.columns if t in pesos.index]
+    if not tickers or len(fechamentos) < 3:
+        return None
+    precos = fechamentos[tickers].to_numpy(dtype=float)
+    retornos = precos[1:] / precos[:-1] - 1.0
+    datas = fechamentos.index[1:]
+    # Pesos renormalizados sobre os ativos com histórico
+    w = pesos.reindex(tickers).to_numpy(dtype=float)
+    w = w / w.sum()
+
+    serie = retornos @ w
+    centrados = retornos - retornos.mean(axis=0)
+    covariancia = centrados.T @ centrados / (len(retornos) - 1)
+    cov_w = covariancia @ w
+    volatilidade = float(np.sqrt(w @ cov_w))
+    contribuicao = w * cov_w / volatilidade if volatilidade > 0 else np.zeros_like(w)
+
+    media, desvio = float(serie.mean()), float(serie.std(ddof=1))
+    var_hist, cvar_hist = _var_cvar_historico(serie, nivel)
+    var_param, cvar_param = _var_cvar_parametrico(media, desvio, nivel)
+
+    beta, betas, retorno_referencia = None, np.full(len(tickers), np.nan), None
+    if referencia is not None and not referencia.empty:
+        retorno_referencia = referencia.sort_index().pct_change().reindex(datas)
+        validos = retorno_referencia.notna().to_numpy()
+        if validos.sum() > 2:
+            ref = retorno_referencia.to_numpy()[validos]
+            ref = ref - ref.mean()
+            variancia_ref = ref @ ref
+            if variancia_ref > 0:
+                # Beta de todos os ativos de uma vez: cov(R_i, ref) / var(ref)
+                sub = retornos[validos]
+                betas = (sub - sub.mean(axis=0)).T @ ref / variancia_ref
+                beta = float(w @ betas)
+
+    anual = np.sqrt(DIAS_UTEIS_ANO)
+    contribuicoes = pd.DataFrame({
+        'Ticker': tickers,
+        'Peso': w,
+        'Volatilidade': np.sqrt(np.diag(covariancia)) * anual,
+        'Beta': betas,
+        'Contribuição': contribuicao * anual,
+        'Contribuição (%)': contribuicao / volatilidade if volatilidade > 0 else contribuicao,
+    }).sort_values('Contribuição', ascending=False, ignore_index=True)
+    return {
+        'retornos': pd.Series(serie, index=datas, name='Carteira'),
+        'retorno_referencia': retorno_referencia,
+        'retorno_anual': float((1 + serie).prod() ** (DIAS_UTEIS_ANO / len(serie)) - 1),
+        'volatilidade_anual': volatilidade * anual,
+        'var_historico': var_hist,
+        'cvar_historico': cvar_hist,
+        'var_parametrico': var_param,
+        'cvar_parametrico': cvar_param,
+        'beta': beta,
+        'nivel': nivel,
+        'dias': len(serie),
+        'ativos': len(tickers),
+        'contribuicoes': contribuicoes,
+    }
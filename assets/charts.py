@@ -0,0 +1,226 @@
+"""
+charts.py
+---------
+Construção das figuras Plotly do dashboard, uma função por aba.
+Cada função recebe o DataFrame de histórico (Data, Abertura, Fechamento, Máximo, Mínimo, Volume)
+e calcula apenas o que a sua aba exibe, para que o app só execute o trabalho da aba selecionada.
+As séries temporais são reduzidas no servidor (mínimo/máximo por bucket) para a largura do gráfico
+em pixels e usam WebGL (Scattergl) acima de LIMIAR_WEBGL pontos; `intervalo` recorta a série ao
+trecho visível (zoom), que então é exibido com mais detalhe.
+"""
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+MARGEM = dict(l=10, r=10, t=30, b=10)
+
+# Largura padrão do gráfico (px): cada série é reduzida a no máximo 2 pontos por pixel
+LARGURA_PADRAO = 1200
+# Acima deste número de pontos (antes da redução) as linhas usam WebGL
+LIMIAR_WEBGL = 1000
+
+
+def reduzir_pontos(x, y, max_pontos: int):
+    """
+    Reduz a série para no máximo `max_pontos` mantendo o mínimo e o máximo de cada bucket,
+    preservando picos, vales e a ordem dos pontos. Buckets só com NaN mantêm um ponto NaN (lacuna).
+    Returns:
+        tuple: (x reduzido, y reduzido) como arrays numpy.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_pontos or max_pontos < 2:
+        return x, y
+    n_buckets = max_pontos // 2
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.linspace(0, n, n_buckets + 1).astype(int)))
+    nan = np.isnan(y)
+    # Primeiro índice de cada bucket na ordenação (bucket, valor) = mínimo; com -valor = máximo
+    ordem_min = np.lexsort((np.where(nan, np.inf, y), bucket))
+    ordem_max = np.lexsort((np.where(nan, np.inf, -y), bucket))
+    primeiros = np.r_[0, np.flatnonzero(np.diff(bucket[ordem_min])) + 1]
+    indices = np.union1d(ordem_min[primeiros], ordem_max[primeiros])
+    return x[indices], y[indices]
+
+
+def _mascara(df: pd.DataFrame, intervalo) -> np.ndarray:
+    """
+    Máscara booleana das linhas dentro do intervalo (data_inicial, data_final); None = tudo.
+    """
+    if intervalo is None:
+        return np.ones(len(df), dtype=bool)
+    inicio, fim = intervalo
+    datas = df["Data"]
+    return ((datas >= inicio) & (datas <= fim)).to_numpy()
+
+
+def _linha(x, y, nome: str, cor: str, mascara: np.ndarray, largura_px: int):
+    """
+    Trace de linha recortado ao intervalo visível, reduzido à largura do gráfico e em WebGL se for longo.
+    """
+    x = np.asarray(x)[mascara]
+    y = np.asarray(y, dtype=float)[mascara]
+    total = len(y)
+    x, y = reduzir_pontos(x, y, 2 * largura_px)
+    classe = go.Scattergl if total > LIMIAR_WEBGL else go.Scatter
+    return classe(x=x, y=y, mode="lines", name=nome, line=dict(color=cor))
+
+
+# Abas de preço: rótulo -> (coluna, título, cor)
+ABAS_PRECO = {
+    "📈 Abertura": ("Abertura", "Preço de Abertura", "#0a3d62"),
+    "📉 Fechamento": ("Fechamento", "Preço de Fechamento", "#27ae60"),
+    "🔼 Máximo": ("Máximo", "Preço Máximo", "#e67e22"),
+    "🔽 Mínimo": ("Mínimo", "Preço Mínimo", "#c0392b"),
+    "📊 Volume": ("Volume", "Volume", "#0a3d62"),
+}
+
+ABAS_AVANCADAS = [
+    "Retorno Acumulado",
+    "Volatilidade",
+    "Drawdown",
+    "Médias Móveis",
+    "RSI & MACD",
+    "Correlação",
+    "Heatmap Retornos",
+    "Carteira",
+]
+
+
+def figura_preco(df: pd.DataFrame, aba: str, intervalo=None, largura_px: int = LARGURA_PADRAO) -> go.Figure:
+    """
+    Figura da aba de preço/volume informada (chave de ABAS_PRECO).
+    """
+    coluna, _, cor = ABAS_PRECO[aba]
+    mascara = _mascara(df, intervalo)
+    fig = go.Figure()
+    if coluna == "Volume":
+        # Barras: um valor (máximo) por pixel
+        x, y = np.asarray(df["Data"])[mascara], np.asarray(df["Volume"], dtype=float)[mascara]
+        if len(y) > largura_px:
+            buckets = np.linspace(0, len(y), largura_px + 1).astype(int)[:-1]
+            x, y = x[buckets], np.fmax.reduceat(np.nan_to_num(y, nan=0.0), buckets)
+        fig.add_trace(go.Bar(x=x, y=y, name="Volume", marker_color=cor))
+        fig.update_layout(xaxis_title="Data", yaxis_title="Volume", margin=MARGEM)
+    else:
+        fig.add_trace(_linha(df["Data"], df[coluna], coluna, cor, mascara, largura_px))
+        fig.update_layout(xaxis_title="Data", yaxis_title="Preço", margin=MARGEM)
+    return fig
+
+
+def figura_retorno_acumulado(df: pd.DataFrame, intervalo=None, largura_px: int = LARGURA_PADRAO) -> go.Figure:
+    retorno = df["Fechamento"].pct_change()
+    retorno_acumulado = (1 + retorno).cumprod() - 1
+    fig = go.Figure()
+    fig.add_trace(_linha(df["Data"], retorno_acumulado*100, "Retorno Acumulado", "#0a3d62", _mascara(df, intervalo), largura_px))
+    fig.update_layout(xaxis_title="Data", yaxis_title="% Acumulado", margin=MARGEM)
+    return fig
+
+
+def figura_volatilidade(df: pd.DataFrame, intervalo=None, largura_px: int = LARGURA_PADRAO) -> go.Figure:
+    # Volatilidade (rolling std 21d, anualizada)
+    volatilidade = df["Fechamento"].pct_change().rolling(window=21).std() * (252**0.5)
+    fig = go.Figure()
+    fig.add_trace(_linha(df["Data"], volatilidade*100, "Volatilidade 21d", "#e67e22", _mascara(df, intervalo), largura_px))
+    fig.update_layout(xaxis_title="Data", yaxis_title="Volatilidade (%)", margin=MARGEM)
+    return fig
+
+
+def figura_drawdown(df: pd.DataFrame, intervalo=None, largura_px: int = LARGURA_PADRAO) -> go.Figure:
+    acum = (1 + df["Fechamento"].pct_change()).cumprod()
+    drawdown = acum / acum.cummax() - 1
+    fig = go.Figure()
+    fig.add_trace(_linha(df["Data"], drawdown*100, "Drawdown", "#c0392b", _mascara(df, intervalo), largura_px))
+    fig.update_layout(xaxis_title="Data", yaxis_title="Drawdown (%)", margin=MARGEM)
+    return fig
+
+
+def figura_medias_moveis(df: pd.DataFrame, intervalo=None, largura_px: int = LARGURA_PADRAO) -> go.Figure:
+    mm_curta = df["Fechamento"].rolling(window=21).mean()
+    mm_longa = df["Fechamento"].rolling(window=63).mean()
+    mascara = _mascara(df, intervalo)
+    fig = go.Figure()
+    fig.add_trace(_linha(df["Data"], df["Fechamento"], "Fechamento", "#888", mascara, largura_px))
+    fig.add_trace(_linha(df["Data"], mm_curta, "MM 21d", "#27ae60", mascara, largura_px))
+    fig.add_trace(_linha(df["Data"], mm_longa, "MM 63d", "#0a3d62", mascara, largura_px))
+    fig.update_layout(xaxis_title="Data", yaxis_title="Preço", margin=MARGEM)
+    return fig
+
+
+def figuras_rsi_macd(df: pd.DataFrame, intervalo=None, largura_px: int = LARGURA_PADRAO) -> tuple:
+    """
+    Retorna (fig_rsi, fig_macd).
+    """
+    # RSI
+    delta = df["Fechamento"].diff()
+    up = delta.clip(lower=0)
+    down = -delta.clip(upper=0)
+    roll_up = up.rolling(14).mean()
+    roll_down = down.rolling(14).mean()
+    rs = roll_up / roll_down
+    rsi = 100 - (100 / (1 + rs))
+    # MACD
+    ema12 = df["Fechamento"].ewm(span=12, adjust=False).mean()
+    ema26 = df["Fechamento"].ewm(span=26, adjust=False).mean()
+    macd = ema12 - ema26
+    signal = macd.ewm(span=9, adjust=False).mean()
+    mascara = _mascara(df, intervalo)
+    fig_rsi = go.Figure()
+    fig_rsi.add_trace(_linha(df["Data"], rsi, "RSI", "#e67e22", mascara, largura_px))
+    fig_rsi.update_layout(xaxis_title="Data", yaxis_title="RSI", margin=MARGEM, yaxis=dict(range=[0,100]))
+    fig_macd = go.Figure()
+    fig_macd.add_trace(_linha(df["Data"], macd, "MACD", "#0a3d62", mascara, largura_px))
+    fig_macd.add_trace(_linha(df["Data"], signal, "Signal", "#c0392b", mascara, largura_px))
+    fig_macd.update_layout(xaxis_title="Data", yaxis_title="MACD", margin=MARGEM)
+    return fig_rsi, fig_macd
+
+
+def figura_correlacao(df_fechamentos: pd.DataFrame) -> go.Figure:
+    """
+    Heatmap anotado da correlação dos retornos (recebe a matriz de fechamentos por ticker).
+    """
+    import plotly.figure_factory as ff
+    corr = df_fechamentos.pct_change().dropna().corr()
+    return ff.create_annotated_heatmap(z=corr.values, x=list(corr.columns), y=list(corr.index), colorscale="blues", showscale=True)
+
+
+def figura_heatmap_mensal(df: pd.DataFrame, intervalo=None) -> go.Figure:
+    import plotly.express as px
+    df = df.loc[_mascara(df, intervalo), ["Data", "Fechamento"]].copy()
+    df["Ano"] = df["Data"].apply(lambda x: x.year)
+    df["Mes"] = df["Data"].apply(lambda x: x.month)
+    df["Retorno Mensal"] = df.groupby(["Ano", "Mes"])["Fechamento"].transform(lambda x: x.iloc[-1] / x.iloc[0] - 1)
+    pivot = df.drop_duplicates(["Ano", "Mes"])[["Ano", "Mes", "Retorno Mensal"]].pivot(index="Ano", columns="Mes", values="Retorno Mensal")
+    fig = px.imshow(pivot*100, labels=dict(x="Mês", y="Ano", color="Retorno (%)"), x=[str(m) for m in pivot.columns], y=[str(a) for a in pivot.index], color_continuous_scale="RdYlGn", aspect="auto", text_auto=True)
+    fig.update_layout(margin=MARGEM)
+    return fig
+
+
+def figura_carteira(analise: dict, referencia: str = None, largura_px: int = LARGURA_PADRAO) -> go.Figure:
+    """
+    Retorno acumulado da carteira e, se houver, do ativo de referência (recebe o resultado de
+    `carteira.analisar_carteira`).
+    """
+    retornos = analise["retornos"]
+    mascara = np.ones(len(retornos), dtype=bool)
+    fig = go.Figure()
+    fig.add_trace(_linha(retornos.index, ((1 + retornos).cumprod() - 1) * 100, "Carteira", "#0a3d62", mascara, largura_px))
+    if analise.get("retorno_referencia") is not None:
+        acumulado = (1 + analise["retorno_referencia"].fillna(0)).cumprod() - 1
+        fig.add_trace(_linha(retornos.index, acumulado * 100, referencia or "Referência", "#888", mascara, largura_px))
+    fig.update_layout(xaxis_title="Data", yaxis_title="% Acumulado", margin=MARGEM)
+    return fig
+
+
+def figura_contribuicao_risco(analise: dict, maximo: int = 30) -> go.Figure:
+    """
+    Barras da contribuição dos ativos para a volatilidade da carteira (os `maximo` maiores).
+    """
+    contribuicoes = analise["contribuicoes"].head(maximo)
+    fig = go.Figure(go.Bar(
+        x=contribuicoes["Ticker"], y=contribuicoes["Contribuição (%)"] * 100,
+        marker_color=np.where(contribuicoes["Contribuição (%)"] >= 0, "#c0392b", "#27ae60"),
+    ))
+    fig.update_layout(xaxis_title="Ativo", yaxis_title="Contribuição para o risco (%)", margin=MARGEM)
+    return fig
@@ -0,0 +1,189 @@
+"""
+data_cache.py
+-------------
+Cache de leituras do dashboard, compartilhado entre as sessões do processo.
+As entradas são indexadas por (consulta, parâmetros, versão dos dados); como a ingestão
+incrementa a versão (tabela `versoes_dados`), nada desatualizado é servido e o SQLite só é
+consultado quando os dados mudaram. Os valores ficam serializados (pickle) e o cache é
+limitado em bytes, com descarte LRU.
+"""
+
+import collections
+import datetime
+import pickle
+import threading
+
+import pandas as pd
+
+from assets.carteira import analisar_carteira, pesos_carteira
+from assets.database import (
+    chave_historico, consultar_analytics_cache, consultar_versoes, fechamentos_dataframe, historico_dataframe,
+    listar_ativos, listar_posicoes)
+
+
+class CacheSerializado:
+    """
+    Cache LRU de valores serializados, limitado pelo total de bytes armazenados.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, carregar):
+        """
+        Retorna o valor da chave, chamando `carregar()` e armazenando o resultado em caso de falta.
+        """
+        with self._lock:
+            dados = self._itens.get(chave)
+            if dados is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+        if dados is not None:
+            return pickle.loads(dados)
+        valor = carregar()
+        dados = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.falhas += 1
+            if len(dados) <= self.max_bytes:
+                anterior = self._itens.pop(chave, None)
+                if anterior is not None:
+                    self.bytes -= len(anterior)
+                self._itens[chave] = dados
+                self.bytes += len(dados)
+                while self.bytes > self.max_bytes:
+                    _, removido = self._itens.popitem(last=False)
+                    self.bytes -= len(removido)
+        return valor
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                'entradas': len(self._itens),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+            }
+
+
+# Cache compartilhado pelo processo
+cache_dados = CacheSerializado()
+
+
+def versoes() -> dict:
+    """
+    Retorna as versões atuais dos dados (uma consulta pequena por chamada).
+    """
+    return consultar_versoes()
+
+
+def carregar_tickers(versoes_atuais: dict = None) -> list:
+    """
+    Lista os tickers cadastrados.
+    """
+    versoes_atuais = versoes() if versoes_atuais is None else versoes_atuais
+    chave = ('tickers', versoes_atuais.get('ativos', 0))
+    return cache_dados.obter(chave, lambda: [a.ticker for a in listar_ativos()])
+
+
+def carregar_historico(ticker: str, dias: int = None, versoes_atuais: dict = None, ajustado: bool = False) -> pd.DataFrame:
+    """
+    Histórico do ativo como DataFrame (Data, Abertura, Fechamento, Máximo, Mínimo, Volume).
+    Args:
+        ticker (str): Código do ativo.
+        dias (int, opcional): Janela em dias a partir de hoje (None = todo o histórico).
+        ajustado (bool): Preços ajustados por proventos e desdobramentos.
+    """
+    versoes_atuais = versoes() if versoes_atuais is None else versoes_atuais
+    hoje = datetime.date.today()
+    data_inicio = hoje - datetime.timedelta(days=dias) if dias else None
+    chave = ('historico', ticker, data_inicio, ajustado, versoes_atuais.get(chave_historico(ticker), 0))
+    return cache_dados.obter(chave, lambda: historico_dataframe(ticker, data_inicio, ajustado))
+
+
+def carregar_fechamentos(tickers: list, versoes_atuais: dict = None, ajustado: bool = False) -> pd.DataFrame:
+    """
+    Matriz de fechamentos (índice: data, colunas: tickers) com as datas comuns a todos os ativos.
+    """
+    versoes_atuais = versoes() if versoes_atuais is None else versoes_atuais
+    chave = ('fechamentos', ajustado, tuple((t, versoes_atuais.get(chave_historico(t), 0)) for t in tickers))
+    # Uma única consulta para todos os ativos (com centenas de ativos, uma leitura por ativo domina o tempo)
+    return cache_dados.obter(chave, lambda: fechamentos_dataframe(tickers, ajustado))
+
+
+def carregar_analytics(versoes_atuais: dict = None) -> dict:
+    """
+    Destaques do analytics cache.
+    Returns:
+        dict: {tipo: {'ticker': str|None, 'valor': float|None}}
+    """
+    versoes_atuais = versoes() if versoes_atuais is None else versoes_atuais
+    chave = ('analytics', versoes_atuais.get('analytics', 0))
+    return cache_dados.obter(
+        chave, lambda: {a.tipo: {'ticker': a.ticker, 'valor': a.valor} for a in consultar_analytics_cache()}
+    )
+
+
+def carregar_posicoes(versoes_atuais: dict = None) -> pd.DataFrame:
+    """
+    Posições da carteira (Ticker, Quantidade, Peso alvo).
+    """
+    versoes_atuais = versoes() if versoes_atuais is None else versoes_atuais
+    chave = ('posicoes', versoes_atuais.get('posicoes', 0))
+    return cache_dados.obter(chave, listar_posicoes)
+
+
+def carregar_analise_carteira(versoes_atuais: dict = None, origem: str = 'valor', referencia: str = None,
+                              nivel: float = 0.95, dias: int = None, ajustado: bool = True) -> dict:
+    """
+    Análise de risco da carteira (ver `carteira.analisar_carteira`), recalculada apenas quando as
+    posições, os históricos dos ativos da carteira ou o da referência mudam.
+    Args:
+        origem (str): Origem dos pesos ('valor' ou 'alvo').
+        referencia (str, opcional): Ticker de referência para o beta.
+        nivel (float): Nível de confiança do VaR/CVaR.
+        dias (int, opcional): Janela em dias a partir de hoje (None = todo o histórico comum).
+        ajustado (bool): Retornos sobre preços ajustados por proventos e desdobramentos.
+    Returns:
+        dict ou None: Resultado de `analisar_carteira`, com 'pesos' (pd.Series) e 'inicio' (data inicial).
+    """
+    versoes_atuais = versoes() if versoes_atuais is None else versoes_atuais
+    posicoes = carregar_posicoes(versoes_atuais)
+    tickers = posicoes['Ticker'].tolist()
+    data_inicio = datetime.date.today() - datetime.timedelta(days=dias) if dias else None
+    chave = (
+        'analise_carteira', versoes_atuais.get('posicoes', 0), origem, referencia, nivel, data_inicio, ajustado,
+        tuple(versoes_atuais.get(chave_historico(t), 0) for t in tickers),
+        versoes_atuais.get(chave_historico(referencia), 0) if referencia else None,
+    )
+
+    def carregar():
+        if not tickers:
+            return None
+        fechamentos = carregar_fechamentos(tickers, versoes_atuais, ajustado)
+        if fechamentos.empty:
+            return None
+        pesos = pesos_carteira(posicoes, fechamentos.iloc[-1], origem)
+        if data_inicio is not None:
+            fechamentos = fechamentos[fechamentos.index >= data_inicio]
+        serie_referencia = None
+        if referencia:
+            hist = carregar_historico(referencia, dias, versoes_atuais, ajustado)
+            serie_referencia = hist.set_index('Data')['Fechamento'] if not hist.empty else None
+        resultado = analisar_carteira(fechamentos, pesos, serie_referencia, nivel) if not pesos.empty else None
+        if resultado is not None:
+            resultado['pesos'] = pesos
+            resultado['inicio'] = fechamentos.index[0]
+        return resultado
+
+    return cache_dados.obter(chave, carregar)
@@ -6,20 +6,78 @@ Módulo de persistência e consulta ao banco de dados para ativos, históricos,
 """
 
 import datetime
-from sqlalchemy import create_engine
+import json
+import threading
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
-from assets.models import Base, Ativo, Historico, PrecoAtual
+import pandas as pd
+from sqlalchemy import select, delete, insert, update, func
+from assets.models import Base, Ativo, Historico, EventoCorporativo, PrecoAtual, CotacaoIntraday, BarraIntraday, Posicao, VersaoDados, Job, Concessao
+from assets.metrics import cronometrado
 
 DATABASE_URL = 'sqlite:///streamlit_pipeline.db'
 engine = create_engine(DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(bind=engine)
 
+# === Token de cerca ===
+class ConcessaoPerdida(Exception):
+    """
+    Escrita de um processo que já não detém a concessão de liderança (token de cerca desatualizado).
+    """
+
+# (nome da concessão, token) do processo líder; definido por assets.lideranca ao assumir
+_cerca = None
+
+def definir_cerca(nome: str, token: int) -> None:
+    """
+    Passa a exigir, nas escritas dos serviços de background, que a concessão `nome` ainda tenha o `token`.
+    """
+    global _cerca
+    _cerca = (nome, token)
+
+def verificar_cerca(session) -> None:
+    """
+    Verifica o token de cerca dentro da transação, depois das escritas e antes do commit (no SQLite
+    a transação já detém o bloqueio de escrita, então nenhuma nova aquisição pode ocorrer até o commit).
+    Sem cerca definida (processo que nunca foi líder), não faz nada.
+    Raises:
+        ConcessaoPerdida: Se outro processo adquiriu a concessão.
+    """
+    if _cerca is None:
+        return
+    nome, token = _cerca
+    atual = session.execute(select(Concessao.token).where(Concessao.nome == nome)).scalar()
+    if atual != token:
+        raise ConcessaoPerdida(f"Concessão '{nome}' com token {atual}, este processo tem {token}.")
+
+@cronometrado('banco')
 def criar_banco():
     """
-    Cria as tabelas do banco de dados, se não existirem.
+    Cria as tabelas do banco de dados, se não existirem, e adiciona as colunas novas a tabelas antigas.
     """
     Base.metadata.create_all(engine)
+    _migrar_colunas()
+
+def _migrar_colunas() -> None:
+    """
+    `create_all` não altera tabelas existentes: colunas adicionadas depois são criadas aqui.
+    """
+    colunas = {c['name'] for c in inspect(engine).get_columns('historicos')}
+    if 'preco_fechamento_ajustado' not in colunas:
+        with engine.begin() as conn:
+            conn.execute(text('ALTER TABLE historicos ADD COLUMN preco_fechamento_ajustado FLOAT'))
+            # Sem eventos conhecidos, o fechamento ajustado parte do fechamento
+            conn.execute(text('UPDATE historicos SET preco_fechamento_ajustado = preco_fechamento'))
+        print("[criar_banco] Coluna historicos.preco_fechamento_ajustado adicionada.")
+    colunas = {c['name'] for c in inspect(engine).get_columns('barras_intraday')}
+    for coluna in ('primeiro_em', 'ultimo_em'):
+        if coluna not in colunas:
+            # Barras antigas ficam com nulo (ver assets.intraday._momentos_reais)
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE barras_intraday ADD COLUMN {coluna} DATETIME'))
+            print(f"[criar_banco] Coluna barras_intraday.{coluna} adicionada.")
 
+@cronometrado('banco')
 def inserir_ativo(ticker: str):
     """
     Insere um novo ativo no banco, se não existir.
@@ -32,8 +90,31 @@ def inserir_ativo(ticker: str):
         ativo = Ativo(ticker=ticker)
         session.add(ativo)
         session.commit()
+        incrementar_versao('ativos')
     session.close()
 
+@cronometrado('banco')
+def inserir_ativos(tickers: list) -> list:
+    """
+    Insere vários ativos em uma única transação, ignorando os já cadastrados.
+    Args:
+        tickers (list): Códigos dos ativos.
+    Returns:
+        list: Tickers efetivamente inseridos.
+    """
+    session = SessionLocal()
+    try:
+        existentes = set(session.execute(select(Ativo.ticker).where(Ativo.ticker.in_(tickers))).scalars())
+        novos = [t for t in dict.fromkeys(tickers) if t not in existentes]
+        session.add_all([Ativo(ticker=t) for t in novos])
+        session.commit()
+    finally:
+        session.close()
+    if novos:
+        incrementar_versao('ativos')
+    return novos
+
+@cronometrado('banco')
 def listar_ativos():
     """
     Lista todos os ativos cadastrados.
@@ -45,9 +126,13 @@ def listar_ativos():
     session.close()
     return ativos
 
-def inserir_historico(ticker: str, data: datetime.date, preco_abertura: float, preco_fechamento: float, maximo: float, minimo: float, volume: float):
+@cronometrado('banco')
+def inserir_historico(ticker: str, data: datetime.date, preco_abertura: float, preco_fechamento: float, maximo: float, minimo: float, volume: float, incrementar: bool = True):
     """
     Insere um novo histórico de preço para um ativo.
+    Args:
+        incrementar (bool): Incrementa a versão do histórico do ativo. Ingestões em lote passam False
+            e chamam `incrementar_versao(chave_historico(ticker))` uma vez ao final.
     """
     session = SessionLocal()
     ativo = session.query(Ativo).filter_by(ticker=ticker).first()
@@ -77,7 +162,179 @@ def inserir_historico(ticker: str, data: datetime.date, preco_abertura: float, p
         historico_existente.volume = volume
         session.commit()
     session.close()
+    if incrementar:
+        incrementar_versao(chave_historico(ticker))
+
+@cronometrado('banco')
+def salvar_historicos(ticker: str, df: pd.DataFrame, eventos: pd.DataFrame = None) -> dict:
+    """
+    Grava o histórico normalizado (ver assets.ingestao.normalizar_historico) em uma única transação:
+    datas novas em um INSERT em lote, datas existentes em um UPDATE em lote pela chave primária.
+    Eventos corporativos ainda não registrados são gravados e aplicados às linhas anteriores à
+    coleta (ver `_aplicar_eventos`). Incrementa a versão do histórico do ativo uma vez.
+    Tickers não cadastrados são ignorados: um ativo removido durante um backfill não volta ao banco.
+    Args:
+        ticker (str): Código do ativo.
+        df (pd.DataFrame): Colunas data, preco_abertura, preco_fechamento, preco_fechamento_ajustado,
+            maximo, minimo, volume.
+        eventos (pd.DataFrame, opcional): Colunas data, tipo, valor (ver assets.ingestao.normalizar_eventos).
+    Returns:
+        dict: {'inseridos': int, 'atualizados': int, 'eventos': int}
+    """
+    if df.empty:
+        return {'inseridos': 0, 'atualizados': 0, 'eventos': 0}
+    session = SessionLocal()
+    try:
+        ativo = session.query(Ativo).filter_by(ticker=ticker).first()
+        if not ativo:
+            print(f"[salvar_historicos] {ticker} não está cadastrado (removido?); histórico ignorado.")
+            return {'inseridos': 0, 'atualizados': 0, 'eventos': 0}
+        inicio_coleta = min(df['data'])
+        existentes = dict(session.execute(
+            select(Historico.data, Historico.id)
+            .where(Historico.ativo_id == ativo.id, Historico.data.between(inicio_coleta, max(df['data'])))
+        ).all())
+        registros = df.to_dict('records')
+        novos = [{**r, 'ativo_id': ativo.id} for r in registros if r['data'] not in existentes]
+        atualizados = [{**r, 'id': existentes[r['data']]} for r in registros if r['data'] in existentes]
+        if novos:
+            session.execute(insert(Historico), novos)
+        if atualizados:
+            session.execute(update(Historico), atualizados)
+        aplicados = 0
+        if eventos is not None and not eventos.empty:
+            aplicados = _aplicar_eventos(session, ativo.id, eventos, inicio_coleta)
+        verificar_cerca(session)
+        session.commit()
+    finally:
+        session.close()
+    incrementar_versao(chave_historico(ticker))
+    return {'inseridos': len(novos), 'atualizados': len(atualizados), 'eventos': aplicados}
+
+def _aplicar_eventos(session, ativo_id: int, eventos: pd.DataFrame, inicio_coleta: datetime.date) -> int:
+    """
+    Registra os eventos ainda desconhecidos e ajusta, no próprio banco, as linhas anteriores
+    a `inicio_coleta`: as linhas da coleta atual já vêm ajustadas pelo Yahoo (Close* por
+    desdobramentos, Adj Close** por desdobramentos e proventos).
+    - dividendo: fator = 1 - valor / fechamento do pregão anterior; só o fechamento ajustado muda;
+    - desdobramento: fator = 1 / proporção; preços e fechamento ajustado são multiplicados pelo
+      fator e o volume dividido por ele.
+    Os eventos novos são combinados em um único UPDATE por tipo de ajuste.
+    Returns:
+        int: Número de eventos novos registrados.
+    """
+    conhecidos = set(session.execute(
+        select(EventoCorporativo.data, EventoCorporativo.tipo).where(EventoCorporativo.ativo_id == ativo_id)
+    ).all())
+    novos = [e for e in eventos.to_dict('records') if (e['data'], e['tipo']) not in conhecidos]
+    if not novos:
+        return 0
+    fator_ajustado, fator_desdobramento = 1.0, 1.0
+    for evento in novos:
+        if evento['tipo'] == 'desdobramento':
+            evento['fator'] = 1.0 / evento['valor']
+            fator_desdobramento *= evento['fator']
+        else:
+            anterior = session.execute(
+                select(Historico.preco_fechamento)
+                .where(Historico.ativo_id == ativo_id, Historico.data < evento['data'], Historico.preco_fechamento.isnot(None))
+                .order_by(Historico.data.desc()).limit(1)
+            ).scalar()
+            evento['fator'] = 1.0 - evento['valor'] / anterior if anterior and evento['valor'] < anterior else None
+        if evento['fator'] is not None:
+            fator_ajustado *= evento['fator']
+    session.execute(insert(EventoCorporativo), [{**e, 'ativo_id': ativo_id} for e in novos])
+    anteriores = (Historico.ativo_id == ativo_id) & (Historico.data < inicio_coleta)
+    if fator_desdobramento != 1.0:
+        session.execute(
+            update(Historico).where(anteriores).values(
+                preco_abertura=Historico.preco_abertura * fator_desdobramento,
+                preco_fechamento=Historico.preco_fechamento * fator_desdobramento,
+                maximo=Historico.maximo * fator_desdobramento,
+                minimo=Historico.minimo * fator_desdobramento,
+                volume=Historico.volume / fator_desdobramento,
+            )
+        )
+    if fator_ajustado != 1.0:
+        session.execute(
+            update(Historico).where(anteriores).values(
+                preco_fechamento_ajustado=Historico.preco_fechamento_ajustado * fator_ajustado
+            )
+        )
+    print(f"[eventos] {len(novos)} evento(s) novo(s) para o ativo {ativo_id}; fator acumulado {fator_ajustado:.6f} aplicado antes de {inicio_coleta}.")
+    return len(novos)
+
+@cronometrado('banco')
+def listar_eventos_corporativos(ticker: str) -> pd.DataFrame:
+    """
+    Lista os eventos corporativos registrados do ativo (Data, Tipo, Valor, Fator), do mais recente ao mais antigo.
+    """
+    consulta = (
+        select(
+            EventoCorporativo.data.label('Data'),
+            EventoCorporativo.tipo.label('Tipo'),
+            EventoCorporativo.valor.label('Valor'),
+            EventoCorporativo.fator.label('Fator'),
+        )
+        .join(Ativo, EventoCorporativo.ativo_id == Ativo.id)
+        .where(Ativo.ticker == ticker)
+        .order_by(EventoCorporativo.data.desc())
+    )
+    with engine.connect() as conn:
+        df = pd.read_sql(consulta, conn)
+    df['Data'] = pd.to_datetime(df['Data']).dt.date
+    return df
 
+# === Posições da carteira ===
+@cronometrado('banco')
+def listar_posicoes() -> pd.DataFrame:
+    """
+    Lista as posições da carteira (Ticker, Quantidade, Peso alvo), em ordem de ticker.
+    """
+    consulta = (
+        select(Ativo.ticker.label('Ticker'), Posicao.quantidade.label('Quantidade'), Posicao.peso_alvo.label('Peso alvo'))
+        .join(Ativo, Posicao.ativo_id == Ativo.id)
+        .order_by(Ativo.ticker)
+    )
+    with engine.connect() as conn:
+        return pd.read_sql(consulta, conn)
+
+@cronometrado('banco')
+def salvar_posicoes(posicoes: pd.DataFrame) -> int:
+    """
+    Substitui as posições da carteira em uma única transação. Linhas sem quantidade nem peso
+    alvo, ou de tickers não cadastrados, são ignoradas; um ticker repetido mantém a última linha.
+    Args:
+        posicoes (pd.DataFrame): Colunas Ticker, Quantidade e Peso alvo (fração da carteira).
+    Returns:
+        int: Número de posições gravadas.
+    """
+    df = posicoes.dropna(subset=['Ticker']).drop_duplicates(subset='Ticker', keep='last')
+    df = df[df['Quantidade'].notna() | df['Peso alvo'].notna()]
+    session = SessionLocal()
+    try:
+        ids = dict(session.execute(select(Ativo.ticker, Ativo.id).where(Ativo.ticker.in_(df['Ticker'].tolist()))).all())
+        agora = datetime.datetime.now()
+        registros = [
+            {
+                'ativo_id': ids[linha['Ticker']],
+                'quantidade': None if pd.isna(linha['Quantidade']) else float(linha['Quantidade']),
+                'peso_alvo': None if pd.isna(linha['Peso alvo']) else float(linha['Peso alvo']),
+                'atualizado_em': agora,
+            }
+            for linha in df.to_dict('records') if linha['Ticker'] in ids
+        ]
+        session.execute(delete(Posicao))
+        if registros:
+            session.execute(insert(Posicao), registros)
+        session.commit()
+    finally:
+        session.close()
+    incrementar_versao('posicoes')
+    print(f"[posicoes] {len(registros)} posição(ões) gravada(s).")
+    return len(registros)
+
+@cronometrado('banco')
 def listar_historicos(ticker: str):
     """
     Lista todos os históricos de um ativo.
@@ -93,7 +350,105 @@ def listar_historicos(ticker: str):
     session.close()
     return historicos
 
+@cronometrado('banco')
+def historico_dataframe(ticker: str, data_inicio: datetime.date = None, ajustado: bool = False) -> pd.DataFrame:
+    """
+    Lê o histórico de um ativo diretamente em um DataFrame (sem materializar objetos ORM).
+    Args:
+        ticker (str): Código do ativo.
+        data_inicio (datetime.date, opcional): Data inicial (inclusive).
+        ajustado (bool): Preços ajustados por proventos e desdobramentos: o fechamento é o ajustado e
+            abertura, máximo e mínimo são escalados pela mesma razão (como o auto_adjust do yfinance).
+    Returns:
+        pd.DataFrame: Colunas Data, Abertura, Fechamento, Máximo, Mínimo, Volume, ordenadas por data,
+        apenas linhas com preço de fechamento.
+    """
+    consulta = (
+        select(
+            Historico.data.label('Data'),
+            Historico.preco_abertura.label('Abertura'),
+            Historico.preco_fechamento.label('Fechamento'),
+            Historico.maximo.label('Máximo'),
+            Historico.minimo.label('Mínimo'),
+            Historico.volume.label('Volume'),
+            Historico.preco_fechamento_ajustado.label('Ajustado'),
+        )
+        .join(Ativo, Historico.ativo_id == Ativo.id)
+        .where(Ativo.ticker == ticker, Historico.preco_fechamento.isnot(None))
+        .order_by(Historico.data)
+    )
+    if data_inicio is not None:
+        consulta = consulta.where(Historico.data >= data_inicio)
+    with engine.connect() as conn:
+        df = pd.read_sql(consulta, conn)
+    df['Data'] = pd.to_datetime(df['Data']).dt.date
+    ajustado_col = pd.to_numeric(df.pop('Ajustado'))
+    if ajustado:
+        # Linhas sem fechamento ajustado (ex: a linha do dia) mantêm os preços originais
+        razao = (ajustado_col / df['Fechamento']).fillna(1.0)
+        df[['Abertura', 'Fechamento', 'Máximo', 'Mínimo']] = df[['Abertura', 'Fechamento', 'Máximo', 'Mínimo']].mul(razao, axis=0)
+    return df
+
+@cronometrado('banco')
+def fechamentos_dataframe(tickers: list, ajustado: bool = False) -> pd.DataFrame:
+    """
+    Lê os fechamentos de vários ativos em uma única consulta e monta a matriz (índice: data,
+    colunas: tickers, na ordem informada) com as datas comuns a todos os ativos com histórico.
+    Args:
+        ajustado (bool): Fechamentos ajustados por proventos e desdobramentos (o original onde não houver).
+    """
+    fechamento = func.coalesce(Historico.preco_fechamento_ajustado, Historico.preco_fechamento) if ajustado else Historico.preco_fechamento
+    consulta = (
+        select(Ativo.ticker.label('Ticker'), Historico.data.label('Data'), fechamento.label('Fechamento'))
+        .join(Ativo, Historico.ativo_id == Ativo.id)
+        .where(Ativo.ticker.in_(tickers), Historico.preco_fechamento.isnot(None))
+    )
+    with engine.connect() as conn:
+        df = pd.read_sql(consulta, conn)
+    if df.empty:
+        return pd.DataFrame()
+    df['Data'] = pd.to_datetime(df['Data']).dt.date
+    matriz = df.pivot_table(index='Data', columns='Ticker', values='Fechamento', aggfunc='last')
+    return matriz[[t for t in tickers if t in matriz.columns]].dropna().sort_index().rename_axis(columns=None)
+
+# === Versões dos dados ===
+def chave_historico(ticker: str) -> str:
+    """
+    Retorna a chave de versão do histórico de um ativo.
+    """
+    return f'historicos:{ticker}'
+
+@cronometrado('banco')
+def incrementar_versao(*chaves: str) -> None:
+    """
+    Incrementa a versão dos conjuntos de dados informados, invalidando os caches de leitura.
+    """
+    session = SessionLocal()
+    try:
+        agora = datetime.datetime.now()
+        for chave in chaves:
+            versao = session.get(VersaoDados, chave)
+            if versao is None:
+                session.add(VersaoDados(chave=chave, versao=1, atualizado_em=agora))
+            else:
+                versao.versao += 1
+                versao.atualizado_em = agora
+        session.commit()
+    finally:
+        session.close()
+
+@cronometrado('banco')
+def consultar_versoes() -> dict:
+    """
+    Consulta as versões de todos os conjuntos de dados.
+    Returns:
+        dict: {chave: versao}
+    """
+    with engine.connect() as conn:
+        return dict(conn.execute(select(VersaoDados.chave, VersaoDados.versao)).all())
+
 # Função para salvar preço atual
+@cronometrado('banco')
 def salvar_preco_atual(ticker: str, preco: float, variacao: float = None, variacao_percentual: float = None, atualizado_em: datetime.datetime = None):
     """
     Salva ou atualiza o preço atual de um ativo.
@@ -126,7 +481,63 @@ def salvar_preco_atual(ticker: str, preco: float, variacao: float = None, variac
     session.commit()
     session.close()
 
+@cronometrado('banco')
+def salvar_precos_atuais(precos: list) -> int:
+    """
+    Salva ou atualiza, em uma única transação, os preços atuais de vários ativos e anexa as
+    cotações à série intraday (um INSERT em lote; a compactação fica em assets.intraday).
+    Args:
+        precos (list): Lista de dicts com 'ticker', 'preco', 'variacao', 'variacao_percentual' e 'atualizado_em'.
+    Returns:
+        int: Quantidade de preços gravados.
+    """
+    precos = [p for p in precos if p.get('preco') is not None]
+    if not precos:
+        return 0
+    session = SessionLocal()
+    try:
+        tickers = {p['ticker'] for p in precos}
+        ids = dict(session.query(Ativo.ticker, Ativo.id).filter(Ativo.ticker.in_(tickers)).all())
+        existentes = {
+            p.ativo_id: p
+            for p in session.query(PrecoAtual).filter(PrecoAtual.ativo_id.in_(ids.values())).order_by(PrecoAtual.atualizado_em)
+        }
+        gravados = 0
+        intraday = []
+        for p in precos:
+            ativo_id = ids.get(p['ticker'])
+            if ativo_id is None:
+                print(f"[salvar_precos_atuais] Ativo não encontrado: {p['ticker']}")
+                continue
+            atualizado_em = p.get('atualizado_em') or datetime.datetime.now()
+            preco_obj = existentes.get(ativo_id)
+            if preco_obj:
+                preco_obj.preco = p['preco']
+                preco_obj.variacao = p.get('variacao')
+                preco_obj.variacao_percentual = p.get('variacao_percentual')
+                preco_obj.atualizado_em = atualizado_em
+            else:
+                preco_obj = PrecoAtual(
+                    ativo_id=ativo_id,
+                    preco=p['preco'],
+                    variacao=p.get('variacao'),
+                    variacao_percentual=p.get('variacao_percentual'),
+                    atualizado_em=atualizado_em
+                )
+                session.add(preco_obj)
+                existentes[ativo_id] = preco_obj
+            intraday.append({'ativo_id': ativo_id, 'momento': atualizado_em, 'preco': p['preco']})
+            gravados += 1
+        if intraday:
+            session.execute(insert(CotacaoIntraday), intraday)
+        verificar_cerca(session)
+        session.commit()
+        return gravados
+    finally:
+        session.close()
+
 # Função para consultar preço atual
+@cronometrado('banco')
 def consultar_preco_atual(ticker: str):
     """
     Consulta o preço atual de um ativo.
@@ -147,36 +558,66 @@ def consultar_preco_atual(ticker: str):
         print(f"[consultar_preco_atual] Nenhum preço encontrado para: {ticker}")
     return preco_obj
 
+@cronometrado('banco')
+def consultar_precos_atuais(tickers: list = None) -> dict:
+    """
+    Consulta, em uma única query, o preço atual de vários ativos (ou de todos).
+    Returns:
+        dict: {ticker: {'preco', 'variacao', 'variacao_percentual', 'atualizado_em'}}
+    """
+    consulta = (
+        select(Ativo.ticker, PrecoAtual.preco, PrecoAtual.variacao, PrecoAtual.variacao_percentual, PrecoAtual.atualizado_em)
+        .join(Ativo, PrecoAtual.ativo_id == Ativo.id)
+        .order_by(PrecoAtual.atualizado_em)
+    )
+    if tickers is not None:
+        consulta = consulta.where(Ativo.ticker.in_(tickers))
+    with engine.connect() as conn:
+        linhas = conn.execute(consulta).all()
+    # Ordenado por data: o registro mais recente de cada ativo prevalece
+    return {
+        ticker: {'preco': preco, 'variacao': variacao, 'variacao_percentual': variacao_pct, 'atualizado_em': atualizado_em}
+        for ticker, preco, variacao, variacao_pct, atualizado_em in linhas
+    }
+
 # === Analytics Cache ===
-from assets.analytics import ativo_maior_rentabilidade_12m, ativo_menor_rentabilidade_mm3m, ativo_maior_tendencia_crescimento_1m
 from assets.models import AnalyticsCache
 
+# Um recálculo por vez no processo (entre processos, só o líder grava; ver assets.recalculo)
+_lock_analytics = threading.Lock()
+
+@cronometrado('analytics_recalculo')
 def atualizar_analytics_cache() -> None:
     """
-    Atualiza o cache dos destaques de analytics no banco de dados.
-    Remove entradas antigas e salva os novos destaques calculados.
-    """
+    Recalcula os destaques de analytics e troca o conteúdo do cache no banco de uma só vez.
+    Os destaques são calculados antes de abrir a transação; a troca (DELETE + INSERT) é uma
+    transação curta, então leitores veem sempre os destaques antigos ou os novos, nunca o cache
+    vazio, e o bloqueio de escrita do SQLite não fica preso durante o cálculo.
+    Prefira `recalculo.solicitar_analytics`, que agrupa pedidos em rajada em uma única execução.
     """
-    Atualiza o cache dos destaques de analytics no banco de dados.
-    Remove entradas antigas e salva os novos destaques calculados.
-    """
-    session = SessionLocal()
-    session.query(AnalyticsCache).delete()
-    ativo1, rent1 = ativo_maior_rentabilidade_12m()
-    ativo2, rent2 = ativo_menor_rentabilidade_mm3m()
-    ativo3, tend3 = ativo_maior_tendencia_crescimento_1m()
-    session.add(AnalyticsCache(tipo='maior_rent_12m', ticker=ativo1, valor=rent1, atualizado_em=datetime.datetime.now()))
-    session.add(AnalyticsCache(tipo='menor_rent_mm3m', ticker=ativo2, valor=rent2, atualizado_em=datetime.datetime.now()))
-    session.add(AnalyticsCache(tipo='maior_tend_1m', ticker=ativo3, valor=tend3, atualizado_em=datetime.datetime.now()))
-    session.commit()
-    session.close()
+    # Importado sob demanda: assets.analytics carrega o scikit-learn e importa este módulo
+    from assets.analytics import ativo_maior_rentabilidade_12m, ativo_menor_rentabilidade_mm3m, ativo_maior_tendencia_crescimento_1m
+    with _lock_analytics:
+        ativo1, rent1 = ativo_maior_rentabilidade_12m()
+        ativo2, rent2 = ativo_menor_rentabilidade_mm3m()
+        ativo3, tend3 = ativo_maior_tendencia_crescimento_1m()
+        agora = datetime.datetime.now()
+        session = SessionLocal()
+        try:
+            session.execute(delete(AnalyticsCache))
+            session.execute(insert(AnalyticsCache), [
+                {'tipo': 'maior_rent_12m', 'ticker': ativo1, 'valor': rent1, 'atualizado_em': agora},
+                {'tipo': 'menor_rent_mm3m', 'ticker': ativo2, 'valor': rent2, 'atualizado_em': agora},
+                {'tipo': 'maior_tend_1m', 'ticker': ativo3, 'valor': tend3, 'atualizado_em': agora},
+            ])
+            verificar_cerca(session)
+            session.commit()
+        finally:
+            session.close()
+        incrementar_versao('analytics')
 
+@cronometrado('banco')
 def consultar_analytics_cache() -> list:
-    """
-    Consulta todos os registros de analytics cache do banco de dados.
-    Returns:
-        list: Lista de objetos AnalyticsCache.
-    """
     """
     Consulta todos os registros de analytics cache do banco de dados.
     Returns:
@@ -186,3 +627,61 @@ def consultar_analytics_cache() -> list:
     dados = session.query(AnalyticsCache).all()
     session.close()
     return dados
+
+@cronometrado('banco')
+def _retirar_de_lotes(session, tickers: set) -> None:
+    """
+    Tira os tickers da lista (parametros['tickers']) dos jobs em lote pendentes ou em execução.
+    Lotes que ficam vazios são apagados (pendentes) ou cancelados (em execução).
+    """
+    lotes = session.query(Job).filter(
+        Job.ticker.is_(None), Job.parametros.isnot(None), Job.estado.in_(('pendente', 'executando'))
+    ).all()
+    for job in lotes:
+        parametros = json.loads(job.parametros)
+        lote = parametros.get('tickers') or []
+        restantes = [t for t in lote if t not in tickers]
+        if len(restantes) == len(lote):
+            continue
+        if restantes:
+            job.parametros = json.dumps({**parametros, 'tickers': restantes}, sort_keys=True)
+        elif job.estado == 'pendente':
+            session.delete(job)
+        else:
+            job.estado, job.mensagem, job.concluido_em = 'cancelado', 'Ativos removidos', datetime.datetime.now()
+    session.flush()
+
+def remover_ativos(tickers: list) -> int:
+    """
+    Remove os ativos e, em cascata, seus históricos, eventos corporativos, preços, série intraday,
+    posições da carteira, destaques de analytics e jobs pendentes, com um DELETE por tabela em uma única transação.
+    Jobs em execução dos ativos são marcados como 'cancelado' (o trabalhador interrompe no próximo
+    progresso ou heartbeat) e os ativos saem da lista dos backfills em lote.
+    Args:
+        tickers (list): Códigos dos ativos.
+    Returns:
+        int: Número de ativos removidos.
+    """
+    ids = select(Ativo.id).where(Ativo.ticker.in_(tickers)).scalar_subquery()
+    session = SessionLocal()
+    try:
+        session.execute(delete(Historico).where(Historico.ativo_id.in_(ids)))
+        session.execute(delete(EventoCorporativo).where(EventoCorporativo.ativo_id.in_(ids)))
+        session.execute(delete(PrecoAtual).where(PrecoAtual.ativo_id.in_(ids)))
+        session.execute(delete(CotacaoIntraday).where(CotacaoIntraday.ativo_id.in_(ids)))
+        session.execute(delete(BarraIntraday).where(BarraIntraday.ativo_id.in_(ids)))
+        session.execute(delete(Posicao).where(Posicao.ativo_id.in_(ids)))
+        session.execute(delete(AnalyticsCache).where(AnalyticsCache.ticker.in_(tickers)))
+        session.execute(delete(Job).where(Job.ticker.in_(tickers), Job.estado == 'pendente'))
+        session.execute(update(Job).where(Job.ticker.in_(tickers), Job.estado == 'executando').values(
+            estado='cancelado', mensagem='Ativo removido', concluido_em=datetime.datetime.now()
+        ))
+        _retirar_de_lotes(session, set(tickers))
+        removidos = session.execute(delete(Ativo).where(Ativo.ticker.in_(tickers))).rowcount
+        session.commit()
+    finally:
+        session.close()
+    if removidos:
+        incrementar_versao('ativos', 'analytics', 'posicoes', *[chave_historico(t) for t in tickers])
+    print(f"[remover_ativos] {removidos} ativo(s) removido(s).")
+    return removidos
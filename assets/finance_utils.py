@@ -6,16 +6,24 @@ Módulo de utilidades financeiras para scraping, fallback, conversão e atualiza
 Não depende de Streamlit.
 """
 
+import asyncio
+import collections
+import concurrent.futures
 import datetime
+import json
+import os
 import time
-import yfinance as yf
+import urllib.request
+import pandas as pd
 from assets.scrapping import Scraper
-from assets.database import salvar_preco_atual, listar_ativos
-
-import yfinance as yf
-import datetime
-from assets.scrapping import Scraper
-from assets.database import salvar_preco_atual, listar_ativos
+from assets.database import salvar_precos_atuais, listar_ativos
+from assets.market_calendar import AgendadorPrecos
+from assets.single_flight import SingleFlight
+from assets.quotes import snapshot_cotacoes
+from assets.source_health import controlador_fontes
+from assets.recalculo import solicitar_analytics
+from assets.metrics import metricas
+from assets.profiling import perfilador, threads_com_prefixo
 
 def to_float(val) -> float:
     """
@@ -41,60 +49,352 @@ def to_float(val) -> float:
     except Exception:
         return None
 
+# Base da API do substituto local do yfinance (ex.: http://127.0.0.1:8503/yfinance, ver assets.yahoo_local);
+# sem ela o fallback usa o yfinance real
+YFINANCE_BASE_URL = os.environ.get('YFINANCE_BASE_URL')
+
+def _obter_json(url: str, timeout: float = 10):
+    with urllib.request.urlopen(url, timeout=timeout) as resposta:
+        return json.load(resposta)
+
+def _info_yfinance(ticker: str) -> dict:
+    """
+    `yf.Ticker(ticker).info`, ou a resposta gravada do substituto local se YFINANCE_BASE_URL estiver definida.
+    """
+    if YFINANCE_BASE_URL:
+        return _obter_json(f"{YFINANCE_BASE_URL.rstrip('/')}/info/{ticker}")
+    import yfinance as yf
+    return yf.Ticker(ticker).info
+
+def _download_yfinance(tickers: list) -> pd.DataFrame:
+    """
+    `yf.download` dos últimos 5 pregões (colunas por ticker), ou o equivalente do substituto local.
+    """
+    if YFINANCE_BASE_URL:
+        dados = _obter_json(f"{YFINANCE_BASE_URL.rstrip('/')}/download?tickers={','.join(tickers)}")
+        if not dados:
+            return pd.DataFrame()
+        return pd.concat({t: pd.DataFrame(colunas).set_index('Date') for t, colunas in dados.items()}, axis=1)
+    import yfinance as yf
+    return yf.download(
+        tickers, period='5d', interval='1d', group_by='ticker', auto_adjust=False,
+        progress=False, threads=False
+    )
+
+# Coalesce buscas simultâneas de cotação do mesmo ticker (threads e processos)
+voo_cotacoes = SingleFlight('cotacao', entre_processos=True)
+
 def buscar_preco_com_fallback(ticker):
     """
     Busca preço do ativo via scraping. Se falhar, faz fallback para yfinance.
+    Cada fonte passa pelo controle de saúde (circuit breaker, timeout adaptativo e limite de taxa):
+    fontes com o circuito aberto são puladas sem esperar pelos timeouts.
+    Chamadas simultâneas para o mesmo ticker compartilham uma única busca.
     Args:
         ticker (str): Código do ativo.
     Returns:
         dict: {'preco': float|None, 'variacao': float|None, 'variacao_percentual': float|None}
     """
+    return voo_cotacoes.executar(ticker.upper(), _buscar_preco_com_fallback, ticker)
+
+def _buscar_preco_com_fallback(ticker):
+    """
+    Busca o preço (scraping com fallback para yfinance) sem coalescência.
+    """
+    dados = _buscar_preco_scraper(ticker)
+    if dados is not None:
+        return dados
+    dados = _buscar_preco_yfinance(ticker)
+    if dados is not None:
+        return dados
+    return {'preco': None, 'variacao': None, 'variacao_percentual': None}
+
+def _buscar_preco_scraper(ticker):
+    """
+    Busca o preço via scraping do Yahoo Finance (fonte 'yahoo_cotacao').
+    Returns:
+        dict|None: Dados do preço ou None se a fonte estiver indisponível ou falhar.
+    """
+    if not controlador_fontes.permitir('yahoo_cotacao'):
+        return None
+    timeout = controlador_fontes.timeout('yahoo_cotacao')
+    inicio = None
+    scraper = Scraper(headless=True, perfil='enxuto', timeouts={'pagina': timeout, 'elemento': timeout})
     try:
-        scraper = Scraper(headless=True)
         scraper.start_driver()
+        # A latência da fonte é só a da página, sem a inicialização do navegador
+        inicio = time.monotonic()
         dados = scraper.scrape_stock(ticker)
-        scraper.quit_driver()
+        preco = to_float(dados.get("regular_market_price"))
+        if preco is None:
+            raise ValueError(f"Preço não encontrado na página de {ticker}")
+        controlador_fontes.registrar_sucesso('yahoo_cotacao', time.monotonic() - inicio)
         return {
-            'preco': to_float(dados.get("regular_market_price")),
+            'preco': preco,
             'variacao': to_float(dados.get("regular_market_change")),
             'variacao_percentual': to_float(dados.get("regular_market_change_percent")),
         }
-    except Exception:
+    except Exception as e:
+        if inicio is None:
+            # Falha ao iniciar o navegador não conta contra a fonte, mas devolve a chamada
+            # (se era a de teste do circuito meio aberto, outra pode ser feita)
+            controlador_fontes.liberar('yahoo_cotacao')
+            print(f"[buscar_preco_com_fallback] Navegador não iniciou para {ticker}: {e}")
+            return None
+        controlador_fontes.registrar_falha('yahoo_cotacao', time.monotonic() - inicio, e)
+        print(f"[buscar_preco_com_fallback] Scraping falhou para {ticker}: {e}")
+        return None
+    finally:
+        scraper.quit_driver()
+
+def _buscar_preco_yfinance(ticker):
+    """
+    Busca o preço via yfinance (fonte 'yfinance').
+    Returns:
+        dict|None: Dados do preço ou None se a fonte estiver indisponível ou falhar.
+    """
+    if not controlador_fontes.permitir('yfinance'):
+        return None
+    inicio = time.monotonic()
+    try:
+        info = _info_yfinance(ticker)
+        preco = info.get('regularMarketPrice') or info.get('previousClose')
+        if preco is None:
+            raise ValueError(f"yfinance não retornou preço para {ticker}")
+        variacao = info.get('regularMarketChange') or (preco - info.get('previousClose') if preco and info.get('previousClose') else None)
+        variacao_percentual = info.get('regularMarketChangePercent')
+        controlador_fontes.registrar_sucesso('yfinance', time.monotonic() - inicio)
+        return {
+            'preco': preco,
+            'variacao': variacao,
+            'variacao_percentual': variacao_percentual,
+        }
+    except Exception as e:
+        controlador_fontes.registrar_falha('yfinance', time.monotonic() - inicio, e)
+        print(f"[buscar_preco_com_fallback] yfinance falhou para {ticker}: {e}")
+        return None
+
+def buscar_precos_em_lote(tickers: list, tamanho_lote: int = 50, concorrencia: int = 4) -> dict:
+    """
+    Busca as cotações de muitos tickers via yfinance em lotes (uma requisição por lote),
+    com os lotes executados em paralelo. Usado na validação de importações em massa.
+    Args:
+        tickers (list): Lista de tickers.
+        tamanho_lote (int): Tickers por requisição.
+        concorrencia (int): Lotes buscados simultaneamente.
+    Returns:
+        dict: {ticker: {'preco', 'variacao', 'variacao_percentual'}} apenas para os tickers com preço.
+    """
+    lotes = [tickers[i:i + tamanho_lote] for i in range(0, len(tickers), tamanho_lote)]
+    resultado = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for precos in executor.map(_buscar_lote_yfinance, lotes):
+            resultado.update(precos)
+    return resultado
+
+def _buscar_lote_yfinance(tickers: list) -> dict:
+    """
+    Busca um lote de cotações com `yf.download` (fonte 'yfinance'): preço = último fechamento,
+    variação em relação ao fechamento anterior.
+    """
+    if not tickers or not controlador_fontes.permitir('yfinance'):
+        return {}
+    inicio = time.monotonic()
+    try:
+        df = _download_yfinance(tickers)
+        controlador_fontes.registrar_sucesso('yfinance', time.monotonic() - inicio)
+    except Exception as e:
+        controlador_fontes.registrar_falha('yfinance', time.monotonic() - inicio, e)
+        print(f"[buscar_precos_em_lote] yfinance falhou para o lote ({len(tickers)} tickers): {e}")
+        return {}
+    precos = {}
+    if df is None or df.empty:
+        return precos
+    disponiveis = set(df.columns.get_level_values(0))
+    for ticker in tickers:
+        if ticker not in disponiveis:
+            continue
+        fechamentos = df[ticker]['Close'].dropna()
+        if fechamentos.empty:
+            continue
+        preco = float(fechamentos.iloc[-1])
+        anterior = float(fechamentos.iloc[-2]) if len(fechamentos) > 1 else None
+        variacao = preco - anterior if anterior else None
+        precos[ticker] = {
+            'preco': preco,
+            'variacao': variacao,
+            'variacao_percentual': variacao / anterior * 100 if variacao is not None else None,
+        }
+    return precos
+
+# Estatísticas dos últimos ciclos de atualização de preços (mais recente por último)
+ciclos_precos = collections.deque(maxlen=100)
+
+async def _escritor_precos(fila: asyncio.Queue, tamanho_lote: int, intervalo_flush: float) -> None:
+    """
+    Consome a fila de preços e grava em lote no banco (até `tamanho_lote` itens ou a cada `intervalo_flush` segundos).
+    Um item None encerra o escritor após gravar o lote pendente.
+    """
+    lote = []
+    encerrar = False
+    while not encerrar:
         try:
-            yf_ticker = yf.Ticker(ticker)
-            info = yf_ticker.info
-            preco = info.get('regularMarketPrice') or info.get('previousClose')
-            variacao = info.get('regularMarketChange') or (preco - info.get('previousClose') if preco and info.get('previousClose') else None)
-            variacao_percentual = info.get('regularMarketChangePercent')
-            return {
-                'preco': preco,
-                'variacao': variacao,
-                'variacao_percentual': variacao_percentual,
-            }
-        except Exception:
-            return {'preco': None, 'variacao': None, 'variacao_percentual': None}
-
-def atualizar_precos_periodicamente(intervalo=60):
+            item = await asyncio.wait_for(fila.get(), timeout=intervalo_flush)
+            if item is None:
+                encerrar = True
+            else:
+                lote.append(item)
+        except asyncio.TimeoutError:
+            pass
+        if lote and (encerrar or len(lote) >= tamanho_lote or fila.empty()):
+            try:
+                await asyncio.to_thread(salvar_precos_atuais, lote)
+                snapshot_cotacoes.publicar(lote)
+            except Exception as e:
+                metricas.contar('erros', origem='gravacao_precos')
+                print(f"[atualizar_precos] Erro ao gravar lote de {len(lote)} preços: {e}")
+            lote = []
+
+async def atualizar_precos_ciclo(tickers: list, executor: concurrent.futures.Executor, concorrencia: int = 10,
+                                 tamanho_lote: int = 20, intervalo_flush: float = 2.0) -> dict:
+    """
+    Executa um ciclo de atualização: busca todos os tickers concorrentemente (limitado por semáforo)
+    e envia os resultados para uma gravação em lote no banco.
+    Args:
+        tickers (list): Tickers a atualizar.
+        executor (Executor): Executor onde rodam as buscas bloqueantes (Selenium/yfinance).
+        concorrencia (int): Número máximo de buscas simultâneas.
+        tamanho_lote (int): Quantidade de preços por gravação no banco.
+        intervalo_flush (float): Tempo máximo (s) que um preço aguarda na fila antes de ser gravado.
+    Returns:
+        dict: Estatísticas do ciclo (início, duração, tickers, falhas) e a lista `atualizados` dos tickers com preço obtido.
+    """
+    loop = asyncio.get_running_loop()
+    semaforo = asyncio.Semaphore(concorrencia)
+    fila = asyncio.Queue()
+    escritor = asyncio.create_task(_escritor_precos(fila, tamanho_lote, intervalo_flush))
+    inicio_dt = datetime.datetime.now()
+    inicio = time.monotonic()
+    falhas = 0
+    atualizados = []
+
+    async def atualizar(ticker):
+        nonlocal falhas
+        async with semaforo:
+            try:
+                dados = await loop.run_in_executor(executor, buscar_preco_com_fallback, ticker)
+            except Exception as e:
+                metricas.contar('erros', origem='busca_preco')
+                print(f"[atualizar_precos] Erro ao buscar {ticker}: {e}")
+                dados = None
+        if not dados or dados['preco'] is None:
+            falhas += 1
+            return
+        atualizados.append(ticker)
+        await fila.put({'ticker': ticker, **dados, 'atualizado_em': datetime.datetime.now()})
+
+    await asyncio.gather(*(atualizar(t) for t in tickers))
+    await fila.put(None)
+    await escritor
+    ciclo = {
+        'inicio': inicio_dt,
+        'duracao': time.monotonic() - inicio,
+        'tickers': len(tickers),
+        'falhas': falhas,
+        'atualizados': atualizados,
+    }
+    ciclos_precos.append(ciclo)
+    metricas.observar('ciclo_precos', ciclo['duracao'])
+    metricas.contar('precos_atualizados', len(tickers) - falhas)
+    metricas.contar('precos_falhas', falhas)
+    return ciclo
+
+def sincronizar_historicos(tickers: list, periodo: str = '5D') -> None:
+    """
+    Sincroniza os históricos recentes dos tickers (após o fechamento da bolsa) e pede o recálculo
+    do analytics e dos snapshots do dashboard (agrupado com os demais pedidos, ver assets.recalculo).
+    Args:
+        tickers (list): Tickers da bolsa que fechou.
+        periodo (str): Período coletado (ver Scraper.get_period_range).
+    """
+    try:
+        Scraper(headless=True, perfil='enxuto').coletar_e_salvar_historico_ativos(tickers, periodos=periodo, cadastrar=False)
+        solicitar_analytics(f'sincronização de {len(tickers)} ativo(s)')
+    except Exception as e:
+        metricas.contar('erros', origem='sincronizar_historicos')
+        print(f"[sincronizar_historicos] Erro ao sincronizar históricos de {tickers}: {e}")
+
+async def atualizar_precos_async(intervalo=60, concorrencia=10, max_ciclos=None, agendador: AgendadorPrecos = None, ao_fechar=None, continuar=None) -> None:
+    """
+    Loop assíncrono de atualização de preços em agenda fixa: cada rodada começa em
+    inicio + k * intervalo, independentemente da duração da anterior. Se um ciclo
+    ultrapassar o intervalo, os horários perdidos são pulados.
+    A cada rodada, o agendador define quais tickers atualizar conforme o estado do mercado
+    da bolsa de cada um, e as bolsas que fecharam disparam a sincronização dos seus históricos.
+    Args:
+        intervalo (int): Intervalo em segundos entre os inícios das rodadas.
+        concorrencia (int): Número máximo de buscas simultâneas.
+        max_ciclos (int, opcional): Encerra após esse número de rodadas (None = indefinidamente).
+        agendador (AgendadorPrecos, opcional): Agendador por bolsa (padrão: um novo com `intervalo`).
+        ao_fechar (callable, opcional): Recebe os tickers de uma bolsa que fechou (padrão: sincronizar_historicos
+            em uma thread do executor padrão).
+        continuar (callable, opcional): Consultado antes de cada rodada; o loop termina quando retorna False
+            (ex: o processo deixou de ser o líder, ver assets.lideranca).
+    """
+    if agendador is None:
+        agendador = AgendadorPrecos(intervalo_aberto=intervalo)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix='preco')
+    loop = asyncio.get_running_loop()
+    proximo = loop.time()
+    ciclos = 0
+    try:
+        while max_ciclos is None or ciclos < max_ciclos:
+            if continuar is not None and not continuar():
+                print("[atualizar_precos] Loop de preços encerrado (processo não é mais o líder).")
+                break
+            try:
+                tickers = [a.ticker for a in await asyncio.to_thread(listar_ativos)]
+                devidos = agendador.tickers_devidos(tickers)
+                if devidos:
+                    # Perfil opcional do ciclo (thread do loop + threads de busca); None se desligado
+                    amostrador = perfilador.iniciar('precos', threads_com_prefixo('preco_'))
+                    try:
+                        ciclo = await atualizar_precos_ciclo(devidos, executor, concorrencia)
+                    finally:
+                        if amostrador:
+                            await asyncio.to_thread(amostrador.encerrar, {'tickers': len(devidos), 'concorrencia': concorrencia})
+                    # Só conta como feita a passada dos tickers com preço obtido; os demais voltam na próxima rodada
+                    agendador.registrar_atualizacao(ciclo['atualizados'])
+                    if ciclo['duracao'] > intervalo:
+                        print(f"[atualizar_precos] Ciclo levou {ciclo['duracao']:.1f}s (> {intervalo}s) para {ciclo['tickers']} ativos.")
+                for bolsa, tickers_bolsa in agendador.fechamentos_pendentes(tickers).items():
+                    print(f"[atualizar_precos] Fechamento da {bolsa}: sincronizando históricos de {len(tickers_bolsa)} ativos.")
+                    if ao_fechar is None:
+                        loop.run_in_executor(None, sincronizar_historicos, tickers_bolsa)
+                    else:
+                        ao_fechar(tickers_bolsa)
+            except Exception as e:
+                metricas.contar('erros', origem='loop_precos')
+                print(f"[atualizar_precos] Erro no ciclo de atualização: {e}")
+            ciclos += 1
+            proximo += intervalo
+            agora = loop.time()
+            if proximo < agora:
+                proximo += ((agora - proximo) // intervalo + 1) * intervalo
+            await asyncio.sleep(proximo - agora)
+    finally:
+        executor.shutdown(wait=False)
+
+def atualizar_precos_periodicamente(intervalo=60, concorrencia=10, ao_fechar=None, continuar=None):
     """
     Thread: Atualiza preços dos ativos em background, salvando no banco.
+    Ponto de entrada síncrono para o loop assíncrono `atualizar_precos_async`.
     Args:
-        intervalo (int): Intervalo em segundos entre atualizações.
+        intervalo (int): Intervalo em segundos entre os inícios dos ciclos de atualização.
+        concorrencia (int): Número máximo de buscas simultâneas.
+        ao_fechar (callable, opcional): Ver `atualizar_precos_async`.
+        continuar (callable, opcional): Ver `atualizar_precos_async`.
     Returns:
         None
     """
-    while True:
-        ativos = listar_ativos()
-        for ativo in ativos:
-            try:
-                dados = buscar_preco_com_fallback(ativo.ticker)
-                salvar_preco_atual(
-                    ativo.ticker,
-                    preco=dados['preco'],
-                    variacao=dados['variacao'],
-                    variacao_percentual=dados['variacao_percentual'],
-                    atualizado_em=datetime.datetime.now()
-                )
-            except Exception:
-                pass
-        import time
-        time.sleep(intervalo)
+    asyncio.run(atualizar_precos_async(intervalo, concorrencia, ao_fechar=ao_fechar, continuar=continuar))
@@ -0,0 +1,78 @@
+"""
+importacao.py
+-------------
+Importação de carteiras em massa (CSV ou lista colada).
+Os tickers são validados em paralelo contra a cotação em lote do yfinance, os válidos são
+inseridos em uma única transação com seus preços atuais, e os backfills são enfileirados em
+lotes na fila de jobs (cada lote reaproveita um único navegador do Scraper).
+"""
+
+import csv
+import datetime
+import io
+import re
+
+from assets.database import inserir_ativos, salvar_precos_atuais
+from assets.finance_utils import buscar_precos_em_lote
+from assets.jobs import enfileirar_job
+from assets.quotes import snapshot_cotacoes
+
+COLUNAS_TICKER = ('ticker', 'tickers', 'ativo', 'codigo', 'código', 'symbol')
+
+
+def ler_tickers(texto: str) -> list:
+    """
+    Extrai os tickers de um CSV (usa a coluna 'ticker'/'ativo'/'symbol', se houver cabeçalho,
+    senão a primeira coluna) ou de uma lista separada por vírgulas, ponto e vírgula, espaços ou linhas.
+    Returns:
+        list: Tickers em maiúsculas, sem duplicatas, na ordem original.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    linhas = texto.splitlines()
+    cabecalho = [c.strip().lower() for c in re.split(r'[,;\t]', linhas[0])]
+    coluna = next((cabecalho.index(c) for c in COLUNAS_TICKER if c in cabecalho), None)
+    if coluna is not None:
+        delimitador = csv.Sniffer().sniff(linhas[0], delimiters=',;\t').delimiter
+        valores = [linha[coluna] for linha in csv.reader(io.StringIO('\n'.join(linhas[1:])), delimiter=delimitador) if len(linha) > coluna]
+    elif len(linhas) > 1 and all(re.search(r'[,;\t]', l) for l in linhas if l.strip()):
+        # CSV sem cabeçalho: primeira coluna
+        valores = [re.split(r'[,;\t]', l)[0] for l in linhas]
+    else:
+        valores = re.split(r'[\s,;]+', texto)
+    tickers = [v.strip().strip('"\'').upper() for v in valores]
+    return list(dict.fromkeys(t for t in tickers if t))
+
+
+def importar_ativos(tickers: list, periodos: str = '5Y', tamanho_lote_backfill: int = 25, enfileirar=enfileirar_job) -> dict:
+    """
+    Valida e cadastra vários ativos de uma vez.
+    Args:
+        tickers (list): Tickers a importar.
+        periodos (str): Período do backfill.
+        tamanho_lote_backfill (int): Tickers por job de backfill.
+        enfileirar (callable): Função usada para enfileirar os jobs.
+    Returns:
+        dict: {'novos': list, 'existentes': list, 'invalidos': list, 'jobs': list}
+    """
+    cotacoes = buscar_precos_em_lote(tickers)
+    validos = [t for t in tickers if t in cotacoes]
+    invalidos = [t for t in tickers if t not in cotacoes]
+    novos = inserir_ativos(validos) if validos else []
+    agora = datetime.datetime.now()
+    precos = [{'ticker': t, **cotacoes[t], 'atualizado_em': agora} for t in validos]
+    salvar_precos_atuais(precos)
+    snapshot_cotacoes.publicar(precos)
+    jobs = [
+        enfileirar('backfill', None, {'tickers': novos[i:i + tamanho_lote_backfill], 'periodos': periodos})
+        for i in range(0, len(novos), tamanho_lote_backfill)
+    ]
+    inseridos = set(novos)
+    print(f"[importacao] {len(novos)} novos, {len(validos) - len(novos)} existentes, {len(invalidos)} inválidos; {len(jobs)} job(s) de backfill.")
+    return {
+        'novos': novos,
+        'existentes': [t for t in validos if t not in inseridos],
+        'invalidos': invalidos,
+        'jobs': jobs,
+    }
@@ -0,0 +1,177 @@
+"""
+ingestao.py
+-----------
+Normalização vetorizada do histórico bruto coletado pelo Scraper (colunas de texto da página
+do Yahoo Finance) em um DataFrame tipado, pronto para a gravação em lote no banco.
+
+- Datas em 'Oct 7, 2025' (Yahoo em inglês) ou '07/10/2025' (dd/mm/aaaa);
+- Preços com separador de milhar em inglês ('1,234.56') ou em português ('1.234,56');
+- Volume com separador de milhar ('1,234,567' ou '1.234.567');
+- 'N/A', '-' e vazio são ausências (gravadas como nulas), não erros.
+
+Linhas com data ou número inválidos são rejeitadas em bloco, com o motivo de cada uma.
+As linhas de eventos da mesma página ('0.25 Dividend', '2:1 Stock Splits') são convertidas
+por `normalizar_eventos` em (data, tipo, valor).
+"""
+
+import numpy as np
+import pandas as pd
+
+from assets.metrics import cronometrado
+
+# Colunas do DataFrame bruto do Scraper -> colunas da tabela `historicos`
+COLUNAS_PRECO = {
+    'Open': 'preco_abertura',
+    'High': 'maximo',
+    'Low': 'minimo',
+    'Close*': 'preco_fechamento',
+    'Adj Close**': 'preco_fechamento_ajustado',
+}
+COLUNAS_NORMALIZADAS = ['data', 'preco_abertura', 'preco_fechamento', 'preco_fechamento_ajustado', 'maximo', 'minimo', 'volume']
+COLUNAS_EVENTOS = ['data', 'tipo', 'valor']
+
+SENTINELAS = ['', 'N/A', '-', 'None', 'nan', 'NaN', 'null']
+FORMATOS_DATA = ('%b %d, %Y', '%d/%m/%Y')
+
+_PADRAO_PT_BR = r'^-?\d{1,3}(?:\.\d{3})*,\d+$'
+_PADRAO_DIVIDENDO = r'^(?P<valor>[\d.,]+)\s+Dividend'
+_PADRAO_DESDOBRAMENTO = r'^(?P<novas>[\d.,]+)\s*[:/]\s*(?P<antigas>[\d.,]+)\s+Stock Split'
+
+
+def _texto(serie: pd.Series) -> tuple:
+    """
+    Retorna o texto limpo da coluna e a máscara das ausências (None/NaN/sentinelas).
+    """
+    texto = serie.astype(object).str.strip()
+    ausente = texto.isna() | texto.isin(SENTINELAS)
+    return texto, ausente
+
+
+def _datas(serie: pd.Series) -> pd.Series:
+    texto, _ = _texto(serie)
+    datas = pd.Series(pd.NaT, index=serie.index, dtype='datetime64[ns]')
+    for formato in FORMATOS_DATA:
+        faltantes = datas.isna()
+        if not faltantes.any():
+            break
+        datas[faltantes] = pd.to_datetime(texto[faltantes], format=formato, errors='coerce')
+    return datas
+
+
+def _limpar_preco(texto: pd.Series) -> pd.Series:
+    # '1.234,56' (português) -> '1234.56'; '1,234.56' (inglês) -> '1234.56'
+    pt_br = texto.str.match(_PADRAO_PT_BR, na=False)
+    return texto.str.replace(',', '', regex=False).where(
+        ~pt_br, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    )
+
+
+def _limpar_volume(texto: pd.Series) -> pd.Series:
+    return texto.str.replace(',', '', regex=False).str.replace('.', '', regex=False)
+
+
+def _numeros(serie: pd.Series, limpar) -> tuple:
+    """
+    Converte a coluna para float. Colunas já numéricas são convertidas diretamente; em colunas de
+    texto, os valores passam pela limpeza antes da conversão ('1.234' de volume é 1234, não 1.234).
+    Returns:
+        tuple: (valores float, máscara de inválidos)
+    """
+    invalidos = np.zeros(len(serie), dtype=bool)
+    if pd.api.types.is_numeric_dtype(serie.dtype):
+        return serie.astype('float64'), invalidos
+    valores = pd.Series(np.nan, index=serie.index, dtype='float64')
+    e_texto = serie.map(lambda v: isinstance(v, str)).to_numpy(dtype=bool)
+    if (~e_texto).any():
+        # Números (ou nulos) misturados a textos em colunas object
+        valores[~e_texto] = pd.to_numeric(serie[~e_texto], errors='coerce').astype('float64')
+    if e_texto.any():
+        texto, ausente = _texto(serie[e_texto])
+        convertidos = pd.to_numeric(limpar(texto.mask(ausente)), errors='coerce').astype('float64')
+        valores[e_texto] = convertidos.to_numpy()
+        invalidos[e_texto] = (convertidos.isna() & ~ausente).to_numpy()
+    return valores, invalidos
+
+
+@cronometrado('ingestao_normalizacao')
+def normalizar_historico(bruto: pd.DataFrame) -> tuple:
+    """
+    Converte o histórico bruto do Scraper (colunas Date, Open, High, Low, Close*, Adj Close**, Volume)
+    em colunas tipadas.
+    Returns:
+        tuple: (DataFrame com COLUNAS_NORMALIZADAS e uma linha por data, DataFrame das linhas
+        rejeitadas com a coluna 'motivo')
+    """
+    if bruto.empty:
+        return pd.DataFrame(columns=COLUNAS_NORMALIZADAS), pd.DataFrame(columns=list(bruto.columns) + ['motivo'])
+    datas = _datas(bruto['Date'])
+    normalizado = pd.DataFrame({'data': datas.dt.date}, index=bruto.index)
+    motivo = pd.Series(np.where(datas.isna(), 'data inválida', ''), index=bruto.index, dtype=object)
+    # As colunas de preço são convertidas juntas, em uma única série
+    precos, invalidos = _numeros(pd.concat([bruto[c] for c in COLUNAS_PRECO], ignore_index=True), _limpar_preco)
+    n = len(bruto)
+    for k, (origem, destino) in enumerate(COLUNAS_PRECO.items()):
+        normalizado[destino] = precos.to_numpy()[k * n:(k + 1) * n]
+        motivo[invalidos[k * n:(k + 1) * n] & (motivo == '')] = f'{origem} inválido'
+    normalizado['volume'], invalidos = _numeros(bruto['Volume'], _limpar_volume)
+    motivo[invalidos & (motivo == '')] = 'Volume inválido'
+
+    rejeitado = motivo != ''
+    rejeitadas = bruto[rejeitado].assign(motivo=motivo[rejeitado])
+    normalizado = (
+        normalizado[~rejeitado][COLUNAS_NORMALIZADAS]
+        .drop_duplicates(subset='data', keep='first')
+        .sort_values('data')
+        .reset_index(drop=True)
+    )
+    # NaN -> None para a gravação (colunas nulas no banco)
+    normalizado = normalizado.astype(object).where(normalizado.notna(), None)
+    return normalizado, rejeitadas
+
+
+def normalizar_eventos(bruto: pd.DataFrame) -> tuple:
+    """
+    Converte as linhas de eventos do Scraper (colunas Date, Evento) em (data, tipo, valor):
+    tipo 'dividendo' com o valor por ação, ou 'desdobramento' com a proporção de ações novas
+    por antiga ('2:1 Stock Splits' -> 2.0, grupamento '1:10' -> 0.1).
+    Returns:
+        tuple: (DataFrame com COLUNAS_EVENTOS, DataFrame das linhas rejeitadas com a coluna 'motivo')
+    """
+    if bruto.empty:
+        return pd.DataFrame(columns=COLUNAS_EVENTOS), pd.DataFrame(columns=list(bruto.columns) + ['motivo'])
+    datas = _datas(bruto['Date'])
+    texto, _ = _texto(bruto['Evento'])
+    dividendo = texto.str.extract(_PADRAO_DIVIDENDO)
+    desdobramento = texto.str.extract(_PADRAO_DESDOBRAMENTO)
+    valor_dividendo, _ = _numeros(dividendo['valor'], _limpar_preco)
+    novas, _ = _numeros(desdobramento['novas'], _limpar_preco)
+    antigas, _ = _numeros(desdobramento['antigas'], _limpar_preco)
+    eventos = pd.DataFrame({
+        'data': datas.dt.date,
+        'tipo': np.where(valor_dividendo.notna(), 'dividendo', np.where(novas.notna(), 'desdobramento', None)),
+        'valor': valor_dividendo.fillna(novas / antigas),
+    }, index=bruto.index)
+    motivo = pd.Series(np.where(datas.isna(), 'data inválida', ''), index=bruto.index, dtype=object)
+    motivo[(motivo == '') & (eventos['tipo'].isna() | ~(eventos['valor'] > 0))] = 'evento não reconhecido'
+    rejeitado = motivo != ''
+    rejeitadas = bruto[rejeitado].assign(motivo=motivo[rejeitado])
+    eventos = (
+        eventos[~rejeitado]
+        .drop_duplicates(subset=['data', 'tipo'], keep='first')
+        .sort_values('data')
+        .reset_index(drop=True)
+    )
+    eventos['valor'] = eventos['valor'].astype(float)
+    return eventos, rejeitadas
+
+
+def relatar_rejeitadas(ticker: str, rejeitadas: pd.DataFrame, exemplos: int = 3) -> None:
+    """
+    Resume as linhas rejeitadas por motivo (uma mensagem por ingestão, não uma por linha).
+    """
+    if rejeitadas.empty:
+        return
+    motivos = ', '.join(f'{m}: {n}' for m, n in rejeitadas['motivo'].value_counts().items())
+    print(f"[ingestao] {len(rejeitadas)} linha(s) rejeitada(s) de {ticker} ({motivos}).")
+    for linha in rejeitadas.head(exemplos).to_dict('records'):
+        print(f"[ingestao]   {linha}")
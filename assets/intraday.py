@@ -0,0 +1,208 @@
+"""
+intraday.py
+-----------
+Série intraday das cotações em camadas de retenção, sem crescimento ilimitado do banco.
+
+- `cotacoes_intraday`: cotações brutas, anexadas em lote a cada gravação do loop de preços
+  (ver `database.salvar_precos_atuais`), mantidas por `RETENCAO_DIAS['bruto']` dias;
+- `barras_intraday` (5min): barras OHLC das cotações brutas mais antigas, por `RETENCAO_DIAS['5min']` dias;
+- `barras_intraday` (1h): barras das barras de 5 minutos mais antigas, por `RETENCAO_DIAS['1h']` dias.
+
+`compactar_intraday` move os dados de uma camada para a seguinte e apaga o que passou da
+retenção (serviço 'intraday', ao iniciar e no fechamento de cada bolsa). Cada dado está em uma
+única camada, então `ler_intraday` lê as três no intervalo pedido (pelos índices de ativo e
+momento) e junta o resultado.
+"""
+
+import datetime
+import os
+
+import pandas as pd
+from sqlalchemy import delete, insert, select
+
+from assets.database import SessionLocal, engine, verificar_cerca
+from assets.metrics import cronometrado
+from assets.models import Ativo, BarraIntraday, CotacaoIntraday
+
+RETENCAO_DIAS = {
+    'bruto': int(os.environ.get('INTRADAY_DIAS_BRUTOS', 2)),
+    '5min': int(os.environ.get('INTRADAY_DIAS_5MIN', 30)),
+    '1h': int(os.environ.get('INTRADAY_DIAS_1H', 365)),
+}
+COLUNAS_BARRA = ['abertura', 'maximo', 'minimo', 'fechamento', 'pontos', 'primeiro_em', 'ultimo_em']
+COLUNAS_LEITURA = ['Hora', 'Abertura', 'Máximo', 'Mínimo', 'Fechamento', 'Pontos']
+
+
+def _selecionar_barras():
+    return select(
+        BarraIntraday.ativo_id, BarraIntraday.resolucao, BarraIntraday.inicio.label('momento'),
+        *[getattr(BarraIntraday, c) for c in COLUNAS_BARRA]
+    )
+
+
+def _momentos_reais(barras: pd.DataFrame) -> pd.DataFrame:
+    """
+    Completa primeiro_em/ultimo_em das barras gravadas antes dessas colunas existirem com o início
+    e o fim do intervalo da barra: a abertura e o fechamento dessas barras só são trocados por
+    cotações de fora do intervalo.
+    """
+    momento = pd.to_datetime(barras['momento'])
+    fim = momento + pd.to_timedelta(barras['resolucao']) - pd.Timedelta(microseconds=1)
+    return barras.drop(columns='resolucao').assign(
+        momento=momento,
+        primeiro_em=pd.to_datetime(barras['primeiro_em']).fillna(momento),
+        ultimo_em=pd.to_datetime(barras['ultimo_em']).fillna(fim),
+    )
+
+
+def _agregar(df: pd.DataFrame, resolucao: str) -> pd.DataFrame:
+    """
+    Agrega cotações ou barras (colunas ativo_id, momento e COLUNAS_BARRA) em barras da resolução.
+    A abertura vem da cotação com o primeiro momento real e o fechamento da com o último, e não da
+    ordem das linhas: uma cotação atrasada não vira o fechamento de uma barra que já tinha cotações
+    posteriores.
+    """
+    df = df.assign(inicio=pd.to_datetime(df['momento']).dt.floor(resolucao))
+    chaves = ['ativo_id', 'inicio']
+    barras = df.sort_values('primeiro_em', kind='stable').groupby(chaves, sort=False).agg(
+        abertura=('abertura', 'first'),
+        maximo=('maximo', 'max'),
+        minimo=('minimo', 'min'),
+        pontos=('pontos', 'sum'),
+        primeiro_em=('primeiro_em', 'min'),
+        ultimo_em=('ultimo_em', 'max'),
+    )
+    barras['fechamento'] = df.sort_values('ultimo_em', kind='stable').groupby(chaves)['fechamento'].last()
+    return barras.reset_index()[chaves + COLUNAS_BARRA].sort_values('inicio', kind='stable', ignore_index=True)
+
+
+def _barras_de_cotacoes(df: pd.DataFrame) -> pd.DataFrame:
+    momento = pd.to_datetime(df['momento'])
+    return df.assign(
+        abertura=df['preco'], maximo=df['preco'], minimo=df['preco'], fechamento=df['preco'], pontos=1,
+        primeiro_em=momento, ultimo_em=momento,
+    )
+
+
+def _gravar_barras(session, barras: pd.DataFrame, resolucao: str) -> int:
+    """
+    Insere as barras; barras já existentes no mesmo intervalo (cotações que chegaram depois de
+    uma compactação) são combinadas com as novas e regravadas.
+    """
+    if barras.empty:
+        return 0
+    existentes = pd.read_sql(
+        _selecionar_barras().add_columns(BarraIntraday.id)
+        .where(
+            BarraIntraday.resolucao == resolucao,
+            BarraIntraday.ativo_id.in_(barras['ativo_id'].unique().tolist()),
+            BarraIntraday.inicio.between(barras['inicio'].min().to_pydatetime(), barras['inicio'].max().to_pydatetime()),
+        ),
+        session.connection(),
+    )
+    if not existentes.empty:
+        existentes = _momentos_reais(existentes)
+        chaves = pd.MultiIndex.from_frame(barras[['ativo_id', 'inicio']])
+        sobrepostas = existentes[pd.MultiIndex.from_frame(existentes[['ativo_id', 'momento']]).isin(chaves)]
+        if not sobrepostas.empty:
+            session.execute(delete(BarraIntraday).where(BarraIntraday.id.in_(sobrepostas['id'].tolist())))
+            barras = _agregar(
+                pd.concat([sobrepostas.drop(columns='id'), barras.rename(columns={'inicio': 'momento'})], ignore_index=True),
+                resolucao,
+            )
+    registros = barras.assign(
+        resolucao=resolucao, **{c: barras[c].astype(object) for c in ('inicio', 'primeiro_em', 'ultimo_em')}
+    ).to_dict('records')
+    session.execute(insert(BarraIntraday), registros)
+    return len(registros)
+
+
+@cronometrado('intraday_compactacao')
+def compactar_intraday(agora: datetime.datetime = None, retencao: dict = None) -> dict:
+    """
+    Compacta a série intraday em uma única transação: cotações brutas mais antigas que a retenção
+    viram barras de 5 minutos, barras de 5 minutos antigas viram barras de 1 hora e barras de
+    1 hora além da retenção são apagadas. Os cortes são alinhados à hora cheia, para que nenhuma
+    barra fique parcial.
+    Returns:
+        dict: Quantidades compactadas e apagadas por camada.
+    """
+    agora = agora or datetime.datetime.now()
+    retencao = {**RETENCAO_DIAS, **(retencao or {})}
+    corte_bruto = pd.Timestamp(agora - datetime.timedelta(days=retencao['bruto'])).floor('1h').to_pydatetime()
+    corte_5min = pd.Timestamp(agora - datetime.timedelta(days=retencao['5min'])).floor('1h').to_pydatetime()
+    corte_1h = agora - datetime.timedelta(days=retencao['1h'])
+    resultado = {}
+    session = SessionLocal()
+    try:
+        brutas = pd.read_sql(
+            select(CotacaoIntraday.ativo_id, CotacaoIntraday.momento, CotacaoIntraday.preco)
+            .where(CotacaoIntraday.momento < corte_bruto),
+            session.connection(),
+        )
+        resultado['cotacoes_compactadas'] = len(brutas)
+        resultado['barras_5min'] = _gravar_barras(session, _agregar(_barras_de_cotacoes(brutas), '5min'), '5min') if len(brutas) else 0
+        session.execute(delete(CotacaoIntraday).where(CotacaoIntraday.momento < corte_bruto))
+
+        barras_5min = _momentos_reais(pd.read_sql(
+            _selecionar_barras().where(BarraIntraday.resolucao == '5min', BarraIntraday.inicio < corte_5min),
+            session.connection(),
+        ))
+        resultado['barras_5min_compactadas'] = len(barras_5min)
+        resultado['barras_1h'] = _gravar_barras(session, _agregar(barras_5min, '1h'), '1h') if len(barras_5min) else 0
+        session.execute(delete(BarraIntraday).where(BarraIntraday.resolucao == '5min', BarraIntraday.inicio < corte_5min))
+
+        resultado['barras_1h_apagadas'] = session.execute(
+            delete(BarraIntraday).where(BarraIntraday.resolucao == '1h', BarraIntraday.inicio < corte_1h)
+        ).rowcount
+        verificar_cerca(session)
+        session.commit()
+    finally:
+        session.close()
+    print(f"[intraday] Compactação: {resultado}")
+    return resultado
+
+
+@cronometrado('banco')
+def ler_intraday(ticker: str, inicio: datetime.datetime, fim: datetime.datetime = None, resolucao: str = None) -> pd.DataFrame:
+    """
+    Lê a série intraday do ativo no intervalo, juntando as camadas (barras de 1 hora, barras de
+    5 minutos e cotações brutas), com consultas por faixa nos índices de ativo e momento.
+    Args:
+        inicio (datetime.datetime): Início do intervalo (inclusive).
+        fim (datetime.datetime, opcional): Fim do intervalo (inclusive; padrão: agora).
+        resolucao (str, opcional): Reagrega o resultado em barras dessa resolução (ex: '5min', '1h').
+    Returns:
+        pd.DataFrame: Colunas Hora, Abertura, Máximo, Mínimo, Fechamento, Pontos, ordenadas por Hora.
+    """
+    fim = fim or datetime.datetime.now()
+    with engine.connect() as conn:
+        ativo_id = conn.execute(select(Ativo.id).where(Ativo.ticker == ticker)).scalar()
+        if ativo_id is None:
+            return pd.DataFrame(columns=COLUNAS_LEITURA)
+        barras = pd.read_sql(
+            _selecionar_barras()
+            .where(
+                BarraIntraday.ativo_id == ativo_id,
+                BarraIntraday.resolucao.in_(('5min', '1h')),
+                BarraIntraday.inicio.between(inicio, fim),
+            ),
+            conn,
+        )
+        brutas = pd.read_sql(
+            select(CotacaoIntraday.ativo_id, CotacaoIntraday.momento, CotacaoIntraday.preco)
+            .where(CotacaoIntraday.ativo_id == ativo_id, CotacaoIntraday.momento.between(inicio, fim)),
+            conn,
+        )
+    partes = [p for p in (_momentos_reais(barras), _barras_de_cotacoes(brutas).drop(columns='preco')) if not p.empty]
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_LEITURA)
+    df = pd.concat(partes, ignore_index=True)
+    df['momento'] = pd.to_datetime(df['momento'])
+    if resolucao:
+        df = _agregar(df, resolucao).rename(columns={'inicio': 'momento'})
+    df = df.sort_values('momento').reset_index(drop=True)
+    return df.drop(columns=['ativo_id', 'primeiro_em', 'ultimo_em']).rename(columns={
+        'momento': 'Hora', 'abertura': 'Abertura', 'maximo': 'Máximo', 'minimo': 'Mínimo',
+        'fechamento': 'Fechamento', 'pontos': 'Pontos',
+    })
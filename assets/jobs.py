@@ -0,0 +1,457 @@
+"""
+jobs.py
+-------
+Fila persistente de jobs de background (tabela `jobs`) para o cadastro de ativos e backfills.
+Cada job tem tipo (validar, backfill, preco, analytics), estado (pendente, executando, concluido,
+falhou, cancelado), progresso e tentativas. Um pool de threads reivindica os jobs pendentes com um UPDATE
+condicional, de modo que vários trabalhadores (e processos) não executam o mesmo job. Jobs que
+falham são reagendados com espera exponencial; jobs que estavam executando quando o processo
+morreu (sem heartbeat recente) voltam para a fila na inicialização; enquanto um job executa, uma
+thread do trabalhador renova o heartbeat periodicamente, mesmo sem progresso reportado.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import exists, insert, literal, select, update
+
+from assets.database import SessionLocal, inserir_ativo, listar_ativos, salvar_preco_atual
+from assets.finance_utils import buscar_preco_com_fallback
+from assets.models import Job
+from assets.quotes import snapshot_cotacoes
+from assets.recalculo import coordenador_analytics
+from assets.scrapping import Scraper
+
+TIPOS_JOB = ('validar', 'backfill', 'preco', 'analytics')
+ESTADOS_ATIVOS = ('pendente', 'executando')
+# Espera máxima (s) de um job de analytics pelo recálculo
+ESPERA_ANALYTICS = 600
+
+
+class FalhaDefinitiva(Exception):
+    """
+    Falha que não adianta repetir (ex.: ticker inexistente); o job vai direto para 'falhou'.
+    """
+
+
+class JobCancelado(Exception):
+    """
+    O job deixou de pertencer ao trabalhador durante a execução (cancelado pela remoção do ativo
+    ou devolvido à fila como órfão); a execução é interrompida sem finalizar o job.
+    """
+
+
+def _job_para_dict(job: Job) -> dict:
+    return {
+        'id': job.id,
+        'tipo': job.tipo,
+        'ticker': job.ticker,
+        'parametros': json.loads(job.parametros) if job.parametros else {},
+        'estado': job.estado,
+        'progresso': job.progresso or 0.0,
+        'mensagem': job.mensagem,
+        'tentativas': job.tentativas,
+        'trabalhador': job.trabalhador,
+        'max_tentativas': job.max_tentativas,
+        'criado_em': job.criado_em,
+        'iniciado_em': job.iniciado_em,
+        'concluido_em': job.concluido_em,
+    }
+
+
+def enfileirar_job(tipo: str, ticker: str = None, parametros: dict = None, max_tentativas: int = 3) -> int:
+    """
+    Enfileira um job. Se já houver um job pendente ou executando com o mesmo tipo, ticker e
+    parâmetros, retorna o id dele em vez de criar outro. A verificação e a inserção são um único
+    INSERT condicional, então enfileiramentos simultâneos (threads ou processos) não duplicam o job.
+    Returns:
+        int: Id do job.
+    """
+    if tipo not in TIPOS_JOB:
+        raise ValueError(f"Tipo de job inválido: {tipo}")
+    parametros_json = json.dumps(parametros, sort_keys=True) if parametros else None
+    mesmo_job = (
+        Job.tipo == tipo, Job.ticker == ticker, Job.parametros == parametros_json, Job.estado.in_(ESTADOS_ATIVOS)
+    )
+    novo = select(
+        literal(tipo), literal(ticker, Job.ticker.type), literal(parametros_json, Job.parametros.type),
+        literal('pendente'), literal(0.0), literal(0), literal(max_tentativas)
+    ).where(~exists().where(*mesmo_job))
+    session = SessionLocal()
+    try:
+        resultado = session.execute(insert(Job).from_select(
+            ['tipo', 'ticker', 'parametros', 'estado', 'progresso', 'tentativas', 'max_tentativas'], novo
+        ))
+        if resultado.rowcount == 1:
+            job_id = resultado.lastrowid
+        else:
+            job_id = session.query(Job.id).filter(*mesmo_job).order_by(Job.id).first()[0]
+        session.commit()
+        return job_id
+    finally:
+        session.close()
+
+
+def listar_jobs(limite: int = 20, apenas_ativos: bool = False) -> list:
+    """
+    Lista os jobs mais recentes (ou só os pendentes/executando) como dicts.
+    """
+    session = SessionLocal()
+    try:
+        consulta = session.query(Job)
+        if apenas_ativos:
+            consulta = consulta.filter(Job.estado.in_(ESTADOS_ATIVOS))
+        return [_job_para_dict(j) for j in consulta.order_by(Job.id.desc()).limit(limite).all()]
+    finally:
+        session.close()
+
+
+def ticker_em_cadastro(ticker: str) -> bool:
+    """
+    Indica se há job de cadastro (validação ou backfill, inclusive em lote) pendente ou executando para o ticker.
+    """
+    session = SessionLocal()
+    try:
+        if session.query(Job.id).filter(
+            Job.ticker == ticker, Job.tipo.in_(('validar', 'backfill')), Job.estado.in_(ESTADOS_ATIVOS)
+        ).first() is not None:
+            return True
+        lotes = session.query(Job.parametros).filter(
+            Job.ticker.is_(None), Job.tipo == 'backfill', Job.parametros.isnot(None), Job.estado.in_(ESTADOS_ATIVOS)
+        ).all()
+        return any(ticker in (json.loads(p).get('tickers') or []) for (p,) in lotes)
+    finally:
+        session.close()
+
+
+def atualizar_progresso(job_id: int, progresso: float, mensagem: str = None, trabalhador: str = None) -> bool:
+    """
+    Grava o progresso (0 a 1) do job e renova o heartbeat, se ele ainda estiver executando
+    (com o trabalhador informado, quando houver).
+    Returns:
+        bool: False se o job não está mais em execução (ex: cancelado).
+    """
+    condicoes = [Job.id == job_id, Job.estado == 'executando']
+    if trabalhador is not None:
+        condicoes.append(Job.trabalhador == trabalhador)
+    session = SessionLocal()
+    try:
+        resultado = session.execute(
+            update(Job).where(*condicoes).values(
+                progresso=progresso, mensagem=mensagem, heartbeat_em=datetime.datetime.now()
+            )
+        )
+        session.commit()
+        return resultado.rowcount == 1
+    finally:
+        session.close()
+
+
+def renovar_heartbeat(job_id: int, trabalhador: str) -> bool:
+    """
+    Renova o heartbeat do job enquanto ele continuar 'executando' com este trabalhador.
+    Returns:
+        bool: False se o job não está mais com o trabalhador (ex: recuperado como órfão).
+    """
+    session = SessionLocal()
+    try:
+        resultado = session.execute(
+            update(Job).where(Job.id == job_id, Job.estado == 'executando', Job.trabalhador == trabalhador).values(
+                heartbeat_em=datetime.datetime.now()
+            )
+        )
+        session.commit()
+        return resultado.rowcount == 1
+    finally:
+        session.close()
+
+
+def recuperar_jobs_orfaos(timeout_heartbeat: int = 300) -> int:
+    """
+    Devolve à fila os jobs 'executando' sem heartbeat há mais de `timeout_heartbeat` segundos
+    (processo encerrado no meio da execução).
+    Returns:
+        int: Número de jobs recuperados.
+    """
+    limite = datetime.datetime.now() - datetime.timedelta(seconds=timeout_heartbeat)
+    session = SessionLocal()
+    try:
+        resultado = session.execute(
+            update(Job).where(Job.estado == 'executando', Job.heartbeat_em < limite).values(
+                estado='pendente', trabalhador=None, mensagem='Retomado após reinício',
+                proxima_tentativa_em=datetime.datetime.now()
+            )
+        )
+        session.commit()
+        if resultado.rowcount:
+            print(f"[jobs] {resultado.rowcount} job(s) interrompido(s) devolvido(s) à fila.")
+        return resultado.rowcount
+    finally:
+        session.close()
+
+
+def _reivindicar_job(trabalhador: str):
+    """
+    Marca como 'executando' o próximo job pendente e vencido. O UPDATE só afeta o job se ele ainda
+    estiver pendente, então dois trabalhadores nunca pegam o mesmo job.
+    Returns:
+        dict|None: Job reivindicado.
+    """
+    session = SessionLocal()
+    try:
+        agora = datetime.datetime.now()
+        candidatos = session.query(Job.id).filter(
+            Job.estado == 'pendente', Job.proxima_tentativa_em <= agora
+        ).order_by(Job.proxima_tentativa_em, Job.id).limit(5).all()
+        for (job_id,) in candidatos:
+            resultado = session.execute(
+                update(Job).where(Job.id == job_id, Job.estado == 'pendente').values(
+                    estado='executando', trabalhador=trabalhador, iniciado_em=agora, heartbeat_em=agora,
+                    tentativas=Job.tentativas + 1
+                )
+            )
+            session.commit()
+            if resultado.rowcount == 1:
+                return _job_para_dict(session.get(Job, job_id))
+        return None
+    finally:
+        session.close()
+
+
+def _finalizar_job(job: dict, erro: Exception = None, espera_base: int = 30) -> None:
+    """
+    Conclui o job ou registra a falha, reagendando-o com espera exponencial enquanto houver tentativas.
+    Só altera o job se ele ainda estiver executando com este trabalhador (não desfaz um cancelamento).
+    """
+    agora = datetime.datetime.now()
+    if erro is None:
+        valores = dict(estado='concluido', progresso=1.0, concluido_em=agora)
+    elif isinstance(erro, FalhaDefinitiva) or job['tentativas'] >= job['max_tentativas']:
+        valores = dict(estado='falhou', mensagem=str(erro), concluido_em=agora)
+    else:
+        espera = espera_base * 2 ** (job['tentativas'] - 1)
+        valores = dict(
+            estado='pendente', trabalhador=None, mensagem=f"Tentativa {job['tentativas']} falhou: {erro}",
+            proxima_tentativa_em=agora + datetime.timedelta(seconds=espera)
+        )
+    session = SessionLocal()
+    try:
+        session.execute(update(Job).where(
+            Job.id == job['id'], Job.estado == 'executando', Job.trabalhador == job['trabalhador']
+        ).values(**valores))
+        session.commit()
+    finally:
+        session.close()
+
+
+# === Execução dos tipos de job ===
+
+def _salvar_cotacao(ticker: str, dados: dict) -> None:
+    salvar_preco_atual(
+        ticker,
+        preco=dados['preco'],
+        variacao=dados['variacao'],
+        variacao_percentual=dados['variacao_percentual'],
+        atualizado_em=None
+    )
+    snapshot_cotacoes.publicar([{'ticker': ticker, **dados, 'atualizado_em': datetime.datetime.now()}])
+
+
+def executar_validar(job: dict, progresso) -> None:
+    """
+    Valida o ticker pela cotação atual; se existir, cadastra o ativo, salva o preço e enfileira o backfill.
+    """
+    ticker = job['ticker']
+    progresso(0.1, 'Validando ticker')
+    dados = buscar_preco_com_fallback(ticker)
+    if dados['preco'] is None:
+        raise FalhaDefinitiva(f"Ticker '{ticker}' não encontrado ou sem dados válidos.")
+    # Interrompe aqui se o ativo foi removido durante a validação
+    progresso(0.8, 'Cadastrando ativo')
+    inserir_ativo(ticker)
+    _salvar_cotacao(ticker, dados)
+    enfileirar_job('backfill', ticker, {'periodos': job['parametros'].get('periodos', '5Y')})
+
+
+def executar_backfill(job: dict, progresso) -> None:
+    """
+    Coleta o histórico do ativo (ou do lote em parametros['tickers']) e enfileira o recálculo do analytics.
+    Tickers removidos antes ou durante a coleta são ignorados (não voltam a ser cadastrados).
+    """
+    periodos = job['parametros'].get('periodos', '5Y')
+    cadastrados = {a.ticker for a in listar_ativos()}
+    tickers = [t for t in job['parametros'].get('tickers') or [job['ticker']] if t in cadastrados]
+    if not tickers:
+        return
+    progresso(0.05, 'Coletando histórico')
+    Scraper(headless=True).coletar_e_salvar_historico_ativos(
+        tickers, periodos=periodos, progresso=lambda fracao, descricao: progresso(fracao * 0.95, descricao),
+        cadastrar=False
+    )
+    enfileirar_job('analytics')
+
+
+def executar_preco(job: dict, progresso) -> None:
+    """
+    Busca e salva a cotação atual do ativo.
+    """
+    dados = buscar_preco_com_fallback(job['ticker'])
+    if dados['preco'] is None:
+        raise RuntimeError('Cotação indisponível')
+    _salvar_cotacao(job['ticker'], dados)
+
+
+def executar_analytics(job: dict, progresso) -> None:
+    """
+    Pede o recálculo do analytics e dos snapshots ao coordenador do processo e espera a execução
+    que atendeu o pedido: jobs de vários backfills concluídos juntos compartilham um recálculo.
+    """
+    progresso(0.1, 'Aguardando recálculo do analytics')
+    numero = coordenador_analytics.solicitar(f"job {job['id']}")
+    # Resultado da execução que atendeu este pedido (não o da última execução de outro pedido)
+    erro = coordenador_analytics.aguardar(numero, timeout=ESPERA_ANALYTICS)
+    if erro:
+        raise RuntimeError(erro)
+
+
+EXECUTORES = {
+    'validar': executar_validar,
+    'backfill': executar_backfill,
+    'preco': executar_preco,
+    'analytics': executar_analytics,
+}
+
+
+class FilaJobs:
+    """
+    Pool de threads que consome a fila persistente de jobs.
+    """
+
+    nome = 'jobs'
+
+    def __init__(self, trabalhadores: int = 3, intervalo_poll: float = 1.0, timeout_heartbeat: int = 300, permitir=None):
+        """
+        Args:
+            trabalhadores (int): Número de threads (jobs executados em paralelo).
+            intervalo_poll (float): Intervalo (s) entre consultas à fila quando ociosa.
+            timeout_heartbeat (int): Segundos sem heartbeat para considerar um job órfão.
+            permitir (callable, opcional): Consultado antes de reivindicar cada job; enquanto retornar
+                False (ex: o processo não é o líder), os trabalhadores não pegam jobs.
+        """
+        self.trabalhadores = trabalhadores
+        self.permitir = permitir
+        self.intervalo_poll = intervalo_poll
+        self.timeout_heartbeat = timeout_heartbeat
+        self.execucoes = 0
+        self.ultimo_inicio = None
+        self.ultima_duracao = None
+        self.ultimo_erro = None
+        self._threads = []
+        self._acordar = threading.Event()
+        self._lock = threading.Lock()
+
+    def iniciar(self) -> None:
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            if not self._threads:
+                recuperar_jobs_orfaos(self.timeout_heartbeat)
+            # Índices livres: o nome identifica o trabalhador no heartbeat dos jobs
+            em_uso = {t.name for t in self._threads}
+            livres = (i for i in range(self.trabalhadores * 2) if f'servico-jobs-{i}' not in em_uso)
+            for _, i in zip(range(len(self._threads), self.trabalhadores), livres):
+                nome = f'{os.getpid()}-jobs-{i}'
+                t = threading.Thread(target=self._trabalhar, args=(nome,), name=f'servico-jobs-{i}', daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def enfileirar(self, tipo: str, ticker: str = None, parametros: dict = None) -> int:
+        """
+        Enfileira um job e acorda os trabalhadores ociosos.
+        """
+        job_id = enfileirar_job(tipo, ticker, parametros)
+        self._acordar.set()
+        return job_id
+
+    def _trabalhar(self, nome: str) -> None:
+        while True:
+            if self.permitir is not None and not self.permitir():
+                self._acordar.wait(self.intervalo_poll)
+                self._acordar.clear()
+                continue
+            try:
+                job = _reivindicar_job(nome)
+            except Exception as e:
+                print(f"[jobs] Erro ao consultar a fila: {e}")
+                job = None
+            if job is None:
+                self._acordar.wait(self.intervalo_poll)
+                self._acordar.clear()
+                continue
+            self._executar(job)
+
+    def _manter_heartbeat(self, job: dict, encerrado: threading.Event, cancelado: threading.Event) -> None:
+        # Renova várias vezes dentro do timeout, para que um atraso não torne o job órfão
+        while not encerrado.wait(self.timeout_heartbeat / 5):
+            try:
+                if not renovar_heartbeat(job['id'], job['trabalhador']):
+                    print(f"[jobs] Job {job['id']} não está mais com {job['trabalhador']}; heartbeat encerrado.")
+                    cancelado.set()
+                    return
+            except Exception as e:
+                print(f"[jobs] Erro ao renovar o heartbeat do job {job['id']}: {e}")
+
+    def _executar(self, job: dict) -> None:
+        self.ultimo_inicio = datetime.datetime.now()
+        inicio = time.monotonic()
+        print(f"[jobs] Executando job {job['id']} ({job['tipo']} {job['ticker'] or ''}), tentativa {job['tentativas']}.")
+
+        encerrado, cancelado = threading.Event(), threading.Event()
+
+        def progresso(fracao: float, mensagem: str = None) -> None:
+            # Cada progresso também serve de cerca: um job cancelado para no próximo passo
+            if cancelado.is_set() or not atualizar_progresso(job['id'], fracao, mensagem, job['trabalhador']):
+                raise JobCancelado(f"Job {job['id']} cancelado ou devolvido à fila")
+
+        heartbeat = threading.Thread(
+            target=self._manter_heartbeat, args=(job, encerrado, cancelado), name=f"heartbeat-job-{job['id']}", daemon=True
+        )
+        heartbeat.start()
+        erro = None
+        try:
+            EXECUTORES[job['tipo']](job, progresso)
+        except JobCancelado as e:
+            print(f"[jobs] {e}; execução interrompida.")
+        except Exception as e:
+            erro = e
+            self.ultimo_erro = repr(e)
+            print(f"[jobs] Job {job['id']} ({job['tipo']}) falhou: {e}")
+        finally:
+            encerrado.set()
+            heartbeat.join()
+        try:
+            _finalizar_job(job, erro)
+        except Exception as e:
+            print(f"[jobs] Não foi possível finalizar o job {job['id']}: {e}")
+        # Jobs encadeados (backfill, analytics) podem ter sido enfileirados
+        self._acordar.set()
+        self.ultima_duracao = time.monotonic() - inicio
+        self.execucoes += 1
+
+    def estado(self) -> dict:
+        vivas = sum(t.is_alive() for t in self._threads)
+        try:
+            pendentes = len(listar_jobs(limite=1000, apenas_ativos=True))
+        except Exception:
+            pendentes = None
+        return {
+            'servico': self.nome,
+            'status': f'{vivas} trabalhador(es)' if vivas else 'parado',
+            'execucoes': self.execucoes,
+            'pendentes': pendentes,
+            'ultimo_inicio': self.ultimo_inicio,
+            'ultima_duracao_s': self.ultima_duracao,
+            'ultimo_erro': self.ultimo_erro,
+        }
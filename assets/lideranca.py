@@ -0,0 +1,234 @@
+"""
+lideranca.py
+------------
+Eleição de líder entre processos do dashboard que compartilham o banco (várias réplicas atrás
+de um balanceador). A concessão (tabela `concessoes`) tem um titular, uma validade renovada por
+heartbeat e um token de cerca incrementado a cada nova aquisição:
+
+- aquisição e renovação são UPDATEs condicionais (como a reivindicação de jobs), então só um
+  processo é titular por vez;
+- o titular renova a cada `ttl / 3` segundos; se parar de renovar (processo morto, travado ou
+  sem acesso ao banco), outro processo assume quando a validade expira;
+- ao assumir, o processo registra o token (`database.definir_cerca`) e as escritas dos serviços
+  de background conferem esse token antes do commit: um líder antigo que volte depois de uma
+  pausa tem as escritas rejeitadas (`ConcessaoPerdida`).
+
+A validade é comparada com o relógio de cada processo: o TTL deve ser bem maior que a diferença
+entre os relógios das máquinas.
+"""
+
+import atexit
+import datetime
+import os
+import socket
+import threading
+import uuid
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from assets.database import SessionLocal, definir_cerca
+from assets.models import Concessao
+
+TTL_PADRAO = float(os.environ.get('LIDERANCA_TTL', 30))
+
+
+def identificador_processo() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+
+
+def consultar_concessao(nome: str):
+    """
+    Retorna a concessão como dict (titular, token, heartbeat_em, expira_em) ou None.
+    """
+    session = SessionLocal()
+    try:
+        c = session.get(Concessao, nome)
+        if c is None:
+            return None
+        return {'titular': c.titular, 'token': c.token, 'heartbeat_em': c.heartbeat_em, 'expira_em': c.expira_em}
+    finally:
+        session.close()
+
+
+class Lideranca:
+    """
+    Mantém (ou disputa) a concessão `nome` em uma thread própria e avisa quando o processo
+    assume ou perde a liderança.
+    """
+
+    nome_servico = 'lideranca'
+
+    def __init__(self, nome: str = 'servicos', ttl: float = TTL_PADRAO, ao_assumir=None, ao_perder=None):
+        """
+        Args:
+            nome (str): Nome da concessão.
+            ttl (float): Validade (s) da concessão sem renovação.
+            ao_assumir (callable, opcional): Chamado com o token quando o processo assume.
+            ao_perder (callable, opcional): Chamado quando o processo deixa de ser líder.
+        """
+        self.nome = nome
+        self.ttl = ttl
+        self.titular = identificador_processo()
+        self.ao_assumir = ao_assumir
+        self.ao_perder = ao_perder
+        self.token = None
+        self.ultimo_erro = None
+        self.lider_desde = None
+        self.ultimo_heartbeat = None
+        self._lider = False
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def lider(self) -> bool:
+        return self._lider
+
+    def _garantir_linha(self) -> None:
+        session = SessionLocal()
+        try:
+            if session.get(Concessao, self.nome) is None:
+                session.add(Concessao(nome=self.nome, token=0))
+                session.commit()
+        except IntegrityError:
+            session.rollback()
+        finally:
+            session.close()
+
+    def _tentar_adquirir(self, agora: datetime.datetime) -> bool:
+        """
+        Assume a concessão se ela está livre ou expirada, incrementando o token de cerca.
+        """
+        session = SessionLocal()
+        try:
+            resultado = session.execute(
+                update(Concessao)
+                .where(Concessao.nome == self.nome, or_(Concessao.titular.is_(None), Concessao.expira_em < agora))
+                .values(
+                    titular=self.titular, token=Concessao.token + 1, adquirida_em=agora, heartbeat_em=agora,
+                    expira_em=agora + datetime.timedelta(seconds=self.ttl),
+                )
+            )
+            session.commit()
+            if resultado.rowcount != 1:
+                return False
+            self.token = session.get(Concessao, self.nome).token
+            return True
+        finally:
+            session.close()
+
+    def _renovar(self, agora: datetime.datetime) -> bool:
+        """
+        Renova a validade, desde que ninguém tenha adquirido a concessão desde a nossa aquisição.
+        """
+        session = SessionLocal()
+        try:
+            resultado = session.execute(
+                update(Concessao)
+                .where(Concessao.nome == self.nome, Concessao.titular == self.titular, Concessao.token == self.token)
+                .values(heartbeat_em=agora, expira_em=agora + datetime.timedelta(seconds=self.ttl))
+            )
+            session.commit()
+            return resultado.rowcount == 1
+        finally:
+            session.close()
+
+    def verificar(self) -> bool:
+        """
+        Uma rodada de heartbeat: renova a concessão (líder) ou tenta adquiri-la (seguidor).
+        Returns:
+            bool: Se o processo é o líder após a rodada.
+        """
+        with self._lock:
+            agora = datetime.datetime.now()
+            try:
+                if self._lider:
+                    if self._renovar(agora):
+                        self.ultimo_heartbeat = agora
+                    else:
+                        self._deixar_lideranca("concessão adquirida por outro processo")
+                elif self._tentar_adquirir(agora):
+                    self._lider = True
+                    self.lider_desde = self.ultimo_heartbeat = agora
+                    definir_cerca(self.nome, self.token)
+                    print(f"[lideranca] {self.titular} assumiu a concessão '{self.nome}' (token {self.token}).")
+                    if self.ao_assumir:
+                        self.ao_assumir(self.token)
+                self.ultimo_erro = None
+            except Exception as e:
+                self.ultimo_erro = repr(e)
+                print(f"[lideranca] Erro no heartbeat da concessão '{self.nome}': {e}")
+                # Sem acesso ao banco não há como renovar: deixa de agir como líder antes de expirar
+                if self._lider and agora - self.ultimo_heartbeat > datetime.timedelta(seconds=self.ttl / 2):
+                    self._deixar_lideranca("sem renovar a concessão")
+            return self._lider
+
+    def _deixar_lideranca(self, motivo: str) -> None:
+        # O token continua registrado como cerca: escritas em andamento do líder antigo são rejeitadas
+        self._lider = False
+        self.lider_desde = None
+        print(f"[lideranca] {self.titular} deixou de ser líder da concessão '{self.nome}': {motivo}.")
+        if self.ao_perder:
+            self.ao_perder()
+
+    def _executar(self) -> None:
+        while not self._parar.wait(self.ttl / 3):
+            self.verificar()
+
+    def iniciar(self) -> None:
+        """
+        Faz a primeira rodada de forma síncrona (o processo já sabe se é líder ao retornar) e inicia o heartbeat.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if self._thread is None:
+            atexit.register(self.liberar)
+        self._garantir_linha()
+        self.verificar()
+        self._thread = threading.Thread(target=self._executar, name='servico-lideranca', daemon=True)
+        self._thread.start()
+
+    def liberar(self) -> None:
+        """
+        Encerra o heartbeat e, se líder, expira a concessão imediatamente (outra réplica assume na
+        próxima rodada, sem esperar o TTL).
+        """
+        self._parar.set()
+        with self._lock:
+            if not self._lider:
+                return
+            session = SessionLocal()
+            try:
+                session.execute(
+                    update(Concessao)
+                    .where(Concessao.nome == self.nome, Concessao.titular == self.titular, Concessao.token == self.token)
+                    .values(titular=None, expira_em=datetime.datetime.now())
+                )
+                session.commit()
+            except Exception as e:
+                print(f"[lideranca] Não foi possível liberar a concessão '{self.nome}': {e}")
+            finally:
+                session.close()
+            self._lider = False
+
+    def estado(self) -> dict:
+        try:
+            concessao = consultar_concessao(self.nome) or {}
+        except Exception:
+            concessao = {}
+        if self._lider:
+            status = f"líder (token {self.token})"
+        elif concessao.get('titular'):
+            status = f"seguidor (líder: {concessao['titular']}, token {concessao['token']})"
+        else:
+            status = 'seguidor (sem líder)'
+        return {
+            'servico': self.nome_servico,
+            'status': status,
+            'execucoes': None,
+            'pendentes': 0,
+            'ultimo_inicio': self.lider_desde,
+            'ultima_duracao_s': None,
+            'ultimo_erro': self.ultimo_erro,
+        }
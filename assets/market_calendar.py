@@ -0,0 +1,358 @@
+"""
+market_calendar.py
+------------------
+Calendários de bolsas (horário de pregão de cada dia, fins de semana e feriados) e agendador de
+atualização de preços por ticker conforme o estado do mercado da sua bolsa:
+atualização rápida com o pregão aberto, uma passada final após o fechamento e ociosidade
+até a próxima abertura. Também sinaliza o fechamento de cada bolsa para a sincronização
+de históricos.
+"""
+
+import datetime
+import threading
+import pytz
+from dateutil.easter import easter
+
+
+def _observado_eua(data: datetime.date) -> datetime.date:
+    """
+    Regra de feriado observado da NYSE: sábado -> sexta anterior, domingo -> segunda seguinte.
+    """
+    if data.weekday() == 5:
+        return data - datetime.timedelta(days=1)
+    if data.weekday() == 6:
+        return data + datetime.timedelta(days=1)
+    return data
+
+
+def _n_esimo_dia_semana(ano: int, mes: int, dia_semana: int, n: int) -> datetime.date:
+    """
+    Retorna o n-ésimo dia da semana do mês (n=-1 para o último).
+    """
+    if n > 0:
+        data = datetime.date(ano, mes, 1)
+        data += datetime.timedelta(days=(dia_semana - data.weekday()) % 7)
+        return data + datetime.timedelta(weeks=n - 1)
+    proximo_mes = datetime.date(ano + mes // 12, mes % 12 + 1, 1)
+    data = proximo_mes - datetime.timedelta(days=1)
+    return data - datetime.timedelta(days=(data.weekday() - dia_semana) % 7)
+
+
+def feriados_nyse(ano: int) -> set:
+    """
+    Feriados da NYSE/Nasdaq no ano informado.
+    """
+    pascoa = easter(ano)
+    feriados = {
+        _n_esimo_dia_semana(ano, 1, 0, 3),   # Martin Luther King Jr. Day
+        _n_esimo_dia_semana(ano, 2, 0, 3),   # Washington's Birthday
+        pascoa - datetime.timedelta(days=2),  # Good Friday
+        _n_esimo_dia_semana(ano, 5, 0, -1),  # Memorial Day
+        _observado_eua(datetime.date(ano, 7, 4)),
+        _n_esimo_dia_semana(ano, 9, 0, 1),   # Labor Day
+        _n_esimo_dia_semana(ano, 11, 3, 4),  # Thanksgiving
+        _observado_eua(datetime.date(ano, 12, 25)),
+    }
+    # Ano Novo em sábado não é observado na sexta anterior (regra da NYSE)
+    ano_novo = datetime.date(ano, 1, 1)
+    if ano_novo.weekday() != 5:
+        feriados.add(_observado_eua(ano_novo))
+    if ano >= 2022:
+        feriados.add(_observado_eua(datetime.date(ano, 6, 19)))  # Juneteenth
+    return feriados
+
+
+def feriados_b3(ano: int) -> set:
+    """
+    Feriados (dias sem pregão) da B3 no ano informado.
+    """
+    pascoa = easter(ano)
+    feriados = {
+        datetime.date(ano, 1, 1),
+        pascoa - datetime.timedelta(days=48),  # Carnaval (segunda)
+        pascoa - datetime.timedelta(days=47),  # Carnaval (terça)
+        pascoa - datetime.timedelta(days=2),   # Sexta-feira Santa
+        datetime.date(ano, 4, 21),             # Tiradentes
+        datetime.date(ano, 5, 1),              # Dia do Trabalho
+        pascoa + datetime.timedelta(days=60),  # Corpus Christi
+        datetime.date(ano, 9, 7),              # Independência
+        datetime.date(ano, 10, 12),            # Nossa Senhora Aparecida
+        datetime.date(ano, 11, 2),             # Finados
+        datetime.date(ano, 11, 15),            # Proclamação da República
+        datetime.date(ano, 12, 24),            # Véspera de Natal
+        datetime.date(ano, 12, 25),            # Natal
+        datetime.date(ano, 12, 31),            # Último dia do ano
+    }
+    if ano >= 2024:
+        feriados.add(datetime.date(ano, 11, 20))  # Consciência Negra
+    return feriados
+
+
+def _horario_verao_eua(data: datetime.date) -> bool:
+    return bool(pytz.timezone('America/New_York').localize(datetime.datetime.combine(data, datetime.time(12))).dst())
+
+
+def sessoes_nyse(ano: int) -> dict:
+    """
+    Pregões com horário especial da NYSE/Nasdaq no ano: {data: (abertura, fechamento)}.
+    Fechamento antecipado às 13:00 na véspera da Independência, no dia seguinte ao Thanksgiving
+    e na véspera de Natal (quando essas datas têm pregão).
+    """
+    abertura, antecipado = datetime.time(9, 30), datetime.time(13, 0)
+    sessoes = {
+        _n_esimo_dia_semana(ano, 11, 3, 4) + datetime.timedelta(days=1): (abertura, antecipado),
+        datetime.date(ano, 12, 24): (abertura, antecipado),
+    }
+    # Com o 4 de julho entre terça e sexta, o dia 3 é véspera com pregão
+    if datetime.date(ano, 7, 3).weekday() < 4:
+        sessoes[datetime.date(ano, 7, 3)] = (abertura, antecipado)
+    return sessoes
+
+
+def sessoes_b3(ano: int) -> dict:
+    """
+    Horário do pregão regular da B3 em cada dia do ano: {data: (abertura, fechamento)}.
+    A B3 acompanha o horário de verão dos EUA: fecha às 17:00 com ele em vigor e às 18:00 fora
+    dele. Na Quarta-feira de Cinzas o pregão só abre às 13:00.
+    """
+    sessoes = {}
+    data = datetime.date(ano, 1, 1)
+    while data.year == ano:
+        sessoes[data] = (datetime.time(10, 0), datetime.time(17, 0) if _horario_verao_eua(data) else datetime.time(18, 0))
+        data += datetime.timedelta(days=1)
+    cinzas = easter(ano) - datetime.timedelta(days=46)
+    sessoes[cinzas] = (datetime.time(13, 0), sessoes[cinzas][1])
+    return sessoes
+
+
+class Bolsa:
+    """
+    Calendário de uma bolsa: fuso horário, horário do pregão de cada dia e feriados.
+    """
+
+    def __init__(self, codigo: str, nome: str, fuso: str, abertura: datetime.time, fechamento: datetime.time, feriados, sessoes=None):
+        """
+        Args:
+            codigo (str): Código da bolsa (ex: 'NYSE', 'B3').
+            nome (str): Nome para exibição.
+            fuso (str): Fuso horário (pytz) da bolsa.
+            abertura (datetime.time): Horário de abertura do pregão regular.
+            fechamento (datetime.time): Horário de fechamento do pregão regular.
+            feriados (callable): Função ano -> set de datas sem pregão.
+            sessoes (callable, opcional): Função ano -> {data: (abertura, fechamento)} com os dias de
+                horário diferente do regular (horário de verão, pregões reduzidos).
+        """
+        self.codigo = codigo
+        self.nome = nome
+        self.fuso = pytz.timezone(fuso)
+        self.abertura = abertura
+        self.fechamento = fechamento
+        self._feriados = feriados
+        self._sessoes = sessoes
+        self._cache_feriados = {}
+        self._cache_sessoes = {}
+
+    def agora(self) -> datetime.datetime:
+        """
+        Retorna o horário atual no fuso da bolsa.
+        """
+        return datetime.datetime.now(self.fuso)
+
+    def _local(self, agora: datetime.datetime = None) -> datetime.datetime:
+        if agora is None:
+            return self.agora()
+        return agora.astimezone(self.fuso)
+
+    def feriados(self, ano: int) -> set:
+        if ano not in self._cache_feriados:
+            self._cache_feriados[ano] = self._feriados(ano)
+        return self._cache_feriados[ano]
+
+    def dia_de_pregao(self, data: datetime.date) -> bool:
+        """
+        Indica se há pregão na data (dia útil e não feriado).
+        """
+        return data.weekday() < 5 and data not in self.feriados(data.year)
+
+    def horario(self, data: datetime.date) -> tuple:
+        """
+        Retorna (abertura, fechamento) do pregão na data, no fuso da bolsa.
+        """
+        if self._sessoes is None:
+            return self.abertura, self.fechamento
+        if data.year not in self._cache_sessoes:
+            self._cache_sessoes[data.year] = self._sessoes(data.year)
+        return self._cache_sessoes[data.year].get(data, (self.abertura, self.fechamento))
+
+    def _abertura_em(self, data: datetime.date) -> datetime.datetime:
+        return self.fuso.localize(datetime.datetime.combine(data, self.horario(data)[0]))
+
+    def _fechamento_em(self, data: datetime.date) -> datetime.datetime:
+        return self.fuso.localize(datetime.datetime.combine(data, self.horario(data)[1]))
+
+    def aberta(self, agora: datetime.datetime = None) -> bool:
+        """
+        Indica se o pregão regular está aberto no instante informado (padrão: agora).
+        """
+        local = self._local(agora)
+        if not self.dia_de_pregao(local.date()):
+            return False
+        abertura, fechamento = self.horario(local.date())
+        return abertura <= local.time() <= fechamento
+
+    def proxima_abertura(self, agora: datetime.datetime = None) -> datetime.datetime:
+        """
+        Retorna a próxima abertura do pregão (considerando fins de semana e feriados).
+        """
+        local = self._local(agora)
+        data = local.date()
+        if local.time() >= self.horario(data)[0]:
+            data += datetime.timedelta(days=1)
+        while not self.dia_de_pregao(data):
+            data += datetime.timedelta(days=1)
+        return self._abertura_em(data)
+
+    def proximo_fechamento(self, agora: datetime.datetime = None) -> datetime.datetime:
+        """
+        Retorna o próximo fechamento do pregão.
+        """
+        local = self._local(agora)
+        data = local.date()
+        if local.time() > self.horario(data)[1]:
+            data += datetime.timedelta(days=1)
+        while not self.dia_de_pregao(data):
+            data += datetime.timedelta(days=1)
+        return self._fechamento_em(data)
+
+    def ultimo_fechamento(self, agora: datetime.datetime = None) -> datetime.datetime:
+        """
+        Retorna o fechamento de pregão mais recente já ocorrido.
+        """
+        local = self._local(agora)
+        data = local.date()
+        if local.time() < self.horario(data)[1]:
+            data -= datetime.timedelta(days=1)
+        while not self.dia_de_pregao(data):
+            data -= datetime.timedelta(days=1)
+        return self._fechamento_em(data)
+
+
+BOLSAS = {
+    'NYSE': Bolsa('NYSE', 'NYSE/Nasdaq', 'America/New_York', datetime.time(9, 30), datetime.time(16, 0), feriados_nyse, sessoes_nyse),
+    'B3': Bolsa('B3', 'B3', 'America/Sao_Paulo', datetime.time(10, 0), datetime.time(18, 0), feriados_b3, sessoes_b3),
+}
+
+# Sufixo do ticker (padrão Yahoo Finance) -> bolsa. Tickers sem sufixo são tratados como EUA.
+SUFIXOS_BOLSA = {
+    '.SA': 'B3',
+}
+
+
+def bolsa_do_ticker(ticker: str) -> Bolsa:
+    """
+    Retorna o calendário da bolsa do ticker pelo sufixo (ex: 'BBDC4.SA' -> B3, 'AAPL' -> NYSE).
+    """
+    ticker = ticker.upper()
+    for sufixo, codigo in SUFIXOS_BOLSA.items():
+        if ticker.endswith(sufixo):
+            return BOLSAS[codigo]
+    return BOLSAS['NYSE']
+
+
+class AgendadorPrecos:
+    """
+    Define quais tickers devem ser atualizados a cada rodada do loop de preços, conforme o
+    estado do mercado da bolsa de cada um:
+    - pregão aberto: a cada `intervalo_aberto` segundos;
+    - após o fechamento: uma passada final (após `atraso_pos_fechamento`), depois ocioso;
+    - fechado: nenhuma atualização até a próxima abertura.
+    Também detecta o fechamento de cada bolsa para disparar a sincronização de históricos.
+    """
+
+    def __init__(self, intervalo_aberto: float = 60, atraso_pos_fechamento: datetime.timedelta = datetime.timedelta(minutes=5)):
+        self.intervalo_aberto = datetime.timedelta(seconds=intervalo_aberto)
+        self.atraso_pos_fechamento = atraso_pos_fechamento
+        self._ultima_atualizacao = {}
+        self._ultimo_fechamento_sincronizado = {}
+        self._lock = threading.Lock()
+
+    def estado_ticker(self, ticker: str, agora: datetime.datetime = None) -> str:
+        """
+        Retorna o estado de atualização do ticker: 'aberto', 'pos_fechamento' ou 'ocioso'.
+        """
+        agora = agora or datetime.datetime.now(pytz.utc)
+        bolsa = bolsa_do_ticker(ticker)
+        if bolsa.aberta(agora):
+            return 'aberto'
+        fechamento = bolsa.ultimo_fechamento(agora)
+        with self._lock:
+            ultima = self._ultima_atualizacao.get(ticker)
+        if agora >= fechamento + self.atraso_pos_fechamento and (ultima is None or ultima < fechamento + self.atraso_pos_fechamento):
+            return 'pos_fechamento'
+        return 'ocioso'
+
+    def tickers_devidos(self, tickers: list, agora: datetime.datetime = None) -> list:
+        """
+        Retorna os tickers que devem ser atualizados agora.
+        """
+        agora = agora or datetime.datetime.now(pytz.utc)
+        devidos = []
+        for ticker in tickers:
+            estado = self.estado_ticker(ticker, agora)
+            if estado == 'pos_fechamento':
+                devidos.append(ticker)
+            elif estado == 'aberto':
+                with self._lock:
+                    ultima = self._ultima_atualizacao.get(ticker)
+                # Tolerância de 10% para não perder rodadas por pequenos atrasos do loop
+                if ultima is None or agora - ultima >= self.intervalo_aberto * 0.9:
+                    devidos.append(ticker)
+        return devidos
+
+    def registrar_atualizacao(self, tickers: list, agora: datetime.datetime = None) -> None:
+        """
+        Registra que os tickers foram atualizados no instante informado.
+        """
+        agora = agora or datetime.datetime.now(pytz.utc)
+        with self._lock:
+            for ticker in tickers:
+                self._ultima_atualizacao[ticker] = agora
+
+    def fechamentos_pendentes(self, tickers: list, agora: datetime.datetime = None) -> dict:
+        """
+        Retorna {codigo_bolsa: [tickers]} das bolsas que fecharam desde a última verificação e
+        ainda não tiveram os históricos sincronizados. Na primeira verificação de cada bolsa apenas
+        registra o último fechamento, sem disparar a sincronização.
+        """
+        agora = agora or datetime.datetime.now(pytz.utc)
+        por_bolsa = {}
+        for ticker in tickers:
+            por_bolsa.setdefault(bolsa_do_ticker(ticker).codigo, []).append(ticker)
+        pendentes = {}
+        with self._lock:
+            for codigo, tickers_bolsa in por_bolsa.items():
+                fechamento = BOLSAS[codigo].ultimo_fechamento(agora)
+                if agora < fechamento + self.atraso_pos_fechamento:
+                    continue
+                anterior = self._ultimo_fechamento_sincronizado.get(codigo)
+                self._ultimo_fechamento_sincronizado[codigo] = fechamento
+                if anterior is not None and anterior < fechamento:
+                    pendentes[codigo] = tickers_bolsa
+        return pendentes
+
+    def estado(self, tickers: list, agora: datetime.datetime = None) -> list:
+        """
+        Retorna o estado de agendamento de cada ticker para exibição.
+        """
+        agora = agora or datetime.datetime.now(pytz.utc)
+        with self._lock:
+            ultimas = dict(self._ultima_atualizacao)
+        return [
+            {
+                'ticker': t,
+                'bolsa': bolsa_do_ticker(t).codigo,
+                'estado': self.estado_ticker(t, agora),
+                'ultima_atualizacao': ultimas.get(t),
+            }
+            for t in tickers
+        ]
@@ -0,0 +1,232 @@
+"""
+metrics.py
+----------
+Instrumentação de baixo custo: contadores e histogramas de latência por nome e rótulos.
+Cada histograma tem buckets cumulativos (para a exposição no formato texto do Prometheus)
+e um buffer circular com as amostras mais recentes (para p50/p95 no dashboard). Um resumo
+é gravado periodicamente em `metricas/metricas.jsonl` por uma thread do processo.
+
+Uso:
+    with cronometro('secao_dashboard', secao='graficos'):
+        ...
+
+    @cronometrado('banco')
+    def consultar(...):
+        ...
+"""
+
+import bisect
+import collections
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+PREFIXO = 'pipeline'
+BUCKETS_PADRAO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DIRETORIO_METRICAS = os.environ.get('METRICAS_DIR', 'metricas')
+
+
+class Histograma:
+    """
+    Histograma de durações (s) com buckets cumulativos e buffer circular das últimas amostras.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS_PADRAO, max_amostras: int = 1000):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)
+        self.soma = 0.0
+        self.contagem = 0
+        self.amostras = collections.deque(maxlen=max_amostras)
+
+    def observar(self, valor: float) -> None:
+        self.contagens[bisect.bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.contagem += 1
+        self.amostras.append(valor)
+
+
+class Metricas:
+    """
+    Registro de contadores e histogramas do processo (thread-safe).
+    """
+
+    def __init__(self):
+        self._contadores = collections.defaultdict(float)
+        self._histogramas = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _chave(nome: str, rotulos: dict) -> tuple:
+        return nome, tuple(sorted(rotulos.items()))
+
+    def contar(self, nome: str, valor: float = 1, **rotulos) -> None:
+        with self._lock:
+            self._contadores[self._chave(nome, rotulos)] += valor
+
+    def observar(self, nome: str, segundos: float, **rotulos) -> None:
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(segundos)
+
+    def resumo(self) -> list:
+        """
+        Resumo dos histogramas: contagem, p50, p95, máximo recente e total (s) por métrica e rótulos.
+        """
+        with self._lock:
+            itens = [(chave, h, list(h.amostras)) for chave, h in self._histogramas.items()]
+        linhas = []
+        for (nome, rotulos), h, amostras in itens:
+            p50, p95 = np.percentile(amostras, [50, 95]) if amostras else (None, None)
+            linhas.append({
+                'metrica': nome,
+                'rotulos': ', '.join(f'{k}={v}' for k, v in rotulos),
+                'contagem': h.contagem,
+                'p50_ms': p50 * 1000 if p50 is not None else None,
+                'p95_ms': p95 * 1000 if p95 is not None else None,
+                'max_ms': max(amostras) * 1000 if amostras else None,
+                'total_s': h.soma,
+            })
+        return sorted(linhas, key=lambda l: (l['metrica'], l['rotulos']))
+
+    def contadores(self) -> list:
+        with self._lock:
+            return [
+                {'metrica': nome, 'rotulos': ', '.join(f'{k}={v}' for k, v in rotulos), 'valor': valor}
+                for (nome, rotulos), valor in sorted(self._contadores.items())
+            ]
+
+    def texto_prometheus(self) -> str:
+        """
+        Exposição no formato texto do Prometheus (contadores `_total` e histogramas `_segundos`).
+        """
+        def rotulos_texto(rotulos, extra=()):
+            pares = list(rotulos) + list(extra)
+            return '{' + ','.join(f'{k}="{str(v)}"' for k, v in pares) + '}' if pares else ''
+
+        linhas = []
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            histogramas = sorted(
+                ((chave, list(h.contagens), h.soma, h.contagem, h.buckets) for chave, h in self._histogramas.items()),
+                key=lambda x: x[0]
+            )
+        tipos = set()
+        for (nome, rotulos), valor in contadores:
+            metrica = f'{PREFIXO}_{nome}_total'
+            if metrica not in tipos:
+                linhas.append(f'# TYPE {metrica} counter')
+                tipos.add(metrica)
+            linhas.append(f'{metrica}{rotulos_texto(rotulos)} {valor:g}')
+        for (nome, rotulos), contagens, soma, contagem, buckets in histogramas:
+            metrica = f'{PREFIXO}_{nome}_segundos'
+            if metrica not in tipos:
+                linhas.append(f'# TYPE {metrica} histogram')
+                tipos.add(metrica)
+            acumulado = 0
+            for limite, n in zip(list(buckets) + ['+Inf'], contagens):
+                acumulado += n
+                linhas.append(f'{metrica}_bucket{rotulos_texto(rotulos, [("le", limite)])} {acumulado}')
+            linhas.append(f'{metrica}_sum{rotulos_texto(rotulos)} {soma:.6f}')
+            linhas.append(f'{metrica}_count{rotulos_texto(rotulos)} {contagem}')
+        return '\n'.join(linhas) + '\n'
+
+    def persistir(self, caminho: str = None, max_bytes: int = 5 * 1024 * 1024) -> None:
+        """
+        Acrescenta o resumo atual ao arquivo JSONL (rotacionado ao passar de `max_bytes`).
+        """
+        caminho = caminho or os.path.join(DIRETORIO_METRICAS, 'metricas.jsonl')
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        if os.path.exists(caminho) and os.path.getsize(caminho) > max_bytes:
+            os.replace(caminho, caminho + '.1')
+        registro = {
+            'momento': datetime.datetime.now().isoformat(),
+            'pid': os.getpid(),
+            'histogramas': self.resumo(),
+            'contadores': self.contadores(),
+        }
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + '\n')
+
+
+# Registro do processo
+metricas = Metricas()
+
+
+@contextlib.contextmanager
+def cronometro(nome: str, **rotulos):
+    """
+    Registra a duração do bloco no histograma `nome` (e conta os erros que o atravessam).
+    Só conta `Exception`: o controle de fluxo do Streamlit (`st.rerun`/`st.stop` levantam
+    exceções derivadas de BaseException) e o encerramento do processo não são erros.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metricas.contar('erros', origem=nome, **rotulos)
+        raise
+    finally:
+        metricas.observar(nome, time.perf_counter() - inicio, **rotulos)
+
+
+def cronometrado(nome: str, **rotulos):
+    """
+    Decorador que registra a duração de cada chamada em `nome`, com o rótulo funcao=<nome da função>.
+    """
+    def decorador(fn):
+        @functools.wraps(fn)
+        def envolvida(*args, **kwargs):
+            with cronometro(nome, funcao=fn.__name__, **rotulos):
+                return fn(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+class PersistenciaMetricas:
+    """
+    Thread que grava o resumo das métricas a cada `intervalo` segundos.
+    """
+
+    nome = 'metricas'
+
+    def __init__(self, intervalo: int = 60):
+        self.intervalo = intervalo
+        self.ultima_gravacao = None
+        self.ultimo_erro = None
+        self._thread = None
+
+    def iniciar(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name='servico-metricas', daemon=True)
+            self._thread.start()
+
+    def _executar(self) -> None:
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                metricas.persistir()
+                self.ultima_gravacao = datetime.datetime.now()
+                self.ultimo_erro = None
+            except Exception as e:
+                self.ultimo_erro = repr(e)
+                print(f"[metrics] Não foi possível gravar as métricas: {e}")
+
+    def estado(self) -> dict:
+        return {
+            'servico': self.nome,
+            'status': 'executando' if self._thread and self._thread.is_alive() else 'parado',
+            'execucoes': None,
+            'pendentes': 0,
+            'ultimo_inicio': self.ultima_gravacao,
+            'ultima_duracao_s': None,
+            'ultimo_erro': self.ultimo_erro,
+        }
@@ -2,11 +2,12 @@
 """
 models.py
 ---------
-Modelos ORM para as tabelas do banco de dados: Ativo, Historico, PrecoAtual, AnalyticsCache.
+Modelos ORM para as tabelas do banco de dados: Ativo, Historico, EventoCorporativo, PrecoAtual, CotacaoIntraday,
+BarraIntraday, Posicao, AnalyticsCache, VersaoDados, Job, Concessao.
 """
 
 import datetime
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, DateTime, Text, UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -39,6 +40,40 @@ class PrecoAtual(Base):
     atualizado_em = Column(DateTime)
     ativo = relationship('Ativo')
 
+# Série intraday (somente inserção): cotações brutas e barras compactadas (ver assets.intraday)
+class CotacaoIntraday(Base):
+    """
+    Modelo para uma cotação intraday bruta, gravada a cada ciclo do loop de preços.
+    """
+    __tablename__ = 'cotacoes_intraday'
+    __table_args__ = (Index('ix_cotacoes_intraday_ativo_momento', 'ativo_id', 'momento'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ativo_id = Column(Integer, ForeignKey('ativos.id'), nullable=False)
+    momento = Column(DateTime, nullable=False, index=True)
+    preco = Column(Float, nullable=False)
+
+class BarraIntraday(Base):
+    """
+    Modelo para uma barra intraday (abertura, máximo, mínimo, fechamento) de 5 minutos ou 1 hora.
+    """
+    __tablename__ = 'barras_intraday'
+    __table_args__ = (
+        UniqueConstraint('ativo_id', 'resolucao', 'inicio'),
+        Index('ix_barras_intraday_resolucao_inicio', 'resolucao', 'inicio'),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ativo_id = Column(Integer, ForeignKey('ativos.id'), nullable=False)
+    resolucao = Column(String, nullable=False)  # 5min, 1h
+    inicio = Column(DateTime, nullable=False)
+    abertura = Column(Float, nullable=False)
+    maximo = Column(Float, nullable=False)
+    minimo = Column(Float, nullable=False)
+    fechamento = Column(Float, nullable=False)
+    pontos = Column(Integer, nullable=False)  # Cotações brutas agregadas na barra
+    # Momento real da primeira e da última cotação da barra (de onde vêm a abertura e o fechamento)
+    primeiro_em = Column(DateTime, nullable=True)
+    ultimo_em = Column(DateTime, nullable=True)
+
 # Exemplo de tabela de ativos
 class Ativo(Base):
     """
@@ -60,8 +95,83 @@ class Historico(Base):
     data = Column(Date, nullable=False)
     preco_abertura = Column(Float)
     preco_fechamento = Column(Float)
+    preco_fechamento_ajustado = Column(Float)  # Ajustado por proventos e desdobramentos
     maximo = Column(Float)
     minimo = Column(Float)
     volume = Column(Float)
     ativo = relationship('Ativo', back_populates='historicos')
 
+# Eventos corporativos (proventos e desdobramentos) e o fator de ajuste de cada um
+class EventoCorporativo(Base):
+    """
+    Modelo para um provento ou desdobramento de um ativo. `fator` multiplica os preços
+    anteriores à data do evento (ex: desdobramento 2:1 -> 0.5).
+    """
+    __tablename__ = 'eventos_corporativos'
+    __table_args__ = (UniqueConstraint('ativo_id', 'data', 'tipo'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ativo_id = Column(Integer, ForeignKey('ativos.id'), nullable=False)
+    data = Column(Date, nullable=False)
+    tipo = Column(String, nullable=False)  # dividendo, desdobramento
+    valor = Column(Float, nullable=False)  # Valor por ação (dividendo) ou proporção novas/antigas (desdobramento)
+    fator = Column(Float, nullable=True)
+    aplicado_em = Column(DateTime, default=datetime.datetime.now)
+
+# Posições da carteira (uma por ativo), usadas na análise de risco (ver assets.carteira)
+class Posicao(Base):
+    """
+    Modelo para a posição da carteira em um ativo: quantidade de ações e peso alvo opcional.
+    """
+    __tablename__ = 'posicoes'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ativo_id = Column(Integer, ForeignKey('ativos.id'), nullable=False, unique=True)
+    quantidade = Column(Float, nullable=True)
+    peso_alvo = Column(Float, nullable=True)  # Fração da carteira (0.1 = 10%)
+    atualizado_em = Column(DateTime, default=datetime.datetime.now)
+    ativo = relationship('Ativo')
+
+# Versões dos dados (incrementadas a cada ingestão, usadas para invalidar caches de leitura)
+class VersaoDados(Base):
+    """
+    Modelo para a versão de um conjunto de dados (ex: 'ativos', 'analytics', 'historicos:BBDC4.SA').
+    """
+    __tablename__ = 'versoes_dados'
+    chave = Column(String, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime, default=datetime.datetime.now)
+
+# Fila persistente de jobs de background (validação, backfill, preço, analytics)
+class Job(Base):
+    """
+    Modelo para um job da fila de background.
+    """
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tipo = Column(String, nullable=False, index=True)  # Ex: validar, backfill, preco, analytics
+    ticker = Column(String, nullable=True)
+    parametros = Column(Text, nullable=True)  # JSON
+    estado = Column(String, nullable=False, default='pendente', index=True)  # pendente, executando, concluido, falhou
+    progresso = Column(Float, default=0.0)
+    mensagem = Column(String, nullable=True)
+    tentativas = Column(Integer, default=0)
+    max_tentativas = Column(Integer, default=3)
+    trabalhador = Column(String, nullable=True)
+    criado_em = Column(DateTime, default=datetime.datetime.now)
+    proxima_tentativa_em = Column(DateTime, default=datetime.datetime.now)
+    iniciado_em = Column(DateTime, nullable=True)
+    heartbeat_em = Column(DateTime, nullable=True)
+    concluido_em = Column(DateTime, nullable=True)
+
+# Concessão (lease) de liderança entre processos que compartilham o banco (ver assets.lideranca)
+class Concessao(Base):
+    """
+    Modelo para uma concessão com titular, validade renovada por heartbeat e token de cerca
+    (incrementado a cada nova aquisição).
+    """
+    __tablename__ = 'concessoes'
+    nome = Column(String, primary_key=True)  # Ex: servicos
+    titular = Column(String, nullable=True)
+    token = Column(Integer, nullable=False, default=0)
+    adquirida_em = Column(DateTime, nullable=True)
+    heartbeat_em = Column(DateTime, nullable=True)
+    expira_em = Column(DateTime, nullable=True)
@@ -0,0 +1,236 @@
+"""
+profiling.py
+------------
+Perfilamento sob demanda de reruns do dashboard e de ciclos de preços do loop de background.
+Usa um amostrador de pilhas (`sys._current_frames`) em uma thread própria, que enxerga também
+as threads do executor de buscas. Só são mantidas as amostras em que há código do projeto na
+pilha, o que descarta threads ociosas. Cada perfil é gravado em `perfis/<alvo>-<momento>.json`
+com o contexto (ticker, período, número de tickers) e as pilhas no formato "collapsed"
+(flamegraph.pl, speedscope).
+
+Ativação (desligado por padrão, sem custo além de uma consulta a um dicionário):
+    PERFILAMENTO=dashboard,precos streamlit run streamlit_app.py   # todos os reruns/ciclos
+    http://localhost:8501/?perfil=1                                 # reruns desta sessão
+    perfilador.solicitar('precos')                                  # próximo ciclo de preços
+"""
+
+import collections
+import datetime
+import glob
+import json
+import os
+import sys
+import threading
+import time
+
+ALVOS = ('dashboard', 'precos')
+DIRETORIO_PERFIS = os.environ.get('PERFIS_DIR', 'perfis')
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rotulo(codigo) -> str:
+    caminho = codigo.co_filename
+    if caminho.startswith(RAIZ):
+        caminho = os.path.relpath(caminho, RAIZ)
+    else:
+        caminho = os.path.join(*caminho.split(os.sep)[-2:])
+    return f'{codigo.co_name} ({caminho}:{codigo.co_firstlineno})'
+
+
+class Amostrador:
+    """
+    Amostra as pilhas das threads `threads()` a cada `intervalo` segundos até `encerrar()`
+    (ou até `duracao_maxima`, caso o rerun seja interrompido antes de encerrar o perfil).
+    """
+
+    def __init__(self, alvo: str, threads, intervalo: float = 0.005, duracao_maxima: float = 120.0):
+        self.alvo = alvo
+        self.threads = threads
+        self.intervalo = intervalo
+        self.duracao_maxima = duracao_maxima
+        self.pilhas = collections.Counter()
+        self.leituras = 0
+        self.momento = datetime.datetime.now()
+        self._parar = threading.Event()
+        self._inicio = time.perf_counter()
+        self._fim = None
+        self._thread = threading.Thread(target=self._executar, name=f'perfil-{alvo}', daemon=True)
+        self._thread.start()
+
+    def _executar(self) -> None:
+        proprio = os.path.abspath(__file__)
+        while not self._parar.wait(self.intervalo):
+            if time.perf_counter() - self._inicio > self.duracao_maxima:
+                break
+            quadros = sys._current_frames()
+            self.leituras += 1
+            for ident in self.threads():
+                quadro = quadros.get(ident)
+                pilha = []
+                do_projeto = False
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    if codigo.co_filename.startswith(RAIZ) and codigo.co_filename != proprio:
+                        do_projeto = True
+                    pilha.append(_rotulo(codigo))
+                    quadro = quadro.f_back
+                if do_projeto:
+                    self.pilhas[';'.join(reversed(pilha))] += 1
+        self._fim = time.perf_counter()
+
+    def encerrar(self, contexto: dict = None) -> str:
+        """
+        Para a amostragem e grava o perfil.
+        Returns:
+            str: Caminho do arquivo gravado.
+        """
+        self._parar.set()
+        self._thread.join()
+        perfil = {
+            'alvo': self.alvo,
+            'momento': self.momento.isoformat(),
+            'contexto': contexto or {},
+            'duracao_s': self._fim - self._inicio,
+            'intervalo_s': self.intervalo,
+            'leituras': self.leituras,
+            'amostras': sum(self.pilhas.values()),
+            'pilhas': dict(self.pilhas.most_common()),
+        }
+        return salvar_perfil(perfil)
+
+
+class Perfilador:
+    """
+    Decide quais reruns/ciclos são perfilados: alvos sempre ligados pela variável de ambiente
+    PERFILAMENTO (lista separada por vírgulas, ou "todos") e pedidos avulsos via `solicitar`.
+    """
+
+    def __init__(self, ativos: str = None):
+        ativos = ativos if ativos is not None else os.environ.get('PERFILAMENTO', '')
+        nomes = {a.strip() for a in ativos.split(',') if a.strip()}
+        self.sempre = set(ALVOS) if nomes & {'1', 'todos'} else nomes & set(ALVOS)
+        self.pedidos = collections.Counter()
+        self._lock = threading.Lock()
+
+    def solicitar(self, alvo: str, vezes: int = 1) -> None:
+        with self._lock:
+            self.pedidos[alvo] += vezes
+
+    def pendentes(self, alvo: str) -> int:
+        return self.pedidos[alvo]
+
+    def deve_perfilar(self, alvo: str) -> bool:
+        """
+        True se o alvo está sempre ligado ou há um pedido pendente (que é consumido).
+        """
+        if alvo in self.sempre:
+            return True
+        if not self.pedidos:
+            return False
+        with self._lock:
+            if self.pedidos[alvo] > 0:
+                self.pedidos[alvo] -= 1
+                if not self.pedidos[alvo]:
+                    del self.pedidos[alvo]
+                return True
+        return False
+
+    def iniciar(self, alvo: str, threads=None, forcar: bool = False):
+        """
+        Inicia a amostragem do alvo se ele deve ser perfilado (ou se `forcar`).
+        Args:
+            threads (callable, opcional): Retorna os idents das threads a amostrar (padrão: a thread atual).
+        Returns:
+            Amostrador|None: Amostrador em execução, ou None se o perfilamento está desligado.
+        """
+        if not (forcar or self.deve_perfilar(alvo)):
+            return None
+        if threads is None:
+            ident = threading.get_ident()
+            threads = lambda: (ident,)
+        return Amostrador(alvo, threads)
+
+
+# Perfilador do processo
+perfilador = Perfilador()
+
+
+def threads_com_prefixo(prefixo: str, incluir_atual: bool = True):
+    """
+    Retorna uma função com os idents das threads cujo nome começa com `prefixo` (e da thread atual).
+    """
+    atual = threading.get_ident()
+
+    def threads():
+        idents = {t.ident for t in threading.enumerate() if t.name.startswith(prefixo)}
+        if incluir_atual:
+            idents.add(atual)
+        return idents
+    return threads
+
+
+def salvar_perfil(perfil: dict, manter: int = 50) -> str:
+    """
+    Grava o perfil em JSON e mantém apenas os `manter` mais recentes.
+    """
+    os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+    momento = datetime.datetime.fromisoformat(perfil['momento']).strftime('%Y%m%d-%H%M%S-%f')
+    caminho = os.path.join(DIRETORIO_PERFIS, f"{perfil['alvo']}-{momento}.json")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(perfil, f)
+    for antigo in listar_perfis()[manter:]:
+        try:
+            os.remove(antigo)
+        except OSError:
+            pass
+    print(f"[profiling] Perfil de {perfil['alvo']} gravado em {caminho} ({perfil['amostras']} amostras, {perfil['duracao_s']:.2f}s).")
+    return caminho
+
+
+def listar_perfis() -> list:
+    """
+    Caminhos dos perfis gravados, do mais recente para o mais antigo.
+    """
+    caminhos = glob.glob(os.path.join(DIRETORIO_PERFIS, '*.json'))
+    return sorted(caminhos, key=lambda c: os.path.basename(c).split('-', 1)[1], reverse=True)
+
+
+def ler_perfil(caminho: str):
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def funcoes_mais_custosas(perfil: dict, top: int = 20) -> list:
+    """
+    Funções com mais amostras próprias (no topo da pilha), com as acumuladas (em qualquer ponto
+    da pilha) e o tempo estimado a partir da duração do perfil.
+    """
+    proprio = collections.Counter()
+    acumulado = collections.Counter()
+    for pilha, n in perfil['pilhas'].items():
+        quadros = pilha.split(';')
+        proprio[quadros[-1]] += n
+        for quadro in set(quadros):
+            acumulado[quadro] += n
+    total = perfil['amostras'] or 1
+    ms_por_leitura = 1000 * perfil['duracao_s'] / (perfil['leituras'] or 1)
+    return [
+        {
+            'funcao': funcao,
+            'proprio_%': 100 * n / total,
+            'acumulado_%': 100 * acumulado[funcao] / total,
+            'proprio_ms': n * ms_por_leitura,
+            'acumulado_ms': acumulado[funcao] * ms_por_leitura,
+        }
+        for funcao, n in proprio.most_common(top)
+    ]
+
+
+def texto_collapsed(perfil: dict) -> str:
+    """
+    Pilhas no formato "collapsed" (uma linha "a;b;c contagem" por pilha), para flamegraph.pl/speedscope.
+    """
+    return ''.join(f'{pilha} {n}\n' for pilha, n in perfil['pilhas'].items())
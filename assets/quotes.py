@@ -0,0 +1,101 @@
+"""
+quotes.py
+---------
+Snapshot em memória das cotações atuais, compartilhado pelas sessões do processo.
+O loop de preços publica cada lote gravado no banco; o dashboard lê o snapshot sem
+consultar o SQLite a cada renderização. Quando o processo não roda o loop de preços
+(ou o ticker ainda não foi atualizado), o snapshot é recarregado do banco no máximo
+a cada `ttl_banco` segundos. Mantém também os últimos pontos intraday de cada ticker
+para o sparkline.
+"""
+
+import collections
+import threading
+import time
+
+from assets.database import consultar_precos_atuais
+
+
+class SnapshotCotacoes:
+    """
+    Últimas cotações por ticker e série intraday recente (thread-safe).
+    """
+
+    def __init__(self, max_pontos_intraday: int = 500, ttl_banco: float = 30.0):
+        """
+        Args:
+            max_pontos_intraday (int): Pontos intraday mantidos por ticker.
+            ttl_banco (float): Intervalo mínimo (s) entre recargas do banco.
+        """
+        self.ttl_banco = ttl_banco
+        self._max_pontos = max_pontos_intraday
+        self._cotacoes = {}
+        self._intraday = collections.defaultdict(lambda: collections.deque(maxlen=self._max_pontos))
+        self._ultima_publicacao = float('-inf')
+        self._ultima_carga_banco = float('-inf')
+        self._lock = threading.Lock()
+
+    def publicar(self, precos: list) -> None:
+        """
+        Publica cotações recém-gravadas (dicts com 'ticker', 'preco', 'variacao', 'variacao_percentual', 'atualizado_em').
+        """
+        with self._lock:
+            for p in precos:
+                if p.get('preco') is None:
+                    continue
+                cotacao = {
+                    'preco': p['preco'],
+                    'variacao': p.get('variacao'),
+                    'variacao_percentual': p.get('variacao_percentual'),
+                    'atualizado_em': p.get('atualizado_em'),
+                }
+                self._cotacoes[p['ticker']] = cotacao
+                self._registrar_intraday(p['ticker'], cotacao)
+            self._ultima_publicacao = time.monotonic()
+
+    def _registrar_intraday(self, ticker: str, cotacao: dict) -> None:
+        serie = self._intraday[ticker]
+        if cotacao['atualizado_em'] is not None and (not serie or serie[-1][0] != cotacao['atualizado_em']):
+            serie.append((cotacao['atualizado_em'], cotacao['preco']))
+
+    def _recarregar_do_banco(self, ausente: bool = False) -> None:
+        agora = time.monotonic()
+        # Recarrega do banco (limitado pelo TTL) se não há publicações recentes, como quando o loop de
+        # preços roda em outro processo, ou se o ticker pedido ainda não está no snapshot
+        if agora - self._ultima_carga_banco < self.ttl_banco:
+            return
+        if not ausente and agora - self._ultima_publicacao < self.ttl_banco:
+            return
+        self._ultima_carga_banco = agora
+        try:
+            precos = consultar_precos_atuais()
+        except Exception as e:
+            print(f"[quotes] Não foi possível carregar as cotações do banco: {e}")
+            return
+        with self._lock:
+            for ticker, cotacao in precos.items():
+                atual = self._cotacoes.get(ticker)
+                if atual is None or (cotacao['atualizado_em'] and atual['atualizado_em'] and cotacao['atualizado_em'] > atual['atualizado_em']):
+                    self._cotacoes[ticker] = cotacao
+                    self._registrar_intraday(ticker, cotacao)
+
+    def obter(self, ticker: str) -> dict:
+        """
+        Retorna a cotação atual do ticker ou None.
+        """
+        with self._lock:
+            ausente = ticker not in self._cotacoes
+        self._recarregar_do_banco(ausente)
+        with self._lock:
+            return self._cotacoes.get(ticker)
+
+    def intraday(self, ticker: str) -> list:
+        """
+        Retorna os pontos intraday recentes [(atualizado_em, preco), ...] do ticker.
+        """
+        with self._lock:
+            return list(self._intraday.get(ticker, ()))
+
+
+# Snapshot compartilhado pelo processo
+snapshot_cotacoes = SnapshotCotacoes()
@@ -0,0 +1,182 @@
+"""
+recalculo.py
+------------
+Coordenação do recálculo do analytics (destaques e, em seguida, snapshots do dashboard).
+O recálculo é pedido em vários pontos (fim de cada backfill, remoção de ativos, sincronização
+no fechamento de cada bolsa, jobs enfileirados por outras réplicas) e costuma chegar em rajadas.
+`CoordenadorRecalculo`:
+
+- recebe pedidos sem bloquear (`solicitar`) e os agrupa: a execução começa depois de
+  `espera` segundos sem pedidos novos (debounce), mas nunca mais de `espera_maxima` depois do
+  primeiro pedido pendente, para que pedidos contínuos não adiem o recálculo indefinidamente;
+- executa em uma única thread, então nunca há dois recálculos ao mesmo tempo; pedidos que
+  chegam durante uma execução geram exatamente uma execução seguinte;
+- cada pedido recebe um número, e `aguardar(numero)` espera a execução que o atendeu e retorna
+  o resultado dela (usado pelos jobs de analytics, que só concluem depois do recálculo).
+  O resultado é o da execução daquele grupo, não o da última execução do coordenador.
+
+A troca dos destaques no banco é atômica (ver `database.atualizar_analytics_cache`).
+"""
+
+import bisect
+import collections
+import datetime
+import os
+import threading
+import time
+
+from assets.database import atualizar_analytics_cache
+from assets.metrics import metricas
+from assets.snapshots import atualizar_snapshots
+
+ESPERA_PADRAO = float(os.environ.get('ANALYTICS_ESPERA', 2))
+ESPERA_MAXIMA_PADRAO = float(os.environ.get('ANALYTICS_ESPERA_MAXIMA', 30))
+# Resultados de grupos guardados para `aguardar` (os mais antigos são descartados)
+MAX_RESULTADOS = 1000
+
+
+def recalcular_analytics_e_snapshots() -> None:
+    atualizar_analytics_cache()
+    atualizar_snapshots()
+
+
+class CoordenadorRecalculo:
+    """
+    Executa `alvo` em uma thread própria, agrupando os pedidos recebidos em rajada em uma única execução.
+    """
+
+    def __init__(self, nome: str, alvo, espera: float = ESPERA_PADRAO, espera_maxima: float = ESPERA_MAXIMA_PADRAO, permitir=None):
+        """
+        Args:
+            nome (str): Nome do serviço (tabela de serviços e métricas).
+            alvo (callable): Função executada a cada grupo de pedidos.
+            espera (float): Segundos sem pedidos novos antes de executar.
+            espera_maxima (float): Atraso máximo (s) da execução em relação ao primeiro pedido pendente.
+            permitir (callable, opcional): Consultado antes de cada execução; o grupo é descartado quando retorna False.
+        """
+        self.nome = nome
+        self.alvo = alvo
+        self.espera = espera
+        self.espera_maxima = espera_maxima
+        self.permitir = permitir
+        self.status = 'parado'
+        self.execucoes = 0
+        self.ultimo_inicio = None
+        self.ultima_duracao = None
+        self.ultimo_erro = None
+        self.ultimo_motivo = None
+        self._solicitado = 0
+        self._atendido = 0
+        self._pendentes = 0
+        self._primeiro_pendente = None
+        self._ultimo_pendente = None
+        # (último número do grupo, erro ou None) de cada execução, em ordem crescente
+        self._resultados = collections.deque(maxlen=MAX_RESULTADOS)
+        self._condicao = threading.Condition()
+        self._thread = None
+
+    def iniciar(self) -> None:
+        with self._condicao:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name=f'servico-{self.nome}', daemon=True)
+                self._thread.start()
+                self.status = 'ocioso'
+
+    def solicitar(self, motivo: str = None) -> int:
+        """
+        Pede um recálculo sem bloquear (inicia a thread na primeira chamada).
+        Args:
+            motivo (str, opcional): Origem do pedido, registrada no log da execução.
+        Returns:
+            int: Número do pedido, para `aguardar`.
+        """
+        self.iniciar()
+        metricas.contar('recalculo_pedidos', servico=self.nome)
+        agora = time.monotonic()
+        with self._condicao:
+            self._solicitado += 1
+            self._pendentes += 1
+            if self._primeiro_pendente is None:
+                self._primeiro_pendente = agora
+            self._ultimo_pendente = agora
+            self.ultimo_motivo = motivo
+            self._condicao.notify_all()
+            return self._solicitado
+
+    def aguardar(self, numero: int, timeout: float = None) -> str:
+        """
+        Espera até que a execução que atendeu o pedido `numero` termine.
+        Returns:
+            str|None: Erro da execução que atendeu o pedido (inclusive grupo descartado), ou None se ela deu certo.
+        Raises:
+            TimeoutError: Se o tempo se esgotou antes.
+        """
+        with self._condicao:
+            if not self._condicao.wait_for(lambda: self._atendido >= numero, timeout):
+                raise TimeoutError(f"Recálculo '{self.nome}' não terminou a tempo")
+            # O pedido foi atendido pelo primeiro grupo cujo último número é >= numero
+            grupos = [grupo for grupo, _ in self._resultados]
+            indice = bisect.bisect_left(grupos, numero)
+            return self._resultados[indice][1] if indice < len(grupos) else None
+
+    def _prazo(self) -> float:
+        # Debounce a partir do último pedido, limitado pelo prazo máximo a partir do primeiro
+        return min(self._ultimo_pendente + self.espera, self._primeiro_pendente + self.espera_maxima)
+
+    def _executar(self) -> None:
+        while True:
+            with self._condicao:
+                while self._primeiro_pendente is None:
+                    self._condicao.wait()
+                while (restante := self._prazo() - time.monotonic()) > 0:
+                    self._condicao.wait(restante)
+                # Pedidos a partir daqui formam o próximo grupo
+                grupo, agrupados, motivo = self._solicitado, self._pendentes, self.ultimo_motivo
+                self._pendentes = 0
+                self._primeiro_pendente = self._ultimo_pendente = None
+            erro = None
+            if self.permitir is not None and not self.permitir():
+                erro = 'descartado: processo não é o líder'
+                print(f"[recalculo] Recálculo '{self.nome}' descartado: processo não é o líder.")
+            else:
+                print(f"[recalculo] Recálculo '{self.nome}': {agrupados} pedido(s) agrupado(s) (último: {motivo}).")
+                self.status = 'executando'
+                self.ultimo_inicio = datetime.datetime.now()
+                inicio = time.monotonic()
+                try:
+                    self.alvo()
+                except Exception as e:
+                    erro = repr(e)
+                    metricas.contar('erros', origem=f'recalculo_{self.nome}')
+                    print(f"[recalculo] Erro no recálculo '{self.nome}': {e}")
+                self.ultima_duracao = time.monotonic() - inicio
+                self.execucoes += 1
+                self.status = 'ocioso'
+            # Apagado quando um recálculo dá certo (inclusive o aviso de grupo descartado)
+            self.ultimo_erro = erro
+            with self._condicao:
+                self._resultados.append((grupo, erro))
+                self._atendido = grupo
+                self._condicao.notify_all()
+
+    def estado(self) -> dict:
+        return {
+            'servico': self.nome,
+            'status': self.status if self._thread and self._thread.is_alive() else 'parado',
+            'execucoes': self.execucoes,
+            'pendentes': self._pendentes,
+            'ultimo_inicio': self.ultimo_inicio,
+            'ultima_duracao_s': self.ultima_duracao,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+# Coordenador do processo: todos os pedidos de recálculo do analytics passam por ele
+coordenador_analytics = CoordenadorRecalculo('analytics', recalcular_analytics_e_snapshots)
+
+
+def solicitar_analytics(motivo: str = None) -> int:
+    """
+    Pede o recálculo do analytics e dos snapshots sem bloquear (ver `CoordenadorRecalculo.solicitar`).
+    """
+    return coordenador_analytics.solicitar(motivo)
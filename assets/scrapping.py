@@ -11,15 +11,20 @@ import os
 import re
 import time
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.by import By
-from selenium.common import TimeoutException
-from assets.database import criar_banco, inserir_ativo, inserir_historico
+from assets.database import criar_banco, inserir_ativo, salvar_historicos
+from assets.ingestao import normalizar_eventos, normalizar_historico, relatar_rejeitadas
+from assets.source_health import controlador_fontes
+from assets.single_flight import SingleFlight
+from assets.metrics import cronometro, cronometrado
+
+# Selenium e webdriver_manager são importados dentro dos métodos que usam o navegador: importar
+# este módulo (o dashboard faz isso indiretamente) não carrega o Selenium.
+
+# URL base das páginas do Yahoo Finance; aponte para o substituto local (assets.yahoo_local) em testes e benchmarks
+YAHOO_BASE_URL = os.environ.get('YAHOO_BASE_URL', 'https://finance.yahoo.com')
+
+# Coalesce coletas simultâneas de histórico do mesmo ticker/período (threads e processos)
+voo_historicos = SingleFlight('historico', entre_processos=True)
 
 
 class Scraper:
@@ -50,54 +55,61 @@ class Scraper:
             raise ValueError(f"Período '{periodo}' não reconhecido.")
         return periodos[periodo](hoje)
 
-    def coletar_e_salvar_historico_ativos(self, ativos: list, periodos='5Y'):
-        """
-        Coleta e salva no banco o histórico dos ativos para o(s) período(s) informado(s). Não salva CSV.
-        """
+    def coletar_e_salvar_historico_ativos(self, ativos: list, periodos='5Y', progresso=None, cadastrar=True):
         """
         Coleta e salva no banco o histórico dos ativos para o(s) período(s) informado(s). Não salva CSV.
+        Args:
+            ativos (list): Lista de tickers.
+            periodos (list|str): Período(s) coletado(s).
+            progresso (callable, opcional): Recebe (fração concluída, descrição) após cada ticker/período.
+            cadastrar (bool): Cadastra os ativos que ainda não existem. Com False (backfills e sincronizações),
+                tickers removidos durante a coleta não voltam ao banco.
         """
         criar_banco()
-        self.start_driver()
         if isinstance(periodos, str):
             periodos = [periodos]
         hoje = datetime.date.today()
-        for ticker in ativos:
-            inserir_ativo(ticker)
-            for periodo in periodos:
-                data_inicial, data_final = self.get_period_range(periodo, hoje)
-                print(f'Coletando histórico de {ticker} ({periodo})...')
-                df = self.scrape_historical_data(
-                    ticker_symbol=ticker,
-                    data_inicial=self._date_to_str(data_inicial),
-                    data_final=self._date_to_str(data_final)
-                )
-                for _, row in df.iterrows():
-                    try:
-                        data = row['Date']
-                        if isinstance(data, str):
-                            try:
-                                data = datetime.datetime.strptime(data, '%d/%m/%Y').date()
-                            except ValueError:
-                                try:
-                                    data = datetime.datetime.strptime(data, '%b %d, %Y').date()
-                                except ValueError:
-                                    raise ValueError(f"Formato de data não reconhecido: {data}")
-                        if not isinstance(data, datetime.date):
-                            raise ValueError(f"Data não é datetime.date: {data}")
-                        inserir_historico(
-                            ticker=ticker,
-                            data=data,
-                        preco_abertura=float(row['Open']) if row.get('Open') not in [None, '', 'N/A', '-'] else None,
-                        preco_fechamento=float(row['Close*']) if row.get('Close*') not in [None, '', 'N/A', '-'] else None,
-                        maximo=float(row['High']) if row.get('High') not in [None, '', 'N/A', '-'] else None,
-                        minimo=float(row['Low']) if row.get('Low') not in [None, '', 'N/A', '-'] else None,
-                        volume=float(row['Volume'].replace('.', '').replace(',', '')) if row.get('Volume') not in [None, '', 'N/A', '-'] else None
-                        )
-                    except Exception as e:
-                        print(f'Erro ao inserir linha: {row} - {e}')
-                print(f'Histórico de {ticker} inserido no banco.')
-        self.quit_driver()
+        total = len(ativos) * len(periodos)
+        feitos = 0
+        try:
+            for ticker in ativos:
+                if cadastrar:
+                    inserir_ativo(ticker)
+                for periodo in periodos:
+                    # Coletas simultâneas do mesmo ticker/período (outras threads ou processos) compartilham uma execução
+                    voo_historicos.executar(
+                        (ticker.upper(), periodo), self._coletar_e_salvar_historico, ticker, periodo, hoje
+                    )
+                    feitos += 1
+                    if progresso is not None:
+                        progresso(feitos / total, f'{ticker} ({periodo})')
+        finally:
+            self.quit_driver()
+
+    def _coletar_e_salvar_historico(self, ticker: str, periodo: str, hoje: datetime.date) -> None:
+        """
+        Coleta o histórico de um ticker para um período e salva no banco.
+        O driver é iniciado apenas quando há uma coleta a fazer.
+        """
+        if self.driver is None:
+            self.start_driver()
+        data_inicial, data_final = self.get_period_range(periodo, hoje)
+        print(f'Coletando histórico de {ticker} ({periodo})...')
+        df = self._scrape_historico_monitorado(
+            ticker,
+            data_inicial=self._date_to_str(data_inicial),
+            data_final=self._date_to_str(data_final)
+        )
+        if df is None:
+            return
+        normalizado, rejeitadas = normalizar_historico(df)
+        relatar_rejeitadas(ticker, rejeitadas)
+        eventos, rejeitados = normalizar_eventos(df.attrs.get('eventos', pd.DataFrame(columns=["Date", "Evento"])))
+        relatar_rejeitadas(ticker, rejeitados)
+        gravados = salvar_historicos(ticker, normalizado, eventos)
+        print(f"Histórico de {ticker} inserido no banco ({gravados['inseridos']} novas, {gravados['atualizados']} atualizadas, "
+              f"{gravados['eventos']} eventos novos).")
+
     PERIODOS = {
         '1D': lambda hoje: (hoje - datetime.timedelta(days=1), hoje),
         '5D': lambda hoje: (hoje - datetime.timedelta(days=5), hoje),
@@ -108,14 +120,65 @@ class Scraper:
         '5Y': lambda hoje: (hoje - datetime.timedelta(days=5*365), hoje),
     }
 
-    def __init__(self, headless=True, window_size=(1150, 1000)):
+    # Perfis de navegador disponíveis: 'padrao' carrega a página completa (comportamento original);
+    # 'enxuto' usa carregamento 'eager', bloqueia imagens, fontes, anúncios e rastreadores.
+    PERFIS = ('padrao', 'enxuto')
+
+    # Hosts de anúncios/rastreamento bloqueados no perfil enxuto
+    HOSTS_BLOQUEADOS = [
+        '*doubleclick.net*',
+        '*googlesyndication.com*',
+        '*googletagmanager.com*',
+        '*googletagservices.com*',
+        '*google-analytics.com*',
+        '*adservice.google.com*',
+        '*amazon-adsystem.com*',
+        '*scorecardresearch.com*',
+        '*criteo.com*',
+        '*criteo.net*',
+        '*taboola.com*',
+        '*outbrain.com*',
+        '*adnxs.com*',
+        '*rubiconproject.com*',
+        '*pubmatic.com*',
+        '*casalemedia.com*',
+        '*moatads.com*',
+        '*ads.yahoo.com*',
+        '*analytics.yahoo.com*',
+        '*geo.yahoo.com*',
+        '*udc.yahoo.com*',
+        '*consent.yahoo.com/v2/collectConsent*',
+    ]
+
+    # Tipos de recurso (imagens e fontes) bloqueados no perfil enxuto
+    RECURSOS_BLOQUEADOS = [
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+        '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    ]
+
+    # Timeouts (segundos): carregamento de página, overlay de cookies e espera por elemento
+    TIMEOUTS_PADRAO = {'pagina': 40, 'cookies': 3, 'elemento': 10}
+
+    def __init__(self, headless=True, window_size=(1150, 1000), perfil='padrao', timeouts: dict = None, base_url: str = None):
         """
         Inicializa o Scraper com opções do Selenium.
-        """
-        """Inicializa o Scraper com opções do Selenium."""
+        Args:
+            headless (bool): Executa o Chrome sem interface gráfica.
+            window_size (tuple): Tamanho da janela do navegador.
+            perfil (str): Perfil do navegador ('padrao' ou 'enxuto').
+            timeouts (dict, opcional): Sobrescreve chaves de TIMEOUTS_PADRAO.
+            base_url (str, opcional): URL base das páginas (padrão: YAHOO_BASE_URL).
+        """
+        if perfil not in self.PERFIS:
+            raise ValueError(f"Perfil '{perfil}' não reconhecido. Use um de {self.PERFIS}.")
         self.headless = headless
         self.window_size = window_size
+        self.perfil = perfil
+        self.timeouts = {**self.TIMEOUTS_PADRAO, **(timeouts or {})}
+        self.base_url = (base_url or YAHOO_BASE_URL).rstrip('/')
         self.driver = None
+        self._cookies_verificados = False
+        self.ultima_carga_s = None
 
     def start_driver(self) -> None:
         """
@@ -124,14 +187,77 @@ class Scraper:
         """
         Inicializa o driver do Selenium Chrome.
         """
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from webdriver_manager.chrome import ChromeDriverManager
         options = Options()
         if self.headless:
             options.add_argument('--headless=new')
-        self.driver = webdriver.Chrome(
-            service=ChromeService(ChromeDriverManager().install()),
-            options=options
-        )
+        if self.perfil == 'enxuto':
+            self._configurar_perfil_enxuto(options)
+        with cronometro('scraper_inicio_driver', perfil=self.perfil):
+            self.driver = webdriver.Chrome(
+                service=ChromeService(ChromeDriverManager().install()),
+                options=options
+            )
         self.driver.set_window_size(*self.window_size)
+        self.driver.set_page_load_timeout(self.timeouts['pagina'])
+        self._cookies_verificados = False
+        if self.perfil == 'enxuto':
+            self._bloquear_urls()
+
+    @staticmethod
+    def _configurar_perfil_enxuto(options) -> None:
+        """
+        Aplica as opções do perfil enxuto: carregamento 'eager', sem imagens, extensões ou GPU.
+        """
+        options.page_load_strategy = 'eager'
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-gpu')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+
+    def _bloquear_urls(self) -> None:
+        """
+        Bloqueia via DevTools as URLs de anúncios, rastreadores, imagens e fontes.
+        """
+        try:
+            self.driver.execute_cdp_cmd('Network.enable', {})
+            self.driver.execute_cdp_cmd(
+                'Network.setBlockedURLs',
+                {'urls': self.HOSTS_BLOQUEADOS + self.RECURSOS_BLOQUEADOS}
+            )
+        except Exception as e:
+            print(f"[AVISO] Não foi possível configurar o bloqueio de URLs: {e}")
+
+    def _aguardar_elemento(self, seletor: str, timeout: int) -> bool:
+        """
+        Aguarda a presença do elemento informado (seletor CSS). Se a página terminar de carregar
+        (document.readyState 'complete') sem o elemento, desiste na hora em vez de esperar o
+        timeout inteiro (ex.: ticker sem tabela de histórico).
+        Returns:
+            bool: True se o elemento apareceu dentro do timeout.
+        """
+        from selenium.common import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        def presente_ou_carregada(driver):
+            if driver.find_elements(By.CSS_SELECTOR, seletor):
+                return 'presente'
+            if driver.execute_script('return document.readyState') == 'complete':
+                return 'ausente'
+            return False
+
+        try:
+            return WebDriverWait(self.driver, timeout).until(presente_ou_carregada) == 'presente'
+        except TimeoutException:
+            return False
 
     @staticmethod
     def _date_to_str(dt: datetime.datetime) -> str:
@@ -179,9 +305,14 @@ class Scraper:
         Returns:
             dict: Dicionário com os dados principais do ativo.
         """
-        url = f"https://finance.yahoo.com/quote/{ticker_symbol}"
-        self.driver.get(url)
+        from selenium.webdriver.common.by import By
+        url = f"{self.base_url}/quote/{ticker_symbol}"
+        with cronometro('scraper_carregamento', pagina='cotacao', perfil=self.perfil):
+            self.driver.get(url)
         self._accept_cookies()
+        if self.perfil == 'enxuto':
+            # Com carregamento 'eager' o preço pode ser renderizado após o DOMContentLoaded
+            self._aguardar_elemento(f'[data-symbol="{ticker_symbol}"][data-field="regularMarketPrice"]', self.timeouts['elemento'])
         data = {}
         try:
             data["regular_market_price"] = self.driver.find_element(
@@ -213,9 +344,16 @@ class Scraper:
         """
         Aceita cookies se o overlay estiver presente.
         """
-        """Aceita cookies se o overlay estiver presente."""
+        """Aceita cookies se o overlay estiver presente (verificado uma vez por sessão do driver)."""
+        from selenium.common import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        if self._cookies_verificados:
+            return
+        self._cookies_verificados = True
         try:
-            consent_overlay = WebDriverWait(self.driver, 3).until(
+            consent_overlay = WebDriverWait(self.driver, self.timeouts['cookies']).until(
                 EC.presence_of_element_located((By.CSS_SELECTOR, ".consent-overlay"))
             )
             accept_all_button = consent_overlay.find_element(By.CSS_SELECTOR, ".accept-all")
@@ -228,6 +366,7 @@ class Scraper:
         Obtém preço, variação e variação percentual do ativo.
         """
         """Obtém preço, variação e variação percentual do ativo."""
+        from selenium.webdriver.common.by import By
         data = {}
         try:
             data["regular_market_price"] = self.driver.find_element(
@@ -261,6 +400,7 @@ class Scraper:
         Obtém dados do resumo do ativo (ex: volume, PE, etc).
         """
         """Obtém dados do resumo do ativo (ex: volume, PE, etc)."""
+        from selenium.webdriver.common.by import By
         summary_fields = {
             "previous_close": "PREV_CLOSE-value",
             "open_value": "OPEN-value",
@@ -292,34 +432,51 @@ class Scraper:
     def scrape_historical_data(self, ticker_symbol: str, days: int = None, data_inicial: str = None, data_final: str = None) -> pd.DataFrame:
         """
         Extrai dados históricos do Yahoo Finance para o ticker informado.
-        Remove linhas de dividendos/splits e trata intervalos sem dados.
+        Separa as linhas de dividendos/splits e trata intervalos sem dados.
         Args:
             ticker_symbol (str): Ticker do ativo.
             days (int, opcional): Número máximo de linhas (ignorado se datas forem passadas).
             data_inicial (str, opcional): Data inicial no formato 'YYYY-MM-DD'.
             data_final (str, opcional): Data final no formato 'YYYY-MM-DD'.
         Returns:
-            pd.DataFrame: DataFrame com os dados históricos limpos.
+            pd.DataFrame: DataFrame com os dados históricos limpos. Os eventos (dividendos/splits) da
+            página ficam em `df.attrs['eventos']`, um DataFrame com as colunas Date e Evento.
         """
         """
         Extrai dados históricos do Yahoo Finance para o ticker informado.
-        Remove linhas de dividendos/splits e trata intervalos sem dados.
+        Separa as linhas de dividendos/splits e trata intervalos sem dados.
         Args:
             ticker_symbol (str): Ticker do ativo.
             days (int, opcional): Número máximo de linhas (ignorado se datas forem passadas).
             data_inicial (str, opcional): Data inicial no formato 'YYYY-MM-DD'.
             data_final (str, opcional): Data final no formato 'YYYY-MM-DD'.
         Returns:
-            pd.DataFrame: DataFrame com os dados históricos limpos.
-        """
+            pd.DataFrame: DataFrame com os dados históricos limpos. Os eventos (dividendos/splits) da
+            página ficam em `df.attrs['eventos']`, um DataFrame com as colunas Date e Evento. Em caso
+            de erro, o DataFrame vem vazio com `df.attrs['erro']`; vazio sem 'erro' é um intervalo sem
+            dados. A duração do carregamento da página fica em `self.ultima_carga_s`.
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
         url = self._build_history_url(ticker_symbol, data_inicial, data_final)
-        self.driver.get(url)
+        self.ultima_carga_s = None
+        inicio = time.monotonic()
+        with cronometro('scraper_carregamento', pagina='historico', perfil=self.perfil):
+            self.driver.get(url)
         try:
-            WebDriverWait(self.driver, 40).until(
-                EC.presence_of_element_located((By.TAG_NAME, 'body'))
-            )
+            if self.perfil == 'enxuto':
+                # Aguarda a tabela de histórico em vez do body
+                if (not self._aguardar_elemento('table tbody tr', self.timeouts['pagina'])
+                        and self.driver.execute_script('return document.readyState') != 'complete'):
+                    raise TimeoutError(f"Página de histórico de {ticker_symbol} não carregou em {self.timeouts['pagina']}s")
+            else:
+                WebDriverWait(self.driver, self.timeouts['pagina']).until(
+                    EC.presence_of_element_located((By.TAG_NAME, 'body'))
+                )
+            self.ultima_carga_s = time.monotonic() - inicio
             html = self.driver.page_source
-            dados = self._parse_historical_table(html, days, data_inicial)
+            dados, eventos = self._parse_historical_table(html, days, data_inicial)
             if not dados:
                 print(f"[AVISO] Nenhum dado encontrado para {ticker_symbol} no intervalo solicitado.")
                 return pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close*", "Adj Close**", "Volume"])
@@ -329,10 +486,41 @@ class Scraper:
             df.replace({'': 'N/A', None: 'N/A'}, inplace=True)
             self._add_today_if_missing(df, ticker_symbol)
             df = df.drop_duplicates(subset=["Date"], keep="first").reset_index(drop=True)
+            df.attrs['eventos'] = pd.DataFrame(eventos, columns=["Date", "Evento"])
             return df
         except Exception as e:
             print(f"[ERRO] Não foi possível extrair histórico de {ticker_symbol}: {e}")
-            return pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close*", "Adj Close**", "Volume"])
+            df = pd.DataFrame(columns=["Date", "Open", "High", "Low", "Close*", "Adj Close**", "Volume"])
+            df.attrs['erro'] = repr(e)
+            return df
+
+    def _scrape_historico_monitorado(self, ticker_symbol: str, data_inicial: str, data_final: str):
+        """
+        Executa scrape_historical_data passando pelo controle de saúde da fonte 'yahoo_historico':
+        pula a coleta com o circuito aberto, aplica o timeout adaptativo e registra latência/erro.
+        A latência registrada é só a do carregamento da página (sem parse nem a cotação do dia), e
+        um intervalo sem dados conta como sucesso: só erros de carregamento ou extração são falhas.
+        Returns:
+            pd.DataFrame|None: DataFrame coletado ou None se a fonte estiver indisponível ou falhar.
+        """
+        if not controlador_fontes.permitir('yahoo_historico'):
+            print(f"[AVISO] Fonte 'yahoo_historico' indisponível (circuito aberto). Pulando {ticker_symbol}.")
+            return None
+        self.timeouts['pagina'] = controlador_fontes.timeout('yahoo_historico')
+        self.driver.set_page_load_timeout(self.timeouts['pagina'])
+        inicio = time.monotonic()
+        try:
+            df = self.scrape_historical_data(ticker_symbol, data_inicial=data_inicial, data_final=data_final)
+        except Exception as e:
+            controlador_fontes.registrar_falha('yahoo_historico', time.monotonic() - inicio, e)
+            print(f"[ERRO] Falha ao carregar histórico de {ticker_symbol}: {e}")
+            return None
+        latencia = self.ultima_carga_s if self.ultima_carga_s is not None else time.monotonic() - inicio
+        if 'erro' in df.attrs:
+            controlador_fontes.registrar_falha('yahoo_historico', latencia, RuntimeError(df.attrs['erro']))
+            return None
+        controlador_fontes.registrar_sucesso('yahoo_historico', latencia)
+        return df
 
     def _build_history_url(self, ticker_symbol: str, data_inicial: str, data_final: str) -> str:
         """
@@ -342,27 +530,31 @@ class Scraper:
         if data_inicial and data_final:
             period1 = self._date_to_unix(data_inicial)
             period2 = self._date_to_unix(data_final)
-            return f"https://finance.yahoo.com/quote/{ticker_symbol}/history/?period1={period1}&period2={period2}"
-        return f"https://finance.yahoo.com/quote/{ticker_symbol}/history"
+            return f"{self.base_url}/quote/{ticker_symbol}/history/?period1={period1}&period2={period2}"
+        return f"{self.base_url}/quote/{ticker_symbol}/history"
 
-    def _parse_historical_table(self, html: str, days: int = None, data_inicial: str = None) -> list:
+    @cronometrado('scraper_parse')
+    def _parse_historical_table(self, html: str, days: int = None, data_inicial: str = None) -> tuple:
         """
         Extrai e limpa as linhas válidas da tabela de histórico do HTML.
+        Returns:
+            tuple: (linhas de preço com 7 colunas, linhas de evento [data, texto] como '0.25 Dividend')
         """
-        """Extrai e limpa as linhas válidas da tabela de histórico do HTML."""
-        padrao_linha = re.compile(r'<tr.*?>\s*(<td.*?>.*?</td>\s*){7,}.*?</tr>', re.DOTALL)
+        # Uma linha <tr> por vez: uma linha de evento (2 colunas) não pode absorver a linha seguinte
+        padrao_linha = re.compile(r'<tr\b[^>]*>(.*?)</tr>', re.DOTALL)
         padrao_coluna = re.compile(r'<td.*?>(.*?)</td>', re.DOTALL)
-        dados = []
+        dados, eventos = [], []
         for match in re.finditer(padrao_linha, html):
-            linha_html = match.group(0)
-            colunas = padrao_coluna.findall(linha_html)
+            colunas = [re.sub('<.*?>', '', c).replace('\n', '').strip() for c in padrao_coluna.findall(match.group(1))]
             if any('Dividend' in c or 'Split' in c for c in colunas):
+                if len(colunas) >= 2:
+                    eventos.append([colunas[0], ' '.join(colunas[1:])])
                 continue
             if len(colunas) >= 7:
-                dados.append([re.sub('<.*?>', '', c).replace('\n', '').strip() for c in colunas[:7]])
+                dados.append(colunas[:7])
             if days is not None and data_inicial is None and len(dados) >= days:
                 break
-        return dados
+        return dados, eventos
 
     def _add_today_if_missing(self, df: pd.DataFrame, ticker_symbol: str) -> None:
         """
@@ -0,0 +1,277 @@
+"""
+services.py
+-----------
+Serviços de background únicos por processo: atualização periódica de preços,
+sincronização de históricos (backfill), recálculo do analytics (assets.recalculo), geração dos snapshots do
+dashboard, compactação da série intraday (assets.intraday), a fila persistente de jobs de
+cadastro de ativos (assets.jobs) e a gravação periódica das métricas (assets.metrics).
+O dashboard obtém o gerenciador via `iniciar_servicos()`, que é idempotente, de modo
+que o número de threads não cresce com o número de sessões conectadas.
+Com vários processos no mesmo banco, só o líder (assets.lideranca) executa o loop de preços,
+a sincronização de históricos, o analytics, a compactação intraday e a fila de jobs; os demais
+servem leituras e assumem automaticamente se o líder parar de renovar a concessão.
+"""
+
+import datetime
+import queue
+import threading
+import time
+
+from assets.database import remover_ativos
+from assets.finance_utils import atualizar_precos_periodicamente, ciclos_precos, sincronizar_historicos
+from assets.importacao import importar_ativos
+from assets.intraday import compactar_intraday
+from assets.jobs import FilaJobs
+from assets.lideranca import Lideranca
+from assets.metrics import PersistenciaMetricas
+from assets.recalculo import coordenador_analytics
+from assets.snapshots import atualizar_snapshots, remover_snapshots
+
+
+class Servico:
+    """
+    Job executado por uma única thread de trabalho, alimentada por uma fila.
+    Pedidos idênticos já pendentes na fila são descartados (coalescidos).
+    """
+
+    def __init__(self, nome: str, alvo, permitir=None):
+        """
+        Args:
+            nome (str): Nome do serviço.
+            alvo (callable): Função executada a cada pedido.
+            permitir (callable, opcional): Consultado a cada pedido; pedidos são descartados quando retorna False.
+        """
+        self.nome = nome
+        self.alvo = alvo
+        self.permitir = permitir
+        self.status = 'parado'
+        self.execucoes = 0
+        self.ultimo_inicio = None
+        self.ultima_duracao = None
+        self.ultimo_erro = None
+        self._fila = queue.Queue()
+        self._pendentes = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def iniciar(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name=f'servico-{self.nome}', daemon=True)
+            self._thread.start()
+            self.status = 'ocioso'
+
+    def disparar(self, *args) -> bool:
+        """
+        Enfileira uma execução com os argumentos informados.
+        Returns:
+            bool: False se um pedido idêntico já estava pendente.
+        """
+        chave = repr(args)
+        with self._lock:
+            if chave in self._pendentes:
+                return False
+            self._pendentes.add(chave)
+        self._fila.put((chave, args))
+        return True
+
+    def _executar(self) -> None:
+        while True:
+            chave, args = self._fila.get()
+            with self._lock:
+                self._pendentes.discard(chave)
+            if self.permitir is not None and not self.permitir():
+                print(f"[services] Pedido do serviço '{self.nome}' descartado: processo não é o líder.")
+                continue
+            self.status = 'executando'
+            self.ultimo_inicio = datetime.datetime.now()
+            inicio = time.monotonic()
+            try:
+                self.alvo(*args)
+                self.ultimo_erro = None
+            except Exception as e:
+                self.ultimo_erro = repr(e)
+                print(f"[services] Erro no serviço '{self.nome}': {e}")
+            self.ultima_duracao = time.monotonic() - inicio
+            self.execucoes += 1
+            self.status = 'ocioso'
+
+    def estado(self) -> dict:
+        return {
+            'servico': self.nome,
+            'status': self.status if self._thread and self._thread.is_alive() else 'parado',
+            'execucoes': self.execucoes,
+            'pendentes': self._fila.qsize(),
+            'ultimo_inicio': self.ultimo_inicio,
+            'ultima_duracao_s': self.ultima_duracao,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+class ServicoPrecos:
+    """
+    Loop contínuo de atualização de preços (uma única thread por processo).
+    """
+
+    nome = 'precos'
+
+    def __init__(self, intervalo: int = 60, ao_fechar=None, continuar=None):
+        self.intervalo = intervalo
+        self.ao_fechar = ao_fechar
+        self.continuar = continuar
+        self.ultimo_erro = None
+        self._thread = None
+
+    def iniciar(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._executar, name='servico-precos', daemon=True)
+            self._thread.start()
+
+    def _executar(self) -> None:
+        try:
+            atualizar_precos_periodicamente(self.intervalo, ao_fechar=self.ao_fechar, continuar=self.continuar)
+        except Exception as e:
+            self.ultimo_erro = repr(e)
+            print(f"[services] Loop de preços encerrado com erro: {e}")
+
+    def estado(self) -> dict:
+        ultimo = ciclos_precos[-1] if ciclos_precos else None
+        return {
+            'servico': self.nome,
+            'status': 'executando' if self._thread and self._thread.is_alive() else 'parado',
+            'execucoes': len(ciclos_precos),
+            'pendentes': 0,
+            'ultimo_inicio': ultimo['inicio'] if ultimo else None,
+            'ultima_duracao_s': ultimo['duracao'] if ultimo else None,
+            'ultimo_erro': self.ultimo_erro,
+        }
+
+
+class GerenciadorServicos:
+    """
+    Supervisor dos serviços de background do processo.
+    """
+
+    def __init__(self, intervalo_precos: int = 60, trabalhadores_jobs: int = 3):
+        self.lideranca = Lideranca(ao_assumir=self._ao_assumir)
+        lider = lambda: self.lideranca.lider
+        self.historicos = Servico('historicos', sincronizar_historicos, permitir=lider)
+        # Coordenador do processo (também usado pelos jobs e pela sincronização de históricos)
+        self.analytics = coordenador_analytics
+        self.analytics.permitir = lider
+        self.snapshots = Servico('snapshots', atualizar_snapshots)
+        self.intraday = Servico('intraday', compactar_intraday, permitir=lider)
+        self.precos = ServicoPrecos(intervalo_precos, ao_fechar=self.ao_fechar_bolsa, continuar=lider)
+        self.jobs = FilaJobs(trabalhadores_jobs, permitir=lider)
+        self.metricas = PersistenciaMetricas()
+        self.iniciado_em = None
+        # Reruns de várias sessões chamam `iniciar` ao mesmo tempo
+        self._lock = threading.RLock()
+
+    def iniciar(self) -> None:
+        """
+        Inicia (ou reinicia, se alguma thread morreu) todos os serviços. O loop de preços e a fila
+        de jobs só são iniciados no processo líder. Barato quando tudo está vivo: o dashboard
+        chama a cada rerun.
+        """
+        with self._lock:
+            self.historicos.iniciar()
+            self.analytics.iniciar()
+            self.snapshots.iniciar()
+            self.intraday.iniciar()
+            self.metricas.iniciar()
+            self.lideranca.iniciar()
+            if self.lideranca.lider:
+                self.precos.iniciar()
+                self.jobs.iniciar()
+            if self.iniciado_em is None:
+                self.iniciado_em = datetime.datetime.now()
+
+    def _ao_assumir(self, token: int) -> None:
+        """
+        O processo assumiu a liderança (na inicialização ou porque o líder anterior parou).
+        """
+        with self._lock:
+            self.precos.iniciar()
+            self.jobs.iniciar()
+        self.compactar_intraday()
+
+    def ao_fechar_bolsa(self, tickers: list) -> None:
+        """
+        Fechamento de uma bolsa: sincroniza os históricos dos seus ativos e compacta a série intraday.
+        """
+        self.sincronizar_historicos(tickers)
+        self.compactar_intraday()
+
+    def compactar_intraday(self) -> bool:
+        """
+        Enfileira a compactação da série intraday (pedidos pendentes são coalescidos).
+        """
+        return self.intraday.disparar()
+
+    def sincronizar_historicos(self, tickers: list, periodo: str = '5D') -> bool:
+        """
+        Enfileira a sincronização de históricos dos tickers (inclui o recálculo do analytics).
+        """
+        if not self.lideranca.lider:
+            return False
+        return self.historicos.disparar(tuple(tickers), periodo)
+
+    def atualizar_analytics(self, motivo: str = None) -> bool:
+        """
+        Pede o recálculo do analytics, seguido dos snapshots, sem bloquear (pedidos em rajada são
+        agrupados em uma execução). Fora do líder, o pedido vai para a fila persistente de jobs,
+        que o líder executa.
+        """
+        if not self.lideranca.lider:
+            return self.jobs.enfileirar('analytics') is not None
+        self.analytics.solicitar(motivo)
+        return True
+
+    def atualizar_snapshots(self) -> bool:
+        """
+        Enfileira a geração dos snapshots desatualizados (pedidos pendentes são coalescidos).
+        """
+        return self.snapshots.disparar()
+
+    def cadastrar_ativo(self, ticker: str, periodos: str = '5Y') -> int:
+        """
+        Enfileira o cadastro do ativo (validação, depois backfill e analytics) na fila persistente.
+        Returns:
+            int: Id do job de validação.
+        """
+        return self.jobs.enfileirar('validar', ticker, {'periodos': periodos})
+
+    def importar_ativos(self, tickers: list, periodos: str = '5Y') -> dict:
+        """
+        Valida em lote e cadastra vários ativos; os backfills vão para a fila de jobs em lotes.
+        """
+        return importar_ativos(tickers, periodos, enfileirar=self.jobs.enfileirar)
+
+    def remover_ativos(self, tickers: list) -> int:
+        """
+        Remove os ativos (em cascata) e pede o recálculo do analytics.
+        """
+        removidos = remover_ativos(tickers)
+        remover_snapshots(tickers)
+        if removidos:
+            self.atualizar_analytics(f'remoção de {removidos} ativo(s)')
+        return removidos
+
+    def estado(self) -> list:
+        return [s.estado() for s in (self.lideranca, self.precos, self.historicos, self.analytics, self.snapshots, self.intraday, self.jobs, self.metricas)]
+
+
+_gerenciador = None
+_gerenciador_lock = threading.Lock()
+
+
+def iniciar_servicos(intervalo_precos: int = 60) -> GerenciadorServicos:
+    """
+    Retorna o gerenciador de serviços do processo, criando e iniciando-o na primeira chamada.
+    """
+    global _gerenciador
+    with _gerenciador_lock:
+        if _gerenciador is None:
+            _gerenciador = GerenciadorServicos(intervalo_precos)
+        _gerenciador.iniciar()
+        return _gerenciador
@@ -0,0 +1,245 @@
+"""
+single_flight.py
+----------------
+Coalescência de requisições ("single-flight"): chamadas concorrentes com a mesma chave
+compartilham uma única execução em andamento e o seu resultado. Entre threads usa um
+registro em memória; opcionalmente, entre processos, usa uma trava de arquivo e um
+arquivo de resultado (JSON) para que um processo reaproveite a busca concluída por outro.
+Os arquivos ficam em um diretório privado (0o700, do usuário do processo) ao lado do banco;
+os que não são usados há mais de `VALIDADE_ARQUIVOS` segundos são apagados periodicamente.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import threading
+import time
+
+from assets.database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DIRETORIO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(engine.url.database)), 'singleflight')
+# Arquivos de trava/resultado sem uso há mais que isso são apagados (no máximo a cada INTERVALO_PODA)
+VALIDADE_ARQUIVOS = float(os.environ.get('SINGLEFLIGHT_VALIDADE', 24 * 3600))
+INTERVALO_PODA = 600
+
+
+def _preparar_diretorio(diretorio: str) -> bool:
+    """
+    Cria o diretório com permissão 0o700 e confere que é um diretório de verdade (não um link),
+    do usuário do processo e sem acesso para outros usuários.
+    Returns:
+        bool: False se o diretório não puder ser usado com segurança.
+    """
+    try:
+        os.makedirs(diretorio, mode=0o700, exist_ok=True)
+        info = os.lstat(diretorio)
+        if not stat.S_ISDIR(info.st_mode):
+            print(f"[single_flight] {diretorio} não é um diretório.")
+            return False
+        if hasattr(os, 'getuid'):
+            if info.st_uid != os.getuid():
+                print(f"[single_flight] {diretorio} pertence a outro usuário.")
+                return False
+            if info.st_mode & 0o077:
+                print(f"[single_flight] {diretorio} é acessível por outros usuários (permissão {oct(info.st_mode & 0o777)}).")
+                return False
+        return True
+    except OSError as e:
+        print(f"[single_flight] Não foi possível preparar {diretorio}: {e}")
+        return False
+
+
+class _TravaArquivo:
+    """
+    Trava exclusiva entre processos baseada em arquivo (fcntl no POSIX, msvcrt no Windows).
+    """
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def __enter__(self):
+        self._arquivo = open(self.caminho, 'a+b')
+        if fcntl is not None:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    self._arquivo.seek(0)
+                    msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+        # Marca o uso: travas em uso nunca parecem antigas para a poda
+        os.utime(self.caminho)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+            else:
+                self._arquivo.seek(0)
+                msvcrt.locking(self._arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._arquivo.close()
+        return False
+
+
+class _Chamada:
+    """
+    Execução em andamento para uma chave.
+    """
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class SingleFlight:
+    """
+    Grupo de coalescência: `executar(chave, fn, ...)` roda `fn` uma única vez por chave em
+    andamento; as demais chamadas com a mesma chave aguardam e recebem o mesmo resultado (ou erro).
+    """
+
+    def __init__(self, nome: str, entre_processos: bool = False, diretorio: str = None, validade: float = VALIDADE_ARQUIVOS):
+        """
+        Args:
+            nome (str): Nome do grupo (prefixo dos arquivos de trava).
+            entre_processos (bool): Coalesce também entre processos via trava de arquivo.
+            diretorio (str, opcional): Diretório das travas e resultados (padrão: `singleflight` ao lado do banco).
+                Se não for seguro (de outro usuário, por exemplo), a coalescência fica só entre threads.
+            validade (float): Segundos sem uso após os quais os arquivos do grupo são apagados.
+        """
+        self.nome = nome
+        self.entre_processos = entre_processos
+        self.diretorio = diretorio or DIRETORIO_PADRAO
+        self.validade = validade
+        self.executadas = 0
+        self.compartilhadas = 0
+        self._ultima_poda = None
+        self._chamadas = {}
+        self._lock = threading.Lock()
+        if entre_processos and not _preparar_diretorio(self.diretorio):
+            self.entre_processos = False
+
+    def executar(self, chave, fn, *args, **kwargs):
+        """
+        Executa `fn(*args, **kwargs)` coalescendo chamadas concorrentes com a mesma chave.
+        Returns:
+            Resultado de `fn` (da execução própria ou da compartilhada).
+        """
+        with self._lock:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = _Chamada()
+                self._chamadas[chave] = chamada
+            else:
+                self.compartilhadas += 1
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+        try:
+            chamada.resultado = self._executar_lider(chave, fn, args, kwargs)
+            return chamada.resultado
+        except Exception as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._chamadas[chave]
+            chamada.evento.set()
+
+    def em_andamento(self) -> list:
+        """
+        Retorna as chaves com execução em andamento neste processo.
+        """
+        with self._lock:
+            return list(self._chamadas)
+
+    def _caminho(self, chave) -> str:
+        resumo = hashlib.sha1(repr(chave).encode('utf-8')).hexdigest()
+        return os.path.join(self.diretorio, f'{self.nome}-{resumo}')
+
+    def _executar_lider(self, chave, fn, args, kwargs):
+        if not self.entre_processos:
+            with self._lock:
+                self.executadas += 1
+            return fn(*args, **kwargs)
+        caminho = self._caminho(chave)
+        inicio = time.time()
+        with _TravaArquivo(caminho + '.lock'):
+            self._podar()
+            # Outro processo concluiu a mesma busca enquanto aguardávamos a trava
+            encontrado, resultado = self._ler_resultado(caminho, inicio)
+            if encontrado:
+                with self._lock:
+                    self.compartilhadas += 1
+                return resultado
+            with self._lock:
+                self.executadas += 1
+            resultado = fn(*args, **kwargs)
+            self._gravar_resultado(caminho, resultado)
+            return resultado
+
+    def _podar(self) -> None:
+        """
+        Apaga os arquivos de trava e de resultado do grupo sem uso há mais de `validade` segundos.
+        Resultados antigos nunca seriam lidos (ver `_ler_resultado`), e travas são tocadas a cada
+        aquisição, então uma trava antiga não está em uso.
+        """
+        agora = time.monotonic()
+        with self._lock:
+            if self._ultima_poda is not None and agora - self._ultima_poda < INTERVALO_PODA:
+                return
+            self._ultima_poda = agora
+        limite = time.time() - self.validade
+        apagados = 0
+        try:
+            with os.scandir(self.diretorio) as entradas:
+                for entrada in entradas:
+                    if not entrada.name.startswith(f'{self.nome}-'):
+                        continue
+                    try:
+                        if entrada.stat(follow_symlinks=False).st_mtime < limite:
+                            os.remove(entrada.path)
+                            apagados += 1
+                    except OSError:
+                        pass
+        except OSError as e:
+            print(f"[single_flight] Não foi possível podar {self.diretorio}: {e}")
+            return
+        if apagados:
+            print(f"[single_flight] {apagados} arquivo(s) antigo(s) de '{self.nome}' apagado(s).")
+
+    @staticmethod
+    def _ler_resultado(caminho: str, desde: float):
+        try:
+            if os.path.getmtime(caminho) < desde:
+                return False, None
+            with open(caminho, encoding='utf-8') as f:
+                return True, json.load(f)
+        except (OSError, ValueError):
+            return False, None
+
+    @staticmethod
+    def _gravar_resultado(caminho: str, resultado) -> None:
+        try:
+            conteudo = json.dumps(resultado)
+            temporario = f'{caminho}.{os.getpid()}.tmp'
+            with open(temporario, 'w', encoding='utf-8') as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[single_flight] Não foi possível gravar o resultado compartilhado: {e}")
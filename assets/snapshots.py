@@ -0,0 +1,185 @@
+"""
+snapshots.py
+------------
+Snapshots pré-computados do dashboard, gravados após cada ingestão ou atualização do analytics.
+Para cada ticker e período há um artefato (JSON compactado com gzip) com o histórico da janela
+em arrays compactos e as figuras das abas exibidas inicialmente; os destaques têm um artefato
+próprio. Os arquivos são versionados pela versão dos dados (tabela `versoes_dados`) no nome,
+gravados de forma atômica, e o app renderiza a partir deles quando estão atualizados: a
+primeira pintura após um reinício é a leitura de um arquivo. Artefatos desatualizados são
+ignorados e o app recalcula normalmente.
+"""
+
+import datetime
+import glob
+import gzip
+import json
+import os
+import re
+import unicodedata
+
+import pandas as pd
+
+from assets.charts import ABAS_PRECO, figura_preco, figura_retorno_acumulado
+from assets.data_cache import carregar_analytics, carregar_historico, carregar_tickers, versoes
+from assets.database import chave_historico
+from assets.metrics import cronometrado
+
+DIRETORIO_SNAPSHOTS = os.environ.get('SNAPSHOTS_DIR', 'snapshots')
+
+# Janela de histórico por período do filtro (None = todo o histórico, como no app)
+PERIODOS = {
+    "1 mês": 30,
+    "3 meses": 90,
+    "6 meses": 180,
+    "1 ano": 365,
+    "5 anos": None,
+}
+
+# Abas exibidas ao abrir o dashboard, cujas figuras vão prontas no artefato
+ABA_PRECO_INICIAL = list(ABAS_PRECO)[0]
+ABA_ANALISE_INICIAL = "Retorno Acumulado"
+
+COLUNAS_HISTORICO = ["Data", "Abertura", "Fechamento", "Máximo", "Mínimo", "Volume"]
+
+
+def _nome_seguro(texto: str) -> str:
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^0-9A-Za-z._-]', '_', texto)
+
+
+def _caminho_ativo(ticker: str, periodo: str, versao: int, data_referencia: datetime.date) -> str:
+    # A data entra no nome porque as janelas são relativas a hoje
+    return os.path.join(
+        DIRETORIO_SNAPSHOTS, _nome_seguro(ticker),
+        f'{_nome_seguro(periodo)}-v{versao}-{data_referencia.isoformat()}.json.gz'
+    )
+
+
+def _caminho_destaques(versao: int) -> str:
+    return os.path.join(DIRETORIO_SNAPSHOTS, f'destaques-v{versao}.json.gz')
+
+
+def _gravar(caminho: str, dados: dict, padrao_antigos: str) -> None:
+    """
+    Grava o artefato de forma atômica e remove as versões anteriores do mesmo artefato.
+    """
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with gzip.open(temporario, 'wt', encoding='utf-8') as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)
+    for antigo in glob.glob(padrao_antigos):
+        if antigo != caminho:
+            try:
+                os.remove(antigo)
+            except OSError:
+                pass
+
+
+def _ler(caminho: str):
+    try:
+        with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def gerar_snapshot_ativo(ticker: str, periodo: str, versoes_atuais: dict) -> bool:
+    """
+    Gera o artefato do ticker/período, se ainda não existir para a versão atual.
+    Returns:
+        bool: True se um novo artefato foi gravado.
+    """
+    versao = versoes_atuais.get(chave_historico(ticker), 0)
+    hoje = datetime.date.today()
+    caminho = _caminho_ativo(ticker, periodo, versao, hoje)
+    if os.path.exists(caminho):
+        return False
+    df = carregar_historico(ticker, PERIODOS[periodo], versoes_atuais)
+    figuras = {}
+    if not df.empty:
+        figuras[ABA_PRECO_INICIAL] = figura_preco(df, ABA_PRECO_INICIAL).to_json()
+        figuras[ABA_ANALISE_INICIAL] = figura_retorno_acumulado(df).to_json()
+    historico = {c: df[c].tolist() for c in COLUNAS_HISTORICO[1:]}
+    historico["Data"] = [d.isoformat() for d in df["Data"]]
+    _gravar(caminho, {
+        'ticker': ticker,
+        'periodo': periodo,
+        'versao_historico': versao,
+        'data_referencia': hoje.isoformat(),
+        'gerado_em': datetime.datetime.now().isoformat(),
+        'historico': historico,
+        'figuras': figuras,
+    }, os.path.join(os.path.dirname(caminho), f'{_nome_seguro(periodo)}-v*.json.gz'))
+    return True
+
+
+def gerar_snapshot_destaques(versoes_atuais: dict) -> bool:
+    versao = versoes_atuais.get('analytics', 0)
+    caminho = _caminho_destaques(versao)
+    if os.path.exists(caminho):
+        return False
+    _gravar(caminho, carregar_analytics(versoes_atuais), os.path.join(DIRETORIO_SNAPSHOTS, 'destaques-v*.json.gz'))
+    return True
+
+
+@cronometrado('snapshots')
+def atualizar_snapshots(tickers: list = None) -> int:
+    """
+    Etapa de snapshot: gera os artefatos desatualizados dos destaques e de cada ticker/período.
+    Chamada após cada ingestão de históricos ou atualização do analytics.
+    Returns:
+        int: Número de artefatos gravados.
+    """
+    versoes_atuais = versoes()
+    gravados = 0
+    try:
+        gravados += gerar_snapshot_destaques(versoes_atuais)
+        for ticker in tickers or carregar_tickers(versoes_atuais):
+            for periodo in PERIODOS:
+                gravados += gerar_snapshot_ativo(ticker, periodo, versoes_atuais)
+    except Exception as e:
+        print(f"[snapshots] Erro ao gerar snapshots: {e}")
+    if gravados:
+        print(f"[snapshots] {gravados} artefato(s) gravado(s).")
+    return gravados
+
+
+def ler_snapshot_ativo(ticker: str, periodo: str, versoes_atuais: dict):
+    """
+    Lê o artefato do ticker/período se estiver atualizado (mesma versão do histórico e gerado hoje).
+    Returns:
+        dict|None: {'historico': DataFrame, 'figuras': {aba: figura (dict)}} ou None se ausente/desatualizado.
+    """
+    if periodo not in PERIODOS:
+        return None
+    caminho = _caminho_ativo(ticker, periodo, versoes_atuais.get(chave_historico(ticker), 0), datetime.date.today())
+    dados = _ler(caminho)
+    if dados is None:
+        return None
+    df = pd.DataFrame(dados['historico'], columns=COLUNAS_HISTORICO)
+    df["Data"] = pd.to_datetime(df["Data"]).dt.date
+    return {
+        'historico': df,
+        'figuras': {aba: json.loads(fig) for aba, fig in dados['figuras'].items()},
+    }
+
+
+def ler_snapshot_destaques(versoes_atuais: dict):
+    """
+    Destaques do artefato da versão atual do analytics, ou None se ausente.
+    """
+    return _ler(_caminho_destaques(versoes_atuais.get('analytics', 0)))
+
+
+def remover_snapshots(tickers: list) -> None:
+    """
+    Remove os artefatos dos tickers (ex.: após a remoção dos ativos).
+    """
+    for ticker in tickers:
+        for caminho in glob.glob(os.path.join(DIRETORIO_SNAPSHOTS, _nome_seguro(ticker), '*.json.gz')):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
@@ -0,0 +1,281 @@
+"""
+source_health.py
+----------------
+Controle de saúde das fontes de dados (scraping do Yahoo Finance, yfinance).
+Registra latência e taxa de erro por fonte, abre o circuito quando a fonte falha,
+adapta os timeouts a partir dos percentis de latência observados e limita a taxa
+de requisições com um token bucket.
+"""
+
+import collections
+import datetime
+import threading
+import time
+
+# Estados do circuito
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+
+class TokenBucket:
+    """
+    Limitador de taxa por token bucket (thread-safe).
+    """
+
+    def __init__(self, taxa: float, capacidade: int):
+        """
+        Args:
+            taxa (float): Tokens repostos por segundo.
+            capacidade (int): Número máximo de tokens acumulados (rajada).
+        """
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self) -> None:
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def adquirir(self, timeout: float = None) -> bool:
+        """
+        Consome um token, aguardando até `timeout` segundos (None = aguarda indefinidamente).
+        Returns:
+            bool: True se o token foi obtido.
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._repor()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                espera = (1 - self._tokens) / self.taxa
+            if limite is not None:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return False
+                espera = min(espera, restante)
+            time.sleep(espera)
+
+    def disponiveis(self) -> float:
+        """
+        Retorna a quantidade de tokens disponíveis no momento.
+        """
+        with self._lock:
+            self._repor()
+            return self._tokens
+
+
+class SaudeFonte:
+    """
+    Saúde de uma fonte de dados: janela de latências/erros, circuit breaker,
+    timeout adaptativo e limitação de taxa.
+    """
+
+    def __init__(self, nome: str, janela: int = 50, limiar_erro: float = 0.5, minimo_chamadas: int = 5,
+                 falhas_consecutivas: int = 3, tempo_aberto: float = 60.0, timeout_padrao: float = 10.0,
+                 timeout_min: float = 2.0, timeout_max: float = 40.0, fator_timeout: float = 2.0,
+                 taxa: float = 1.0, capacidade: int = 5, espera_token: float = 5.0):
+        """
+        Args:
+            nome (str): Nome da fonte.
+            janela (int): Número de chamadas recentes consideradas.
+            limiar_erro (float): Taxa de erro na janela que abre o circuito.
+            minimo_chamadas (int): Mínimo de chamadas na janela para avaliar a taxa de erro.
+            falhas_consecutivas (int): Falhas seguidas que abrem o circuito.
+            tempo_aberto (float): Segundos com o circuito aberto antes de testar a fonte novamente.
+            timeout_padrao (float): Timeout usado enquanto não há latências suficientes.
+            timeout_min (float): Limite inferior do timeout adaptativo.
+            timeout_max (float): Limite superior do timeout adaptativo.
+            fator_timeout (float): Multiplicador aplicado ao p95 das latências.
+            taxa (float): Requisições por segundo permitidas.
+            capacidade (int): Rajada máxima de requisições.
+            espera_token (float): Tempo máximo aguardando um token antes de desistir da fonte.
+        """
+        self.nome = nome
+        self.limiar_erro = limiar_erro
+        self.minimo_chamadas = minimo_chamadas
+        self.falhas_consecutivas = falhas_consecutivas
+        self.tempo_aberto = tempo_aberto
+        self.timeout_padrao = timeout_padrao
+        self.timeout_min = timeout_min
+        self.timeout_max = timeout_max
+        self.fator_timeout = fator_timeout
+        self.espera_token = espera_token
+        self.bucket = TokenBucket(taxa, capacidade)
+        self._chamadas = collections.deque(maxlen=janela)  # (latencia, sucesso)
+        self._estado = FECHADO
+        self._aberto_em = None
+        self._falhas_seguidas = 0
+        self._sonda_em_andamento = False
+        self._ultimo_erro = None
+        self._ultima_chamada = None
+        self._lock = threading.Lock()
+
+    def permitir(self) -> bool:
+        """
+        Indica se uma chamada pode ser feita agora (circuito não aberto e token disponível).
+        No estado meio aberto, apenas uma chamada de teste é liberada por vez.
+        """
+        with self._lock:
+            if self._estado == ABERTO:
+                if time.monotonic() - self._aberto_em < self.tempo_aberto:
+                    return False
+                self._estado = MEIO_ABERTO
+                self._sonda_em_andamento = False
+            if self._estado == MEIO_ABERTO:
+                if self._sonda_em_andamento:
+                    return False
+                self._sonda_em_andamento = True
+        if not self.bucket.adquirir(timeout=self.espera_token):
+            with self._lock:
+                self._sonda_em_andamento = False
+            return False
+        return True
+
+    def registrar_sucesso(self, latencia: float) -> None:
+        """
+        Registra uma chamada bem-sucedida e fecha o circuito se estava em teste.
+        """
+        with self._lock:
+            self._chamadas.append((latencia, True))
+            self._falhas_seguidas = 0
+            self._ultima_chamada = datetime.datetime.now()
+            if self._estado != FECHADO:
+                self._estado = FECHADO
+                self._chamadas.clear()
+                self._chamadas.append((latencia, True))
+            self._sonda_em_andamento = False
+
+    def registrar_falha(self, latencia: float, erro: Exception = None) -> None:
+        """
+        Registra uma chamada com falha e abre o circuito se os limites forem atingidos.
+        """
+        with self._lock:
+            self._chamadas.append((latencia, False))
+            self._falhas_seguidas += 1
+            self._ultima_chamada = datetime.datetime.now()
+            self._ultimo_erro = repr(erro) if erro is not None else None
+            if self._estado == MEIO_ABERTO or self._deve_abrir():
+                if self._estado != ABERTO:
+                    print(f"[source_health] Circuito aberto para '{self.nome}': {self._ultimo_erro}")
+                self._estado = ABERTO
+                self._aberto_em = time.monotonic()
+            self._sonda_em_andamento = False
+
+    def liberar(self) -> None:
+        """
+        Devolve a chamada liberada por `permitir` sem registrar resultado (ex: falha local antes de
+        chegar à fonte). No estado meio aberto, libera a vaga da chamada de teste.
+        """
+        with self._lock:
+            self._sonda_em_andamento = False
+
+    def _deve_abrir(self) -> bool:
+        if self._falhas_seguidas >= self.falhas_consecutivas:
+            return True
+        if len(self._chamadas) < self.minimo_chamadas:
+            return False
+        return self._taxa_erro() >= self.limiar_erro
+
+    def _taxa_erro(self) -> float:
+        if not self._chamadas:
+            return 0.0
+        return sum(1 for _, ok in self._chamadas if not ok) / len(self._chamadas)
+
+    def _percentil(self, p: float) -> float:
+        latencias = sorted(lat for lat, ok in self._chamadas if ok)
+        if not latencias:
+            return None
+        idx = min(len(latencias) - 1, int(round(p / 100 * (len(latencias) - 1))))
+        return latencias[idx]
+
+    def timeout(self) -> float:
+        """
+        Timeout adaptativo: p95 das latências de sucesso vezes `fator_timeout`, limitado a [min, max].
+        """
+        with self._lock:
+            if sum(1 for _, ok in self._chamadas if ok) < self.minimo_chamadas:
+                return self.timeout_padrao
+            p95 = self._percentil(95)
+        return max(self.timeout_min, min(self.timeout_max, p95 * self.fator_timeout))
+
+    def estado(self) -> dict:
+        """
+        Retorna um resumo do estado da fonte para exibição.
+        """
+        timeout = self.timeout()
+        with self._lock:
+            return {
+                'fonte': self.nome,
+                'circuito': self._estado,
+                'chamadas': len(self._chamadas),
+                'taxa_erro': self._taxa_erro(),
+                'latencia_p50': self._percentil(50),
+                'latencia_p95': self._percentil(95),
+                'timeout': timeout,
+                'tokens': self.bucket.disponiveis(),
+                'ultimo_erro': self._ultimo_erro,
+                'ultima_chamada': self._ultima_chamada,
+            }
+
+
+class ControladorFontes:
+    """
+    Registro das fontes de dados monitoradas.
+    """
+
+    def __init__(self):
+        self._fontes = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nome: str, **config) -> SaudeFonte:
+        """
+        Registra (ou substitui) uma fonte com a configuração informada.
+        """
+        with self._lock:
+            self._fontes[nome] = SaudeFonte(nome, **config)
+            return self._fontes[nome]
+
+    def fonte(self, nome: str) -> SaudeFonte:
+        """
+        Retorna a fonte pelo nome, registrando-a com a configuração padrão se necessário.
+        """
+        with self._lock:
+            if nome not in self._fontes:
+                self._fontes[nome] = SaudeFonte(nome)
+            return self._fontes[nome]
+
+    def permitir(self, nome: str) -> bool:
+        return self.fonte(nome).permitir()
+
+    def registrar_sucesso(self, nome: str, latencia: float) -> None:
+        self.fonte(nome).registrar_sucesso(latencia)
+
+    def registrar_falha(self, nome: str, latencia: float, erro: Exception = None) -> None:
+        self.fonte(nome).registrar_falha(latencia, erro)
+
+    def liberar(self, nome: str) -> None:
+        self.fonte(nome).liberar()
+
+    def timeout(self, nome: str) -> float:
+        return self.fonte(nome).timeout()
+
+    def estado(self) -> list:
+        """
+        Retorna o estado de todas as fontes registradas.
+        """
+        with self._lock:
+            fontes = list(self._fontes.values())
+        return [f.estado() for f in fontes]
+
+
+# Controlador compartilhado pelo processo
+controlador_fontes = ControladorFontes()
+controlador_fontes.registrar('yahoo_cotacao', timeout_padrao=10.0, timeout_min=3.0, timeout_max=20.0, taxa=1.0, capacidade=5)
+controlador_fontes.registrar('yahoo_historico', timeout_padrao=40.0, timeout_min=5.0, timeout_max=40.0, taxa=0.5, capacidade=2, espera_token=30.0)
+controlador_fontes.registrar('yfinance', timeout_padrao=10.0, timeout_min=2.0, timeout_max=20.0, taxa=2.0, capacidade=10)
@@ -0,0 +1,396 @@
+"""
+yahoo_local.py
+--------------
+Substituto local do Yahoo Finance para testes e benchmarks sem rede.
+
+- Gravação: `gravar_fixtures` abre as páginas reais de cotação e de histórico com o Scraper
+  e grava o HTML renderizado (sem <script>), além das respostas do yfinance usadas no
+  fallback (`Ticker.info` e `download`), em `fixtures/yahoo/<ticker>/`.
+- Reprodução: `ServidorYahooLocal` serve as fixtures por HTTP nas mesmas rotas do Yahoo
+  (/quote/<ticker> e /quote/<ticker>/history/) e em /yfinance/..., com latência, erros e
+  limite de requisições configuráveis (sementes fixas, resultados reprodutíveis). Tickers
+  sem fixture podem ser servidos com dados sintéticos (`sinteticos=True`).
+
+O Scraper usa YAHOO_BASE_URL e o fallback usa YFINANCE_BASE_URL:
+    python -m assets.yahoo_local servir --porta 8503 --latencia 0.2 --taxa-erro 0.05 --sinteticos
+    YAHOO_BASE_URL=http://127.0.0.1:8503 YFINANCE_BASE_URL=http://127.0.0.1:8503/yfinance streamlit run streamlit_app.py
+
+    python -m assets.yahoo_local gravar --tickers BBDC4.SA ITUB4.SA --periodo 1Y
+"""
+
+import argparse
+import asyncio
+import datetime
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+import tornado.web
+
+DIRETORIO_FIXTURES = os.environ.get('FIXTURES_DIR', os.path.join('fixtures', 'yahoo'))
+
+ARQUIVO_COTACAO = 'cotacao.html'
+ARQUIVO_HISTORICO = 'historico.html'
+ARQUIVO_INFO = 'yfinance_info.json'
+ARQUIVO_DOWNLOAD = 'yfinance_download.json'
+
+
+def _diretorio_ticker(diretorio: str, ticker: str) -> str:
+    return os.path.join(diretorio, re.sub(r'[^0-9A-Za-z._-]', '_', ticker.upper()))
+
+
+def _sem_scripts(pagina: str) -> str:
+    # Sem os scripts a página gravada não busca nada na rede ao ser reproduzida
+    return re.sub(r'<script\b.*?</script>', '', pagina, flags=re.DOTALL | re.IGNORECASE)
+
+
+def gravar_fixtures(tickers: list, periodo: str = '1Y', diretorio: str = None, perfil: str = 'enxuto') -> None:
+    """
+    Grava as fixtures dos tickers a partir do Yahoo Finance real (requer rede e Chrome).
+    Args:
+        tickers (list): Tickers a gravar.
+        periodo (str): Período da página de histórico (ver Scraper.get_period_range).
+        diretorio (str, opcional): Destino (padrão: DIRETORIO_FIXTURES).
+        perfil (str): Perfil do navegador do Scraper.
+    """
+    import yfinance as yf
+    from assets.scrapping import Scraper
+
+    diretorio = diretorio or DIRETORIO_FIXTURES
+    scraper = Scraper(headless=True, perfil=perfil, base_url='https://finance.yahoo.com')
+    scraper.start_driver()
+    data_inicial, data_final = Scraper.get_period_range(periodo)
+    try:
+        for ticker in tickers:
+            destino = _diretorio_ticker(diretorio, ticker)
+            os.makedirs(destino, exist_ok=True)
+            scraper.scrape_stock(ticker)
+            with open(os.path.join(destino, ARQUIVO_COTACAO), 'w', encoding='utf-8') as f:
+                f.write(_sem_scripts(scraper.driver.page_source))
+            url = scraper._build_history_url(ticker, Scraper._date_to_str(data_inicial), Scraper._date_to_str(data_final))
+            scraper.driver.get(url)
+            scraper._aguardar_elemento('table tbody tr', scraper.timeouts['pagina'])
+            with open(os.path.join(destino, ARQUIVO_HISTORICO), 'w', encoding='utf-8') as f:
+                f.write(_sem_scripts(scraper.driver.page_source))
+            with open(os.path.join(destino, ARQUIVO_INFO), 'w', encoding='utf-8') as f:
+                json.dump(yf.Ticker(ticker).info, f, default=str)
+            df = yf.download(ticker, period='5d', interval='1d', auto_adjust=False, progress=False, multi_level_index=False)
+            with open(os.path.join(destino, ARQUIVO_DOWNLOAD), 'w', encoding='utf-8') as f:
+                json.dump(_colunas_download(df), f)
+            print(f"[yahoo_local] Fixtures de {ticker} gravadas em {destino}")
+    finally:
+        scraper.quit_driver()
+
+
+def _colunas_download(df: pd.DataFrame) -> dict:
+    df = df.reset_index()
+    df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    return {coluna: df[coluna].tolist() for coluna in ['Date', 'Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume'] if coluna in df}
+
+
+class DadosSinteticos:
+    """
+    Séries sintéticas determinísticas por ticker (passeio aleatório em dias úteis, com um
+    dividendo por trimestre), no mesmo formato das páginas e respostas reais.
+    """
+
+    def __init__(self, semente: int = 0):
+        self.semente = semente
+
+    def serie(self, ticker: str, inicio: datetime.date, fim: datetime.date) -> pd.DataFrame:
+        # A série inteira (de uma data fixa até hoje) é gerada e recortada, para que janelas diferentes
+        # (cotação, históricos de períodos distintos, yfinance) sejam consistentes entre si
+        datas = pd.bdate_range(datetime.date(2000, 1, 3), datetime.date.today())
+        # Semente estável por ticker (CRC32; a soma dos bytes daria a mesma série a anagramas)
+        rng = np.random.default_rng([self.semente, zlib.crc32(ticker.encode())])
+        fechamento = 20 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, len(datas))))
+        abertura = fechamento * (1 + rng.normal(0, 0.005, len(datas)))
+        df = pd.DataFrame({
+            'Date': datas.date,
+            'Open': abertura,
+            'High': np.maximum(abertura, fechamento) * 1.01,
+            'Low': np.minimum(abertura, fechamento) * 0.99,
+            'Close': fechamento,
+            'Volume': rng.integers(100_000, 10_000_000, len(datas)),
+        })
+        # Fechamento ajustado pelos dividendos posteriores a cada data (como o Adj Close do Yahoo)
+        dividendo = self.dividendos(df['Date'])
+        fator = np.where(dividendo, 1 - self.DIVIDENDO / np.roll(fechamento, 1), 1.0)
+        posteriores = np.cumprod(fator[::-1])[::-1]
+        df['AdjClose'] = fechamento * np.append(posteriores[1:], 1.0)
+        return df[(df['Date'] >= inicio) & (df['Date'] <= fim)].reset_index(drop=True)
+
+    DIVIDENDO = 0.25
+
+    @staticmethod
+    def dividendos(datas: pd.Series) -> np.ndarray:
+        # Um dividendo por trimestre: primeira segunda-feira de março, junho, setembro e dezembro
+        datas = pd.to_datetime(datas)
+        return ((datas.dt.month % 3 == 0) & (datas.dt.day <= 7) & (datas.dt.weekday == 0)).to_numpy()
+
+    def pagina_cotacao(self, ticker: str) -> str:
+        df = self.serie(ticker, datetime.date.today() - datetime.timedelta(days=7), datetime.date.today())
+        preco, anterior = df['Close'].iloc[-1], df['Close'].iloc[-2]
+        campos = {
+            'regularMarketPrice': f'{preco:,.2f}',
+            'regularMarketChange': f'{preco - anterior:+.2f}',
+            'regularMarketChangePercent': f'({(preco / anterior - 1) * 100:+.2f}%)',
+        }
+        spans = ''.join(
+            f'<fin-streamer data-symbol="{html.escape(ticker)}" data-field="{campo}">{valor}</fin-streamer>\n'
+            for campo, valor in campos.items()
+        )
+        return f'<html><head><title>{html.escape(ticker)}</title></head><body><section>{spans}</section></body></html>'
+
+    def pagina_historico(self, ticker: str, inicio: datetime.date, fim: datetime.date) -> str:
+        df = self.serie(ticker, inicio, fim)
+        linhas = []
+        dividendos = self.dividendos(df['Date'])
+        for linha, dividendo in zip(df.iloc[::-1].itertuples(index=False), dividendos[::-1]):
+            data = f"{linha.Date:%b} {linha.Date.day}, {linha.Date.year}"
+            if dividendo:
+                linhas.append(f'<tr><td>{data}</td> <td colspan="6"><span>{self.DIVIDENDO} Dividend</span></td></tr>')
+            valores = [f'{linha.Open:,.2f}', f'{linha.High:,.2f}', f'{linha.Low:,.2f}', f'{linha.Close:,.2f}', f'{linha.AdjClose:,.2f}', f'{linha.Volume:,}']
+            linhas.append('<tr><td>' + data + '</td> ' + ' '.join(f'<td>{v}</td>' for v in valores) + '</tr>')
+        return (
+            '<html><body><table><thead><tr><th>Date</th><th>Open</th><th>High</th><th>Low</th>'
+            '<th>Close</th><th>Adj Close</th><th>Volume</th></tr></thead><tbody>\n'
+            + '\n'.join(linhas) + '\n</tbody></table></body></html>'
+        )
+
+    def info(self, ticker: str) -> dict:
+        df = self.serie(ticker, datetime.date.today() - datetime.timedelta(days=7), datetime.date.today())
+        preco, anterior = float(df['Close'].iloc[-1]), float(df['Close'].iloc[-2])
+        return {
+            'symbol': ticker,
+            'regularMarketPrice': preco,
+            'previousClose': anterior,
+            'regularMarketChange': preco - anterior,
+            'regularMarketChangePercent': (preco / anterior - 1) * 100,
+        }
+
+    def download(self, ticker: str) -> dict:
+        df = self.serie(ticker, datetime.date.today() - datetime.timedelta(days=7), datetime.date.today())
+        return _colunas_download(df.rename(columns={'AdjClose': 'Adj Close'}).set_index('Date'))
+
+
+class ControleFalhas:
+    """
+    Latência, erros e limite de requisições por segundo injetados pelo servidor (determinísticos pela semente).
+    """
+
+    def __init__(self, latencia: float = 0.0, jitter: float = 0.0, taxa_erro: float = 0.0,
+                 limite_rps: float = None, semente: int = 0):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erro = taxa_erro
+        self.limite_rps = limite_rps
+        self._rng = random.Random(semente)
+        self._tokens = limite_rps or 0
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+        self.erros = 0
+        self.limitadas = 0
+
+    def decidir(self) -> tuple:
+        """
+        Returns:
+            tuple: (atraso em segundos, status HTTP de falha ou None)
+        """
+        with self._lock:
+            self.requisicoes += 1
+            atraso = self.latencia + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.limite_rps:
+                agora = time.monotonic()
+                self._tokens = min(self.limite_rps, self._tokens + (agora - self._ultimo) * self.limite_rps)
+                self._ultimo = agora
+                if self._tokens < 1:
+                    self.limitadas += 1
+                    return 0.0, 429
+                self._tokens -= 1
+            if self.taxa_erro and self._rng.random() < self.taxa_erro:
+                self.erros += 1
+                return atraso, 503
+            return atraso, None
+
+    def estado(self) -> dict:
+        return {'requisicoes': self.requisicoes, 'erros': self.erros, 'limitadas': self.limitadas}
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    """
+    Aplica o controle de falhas e localiza a fixture do ticker (ou os dados sintéticos).
+    """
+
+    def initialize(self, diretorio: str, falhas: ControleFalhas, sinteticos: DadosSinteticos):
+        self.diretorio = diretorio
+        self.falhas = falhas
+        self.sinteticos = sinteticos
+
+    async def prepare(self):
+        atraso, status = self.falhas.decidir()
+        if atraso:
+            await asyncio.sleep(atraso)
+        if status:
+            raise tornado.web.HTTPError(status)
+
+    def fixture(self, ticker: str, arquivo: str):
+        caminho = os.path.join(_diretorio_ticker(self.diretorio, ticker), arquivo)
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as f:
+                return f.read()
+        if self.sinteticos is None:
+            raise tornado.web.HTTPError(404, reason=f"Sem fixture para {ticker}")
+        return None
+
+    def periodo(self) -> tuple:
+        fim = datetime.date.today()
+        inicio = fim - datetime.timedelta(days=365)
+        period1, period2 = self.get_query_argument('period1', None), self.get_query_argument('period2', None)
+        if period1 and period2:
+            inicio, fim = datetime.date.fromtimestamp(int(period1)), datetime.date.fromtimestamp(int(period2))
+        return inicio, fim
+
+
+class CotacaoHandler(BaseHandler):
+    def get(self, ticker: str):
+        self.write(self.fixture(ticker, ARQUIVO_COTACAO) or self.sinteticos.pagina_cotacao(ticker))
+
+
+class HistoricoHandler(BaseHandler):
+    def get(self, ticker: str):
+        pagina = self.fixture(ticker, ARQUIVO_HISTORICO)
+        self.write(pagina or self.sinteticos.pagina_historico(ticker, *self.periodo()))
+
+
+class InfoHandler(BaseHandler):
+    def get(self, ticker: str):
+        self.set_header('Content-Type', 'application/json')
+        self.write(self.fixture(ticker, ARQUIVO_INFO) or json.dumps(self.sinteticos.info(ticker)))
+
+
+class DownloadHandler(BaseHandler):
+    def get(self):
+        tickers = [t for t in self.get_query_argument('tickers', '').split(',') if t]
+        resposta = {}
+        for ticker in tickers:
+            try:
+                conteudo = self.fixture(ticker, ARQUIVO_DOWNLOAD)
+            except tornado.web.HTTPError:
+                continue  # Como no yfinance, tickers sem dados ficam fora da resposta
+            resposta[ticker] = json.loads(conteudo) if conteudo else self.sinteticos.download(ticker)
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(resposta))
+
+
+def criar_app(diretorio: str = None, falhas: ControleFalhas = None, sinteticos: bool = False, semente: int = 0) -> tornado.web.Application:
+    parametros = {
+        'diretorio': diretorio or DIRETORIO_FIXTURES,
+        'falhas': falhas or ControleFalhas(),
+        'sinteticos': DadosSinteticos(semente) if sinteticos else None,
+    }
+    return tornado.web.Application([
+        (r'/quote/([^/]+)/history/?', HistoricoHandler, parametros),
+        (r'/quote/([^/]+)/?', CotacaoHandler, parametros),
+        (r'/yfinance/info/([^/]+)', InfoHandler, parametros),
+        (r'/yfinance/download', DownloadHandler, parametros),
+    ])
+
+
+class ServidorYahooLocal:
+    """
+    Servidor local em uma thread própria (para benchmarks e testes).
+
+    Uso:
+        servidor = ServidorYahooLocal(latencia=0.1, taxa_erro=0.05, sinteticos=True)
+        base_url = servidor.iniciar()   # http://127.0.0.1:<porta>
+        Scraper(base_url=base_url) ...
+        servidor.parar()
+    """
+
+    def __init__(self, porta: int = 0, diretorio: str = None, sinteticos: bool = False, semente: int = 0, **falhas):
+        self.porta = porta
+        self.diretorio = diretorio
+        self.sinteticos = sinteticos
+        self.semente = semente
+        self.falhas = ControleFalhas(semente=semente, **falhas)
+        self._loop = None
+        self._thread = None
+
+    def iniciar(self) -> str:
+        """
+        Returns:
+            str: URL base do servidor.
+        """
+        pronto = threading.Event()
+
+        def executar():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            app = criar_app(self.diretorio, self.falhas, self.sinteticos, self.semente)
+            servidor = app.listen(self.porta, address='127.0.0.1')
+            self.porta = next(iter(servidor._sockets.values())).getsockname()[1]
+            pronto.set()
+            self._loop.run_forever()
+            servidor.stop()
+
+        self._thread = threading.Thread(target=executar, name='yahoo-local', daemon=True)
+        self._thread.start()
+        pronto.wait()
+        return self.base_url
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.porta}'
+
+    def parar(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Substituto local do Yahoo Finance (gravação e reprodução de fixtures).")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+    gravar = subparsers.add_parser('gravar', help="Grava fixtures do Yahoo Finance real")
+    gravar.add_argument('--tickers', nargs='+', required=True)
+    gravar.add_argument('--periodo', default='1Y')
+    gravar.add_argument('--diretorio', default=None)
+    servir = subparsers.add_parser('servir', help="Serve as fixtures localmente")
+    servir.add_argument('--porta', type=int, default=8503)
+    servir.add_argument('--diretorio', default=None)
+    servir.add_argument('--sinteticos', action='store_true', help="Dados sintéticos para tickers sem fixture")
+    servir.add_argument('--latencia', type=float, default=0.0, help="Latência fixa (s) por requisição")
+    servir.add_argument('--jitter', type=float, default=0.0, help="Latência adicional aleatória máxima (s)")
+    servir.add_argument('--taxa-erro', type=float, default=0.0, help="Fração de respostas 503")
+    servir.add_argument('--limite-rps', type=float, default=None, help="Requisições/s acima das quais responde 429")
+    servir.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.comando == 'gravar':
+        gravar_fixtures(args.tickers, args.periodo, args.diretorio)
+        return
+    servidor = ServidorYahooLocal(
+        args.porta, args.diretorio, args.sinteticos, args.semente,
+        latencia=args.latencia, jitter=args.jitter, taxa_erro=args.taxa_erro, limite_rps=args.limite_rps,
+    )
+    print(f"[yahoo_local] Servindo em {servidor.iniciar()} (fixtures: {args.diretorio or DIRETORIO_FIXTURES})")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"[yahoo_local] {servidor.falhas.estado()}")
+    except KeyboardInterrupt:
+        servidor.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+bench_carga.py
+--------------
+Teste de carga do dashboard com várias sessões simuladas (streamlit.testing `AppTest`).
+Cada sessão abre o `streamlit_app.py` e faz reruns trocando de ativo, período e abas,
+contra um banco sintético (em um diretório temporário) e com as fontes externas
+substituídas por dados sintéticos: nenhum navegador é aberto e nada vai à rede.
+As sessões ficam abertas até o fim e interagem em rodízio no mesmo processo (o AppTest
+não suporta execuções simultâneas), compartilhando caches e serviços como no servidor.
+
+Relatório: vazão (reruns/s), percentis de latência por ação, latência das seções do
+dashboard (assets.metrics) e crescimento de threads e memória (RSS) com o número de
+sessões abertas. Grupos de threads (pelo nome) que crescem a cada sessão aberta, como um
+loop de preços por sessão, são apontados e fazem o script sair com código 1.
+
+Uso:
+    python benchmarks/bench_carga.py --sessoes 20 --tickers 50 --reruns 10
+"""
+
+import argparse
+import collections
+import datetime
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+PERIODOS = ["1 mês", "3 meses", "6 meses", "1 ano", "5 anos"]
+ACOES = ('ativo', 'periodo', 'aba_preco', 'aba_analise')
+
+
+def _rss_mb() -> float:
+    """
+    RSS (MB) do processo atual (somente Linux, via /proc), ou None se indisponível.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _percentis(valores: list) -> str:
+    if not valores:
+        return '-'
+    p50, p95, p99 = np.percentile(valores, [50, 95, 99]) * 1000
+    return f"p50 {p50:7.1f}ms | p95 {p95:7.1f}ms | p99 {p99:7.1f}ms | n={len(valores)}"
+
+
+def _grupos_threads() -> collections.Counter:
+    # Agrupa pelo nome sem o sufixo numérico (ex.: 'preco_3' -> 'preco', 'Thread-12 (alvo)' -> 'Thread (alvo)')
+    return collections.Counter(re.sub(r'[-_]?\d+', '', t.name) for t in threading.enumerate())
+
+
+def criar_banco_sintetico(n_tickers: int, anos: int, semente: int) -> list:
+    """
+    Cria o banco no diretório atual com `n_tickers` ativos e `anos` de pregões em passeio aleatório.
+    Returns:
+        list: Tickers criados.
+    """
+    from assets.database import atualizar_analytics_cache, chave_historico, criar_banco, engine, incrementar_versao, inserir_ativos, listar_ativos
+    from assets.models import Historico
+
+    criar_banco()
+    tickers = [f'SINT{i:03d}.SA' for i in range(n_tickers)]
+    inserir_ativos(tickers)
+    ids = {a.ticker: a.id for a in listar_ativos()}
+    datas = pd.bdate_range(end=datetime.date.today(), periods=anos * 252).date
+    rng = np.random.default_rng(semente)
+    with engine.begin() as conexao:
+        for ticker in tickers:
+            fechamento = 20 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, len(datas))))
+            abertura = fechamento * (1 + rng.normal(0, 0.005, len(datas)))
+            conexao.execute(Historico.__table__.insert(), [
+                {
+                    'ativo_id': ids[ticker], 'data': d, 'preco_abertura': a, 'preco_fechamento': f,
+                    'maximo': max(a, f) * 1.01, 'minimo': min(a, f) * 0.99, 'volume': float(v),
+                }
+                for d, a, f, v in zip(datas, abertura.tolist(), fechamento.tolist(), rng.integers(1e5, 1e7, len(datas)))
+            ])
+    incrementar_versao(*[chave_historico(t) for t in tickers])
+    atualizar_analytics_cache()
+    return tickers
+
+
+def substituir_fontes(latencia_preco: float) -> None:
+    """
+    Substitui Selenium/yfinance por dados sintéticos (nenhum navegador, nenhuma chamada de rede).
+    """
+    import assets.finance_utils as finance_utils
+    from assets.scrapping import Scraper
+
+    def buscar_preco(ticker):
+        time.sleep(latencia_preco)
+        return {'preco': random.uniform(10, 100), 'variacao': 0.0, 'variacao_percentual': 0.0}
+
+    def sem_navegador(self, *args, **kwargs):
+        raise RuntimeError("Navegador desabilitado no teste de carga")
+
+    finance_utils.buscar_preco_com_fallback = buscar_preco
+    Scraper.start_driver = sem_navegador
+    Scraper.coletar_e_salvar_historico_ativos = lambda self, *args, **kwargs: None
+
+
+class SessaoSimulada:
+    """
+    Uma sessão do dashboard (AppTest) que faz interações aleatórias.
+    """
+
+    def __init__(self, indice: int, tickers: list, semente: int, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.tickers = tickers
+        self.rng = random.Random(semente + indice)
+        self.at = AppTest.from_file(os.path.join(RAIZ, 'streamlit_app.py'), default_timeout=timeout)
+
+    def _medir(self, acao: str, executar) -> tuple:
+        inicio = time.perf_counter()
+        executar()
+        return acao, time.perf_counter() - inicio, len(self.at.exception)
+
+    def abrir(self) -> tuple:
+        return self._medir('inicial', self.at.run)
+
+    def interagir(self) -> tuple:
+        """
+        Troca o ativo, o período ou uma das abas e executa o rerun.
+        Returns:
+            tuple: (ação, segundos, exceções no rerun)
+        """
+        acao = self.rng.choice(ACOES)
+        if acao == 'ativo':
+            widget, valor = self.at.selectbox(key='ticker_sel'), self.rng.choice(self.tickers)
+        elif acao == 'periodo':
+            widget, valor = self.at.selectbox(key='periodo_sel'), self.rng.choice(PERIODOS)
+        else:
+            widget = self.at.radio(key=acao)
+            valor = self.rng.choice(widget.options)
+        return self._medir(acao, lambda: widget.set_value(valor).run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com sessões simuladas.")
+    parser.add_argument('--sessoes', type=int, default=20)
+    parser.add_argument('--tickers', type=int, default=50, help="Ativos no banco sintético")
+    parser.add_argument('--anos', type=int, default=5, help="Anos de histórico por ativo")
+    parser.add_argument('--reruns', type=int, default=10, help="Interações por sessão")
+    parser.add_argument('--latencia-preco', type=float, default=0.05, help="Latência (s) da busca de preço sintética")
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--limite-threads', type=float, default=0.5, help="Threads novas por sessão (por grupo de nome) acima das quais o teste falha")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    # Banco, snapshots, métricas e perfis do teste ficam no diretório temporário
+    diretorio = tempfile.mkdtemp(prefix='bench_carga_')
+    os.chdir(diretorio)
+    substituir_fontes(args.latencia_preco)
+    # Aviso esperado ao criar sessões do AppTest fora de um script
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').setLevel(logging.ERROR)
+    inicio = time.perf_counter()
+    tickers = criar_banco_sintetico(args.tickers, args.anos, args.semente)
+    print(f"Banco sintético: {len(tickers)} ativos x {args.anos} anos em {time.perf_counter() - inicio:.1f}s ({diretorio})")
+
+    from assets.metrics import metricas
+
+    threads_iniciais, rss_inicial = threading.active_count(), _rss_mb()
+    grupos_iniciais = _grupos_threads()
+    sessoes, amostras, medicoes = [], [], []
+    inicio = time.perf_counter()
+    # Sessões são abertas uma a uma e continuam conectadas; depois interagem em rodízio
+    for i in range(args.sessoes):
+        sessao = SessaoSimulada(i, tickers, args.semente, args.timeout)
+        medicoes.append(sessao.abrir())
+        sessoes.append(sessao)
+        amostras.append({'threads': threading.active_count(), 'rss_mb': _rss_mb(), 'grupos': _grupos_threads()})
+    for _ in range(args.reruns):
+        for sessao in sessoes:
+            medicoes.append(sessao.interagir())
+    duracao = time.perf_counter() - inicio
+
+    por_acao = collections.defaultdict(list)
+    for acao, segundos, _ in medicoes:
+        por_acao[acao].append(segundos)
+    excecoes = sum(n for _, _, n in medicoes)
+    print(f"\n{args.sessoes} sessões, {len(medicoes)} execuções em {duracao:.1f}s: {len(medicoes) / duracao:.2f} reruns/s; "
+          f"execuções com exceção: {excecoes}")
+    print(f"{'todas':>12} | {_percentis([s for _, s, _ in medicoes])}")
+    for acao in ('inicial',) + ACOES:
+        print(f"{acao:>12} | {_percentis(por_acao[acao])}")
+
+    print("\nSeções do dashboard (assets.metrics):")
+    for linha in metricas.resumo():
+        if linha['metrica'] in ('rerun_dashboard', 'secao_dashboard', 'fragmento_dashboard'):
+            print(f"  {linha['metrica']:>20} {linha['rotulos']:<32} p50 {linha['p50_ms']:7.1f}ms | p95 {linha['p95_ms']:7.1f}ms")
+
+    # Crescimento por sessão aberta: inclinação de threads/RSS pelo número de sessões
+    abertas = np.arange(1, len(amostras) + 1)
+    threads = np.array([a['threads'] for a in amostras])
+    rss = np.array([a['rss_mb'] or 0 for a in amostras])
+    inclinacao_threads = np.polyfit(abertas, threads, 1)[0] if len(amostras) > 1 else 0.0
+    inclinacao_rss = np.polyfit(abertas, rss, 1)[0] if len(amostras) > 1 else 0.0
+    print(f"\nThreads: {threads_iniciais} antes, {threads[0]} após a 1ª sessão, {threading.active_count()} ao final "
+          f"({inclinacao_threads:+.2f} por sessão)")
+    if rss_inicial:
+        print(f"Memória (RSS): {rss_inicial:.0f}MB antes, {rss[0]:.0f}MB após a 1ª sessão, {_rss_mb():.0f}MB ao final "
+              f"({inclinacao_rss:+.1f}MB por sessão)")
+    print(f"Threads criadas pelo app (1ª sessão): {dict(amostras[0]['grupos'] - grupos_iniciais) or 'nenhuma'}")
+    # Pools têm tamanho fixo; um grupo de threads que cresce a cada sessão aberta é vazamento
+    grupos = sorted({g for a in amostras for g in a['grupos']})
+    inclinacoes = {
+        g: np.polyfit(abertas, [a['grupos'].get(g, 0) for a in amostras], 1)[0] for g in grupos
+    } if len(amostras) > 1 else {}
+    acumulando = {g: round(float(i), 2) for g, i in inclinacoes.items() if i > args.limite_threads}
+    print(f"Threads criadas depois da 1ª sessão: {dict(_grupos_threads() - amostras[0]['grupos']) or 'nenhuma'}")
+    if acumulando:
+        print(f"\nFALHA: threads acumulando por sessão aberta (threads novas por sessão): {acumulando}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+bench_importacao.py
+-------------------
+Perfil de tempo de importação (estilo `python -X importtime`) dos módulos que o dashboard
+importa no início do script. Cada repetição roda em um processo novo (cold start do
+interpretador, com cache de bytecode) e o relatório mostra o tempo total, os pacotes de
+nível superior mais caros e se módulos pesados (Selenium, scikit-learn, yfinance, ...)
+foram carregados sem necessidade.
+
+Uso:
+    python benchmarks/bench_importacao.py --repeticoes 5 --top 15
+    python benchmarks/bench_importacao.py --modulos assets.finance_utils assets.scrapping
+"""
+
+import argparse
+import ast
+import collections
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que só devem ser carregados nos caminhos que os usam
+MODULOS_PESADOS = (
+    'selenium', 'webdriver_manager', 'yfinance', 'sklearn', 'plotly.express', 'plotly.figure_factory',
+)
+
+_LINHA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def modulos_do_app(caminho: str = os.path.join(RAIZ, 'streamlit_app.py')) -> list:
+    """
+    Lista os módulos importados no nível superior do script do dashboard.
+    """
+    with open(caminho, encoding='utf-8') as f:
+        arvore = ast.parse(f.read())
+    modulos = []
+    for no in arvore.body:
+        if isinstance(no, ast.Import):
+            modulos.extend(a.name for a in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            modulos.append(no.module)
+    return list(dict.fromkeys(modulos))
+
+
+def medir(modulos: list) -> dict:
+    """
+    Importa os módulos em um processo novo com `-X importtime`.
+    Returns:
+        dict: {'total_us', 'pacotes': {pacote: cumulativo_us}, 'pesados': [módulos pesados carregados]}
+    """
+    codigo = (
+        'import sys, json\n'
+        + ''.join(f'import {m}\n' for m in modulos)
+        + f'print(json.dumps([m for m in {MODULOS_PESADOS!r} if m in sys.modules]))\n'
+    )
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    pacotes = collections.Counter()
+    for linha in processo.stderr.splitlines():
+        m = _LINHA_IMPORTTIME.match(linha)
+        # Sem recuo = importado diretamente (não por outro módulo): o cumulativo já inclui as dependências
+        if m and len(m.group(3)) == 1:
+            pacotes[m.group(4).split('.')[0]] += int(m.group(2))
+    return {
+        'total_us': sum(pacotes.values()),
+        'pacotes': pacotes,
+        'pesados': json.loads(processo.stdout.strip().splitlines()[-1]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil de tempo de importação do dashboard.")
+    parser.add_argument('--modulos', nargs='+', default=None, help="Módulos a importar (padrão: os do streamlit_app.py)")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    modulos = args.modulos or modulos_do_app()
+    medicoes = [medir(modulos) for _ in range(args.repeticoes)]
+    totais = [m['total_us'] / 1e6 for m in medicoes]
+    print(f"Módulos: {', '.join(modulos)}")
+    print(f"Tempo de importação: p50 {statistics.median(totais):.3f}s | mín {min(totais):.3f}s | máx {max(totais):.3f}s")
+    print()
+    print(f"{'pacote':>24} | {'cumulativo p50 (ms)':>20}")
+    pacotes = {p for m in medicoes for p in m['pacotes']}
+    medianas = {p: statistics.median(m['pacotes'].get(p, 0) for m in medicoes) / 1000 for p in pacotes}
+    for pacote, ms in sorted(medianas.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"{pacote:>24} | {ms:>20.1f}")
+    pesados = sorted({p for m in medicoes for p in m['pesados']})
+    print()
+    print(f"Módulos pesados carregados: {', '.join(pesados) if pesados else 'nenhum'}")
+
+
+if __name__ == '__main__':
+    main()
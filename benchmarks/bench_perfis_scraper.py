@@ -0,0 +1,128 @@
+"""
+bench_perfis_scraper.py
+-----------------------
+Benchmark comparando os perfis de navegador do Scraper ('padrao' x 'enxuto').
+Mede a latência de carregamento das páginas de cotação e de histórico e o RSS
+do processo do chromedriver e de todos os processos do Chrome filhos dele.
+
+Com --local, as páginas vêm do substituto local do Yahoo (assets.yahoo_local: fixtures
+gravadas ou dados sintéticos), sem rede e com latência/erros controlados.
+
+Uso:
+    python benchmarks/bench_perfis_scraper.py --tickers BBDC4.SA ITUB4.SA --repeticoes 3
+    python benchmarks/bench_perfis_scraper.py --local --latencia 0.2 --taxa-erro 0.05
+"""
+
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assets.scrapping import Scraper
+from assets.yahoo_local import ServidorYahooLocal
+
+
+def _filhos(pid: int) -> list:
+    """
+    Retorna recursivamente os PIDs filhos de um processo (somente Linux, via /proc).
+    """
+    filhos = []
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            diretos = [int(p) for p in f.read().split()]
+    except OSError:
+        return filhos
+    for filho in diretos:
+        filhos.append(filho)
+        filhos.extend(_filhos(filho))
+    return filhos
+
+
+def _rss_mb(pid: int) -> float:
+    """
+    Retorna o RSS (MB) de um processo e de todos os seus filhos, ou None se indisponível.
+    """
+    total_kb = 0
+    for p in [pid] + _filhos(pid):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for linha in f:
+                    if linha.startswith('VmRSS:'):
+                        total_kb += int(linha.split()[1])
+                        break
+        except OSError:
+            continue
+    return total_kb / 1024 if total_kb else None
+
+
+def medir_perfil(perfil: str, tickers: list, repeticoes: int, base_url: str = None) -> dict:
+    """
+    Executa as coletas de cotação e histórico com o perfil informado e retorna as métricas.
+    """
+    scraper = Scraper(headless=True, perfil=perfil, base_url=base_url)
+    inicio = time.perf_counter()
+    scraper.start_driver()
+    inicializacao = time.perf_counter() - inicio
+    hoje = datetime.date.today()
+    data_inicial, data_final = Scraper.get_period_range('1Y', hoje)
+    lat_cotacao, lat_historico, rss = [], [], []
+    try:
+        for _ in range(repeticoes):
+            for ticker in tickers:
+                inicio = time.perf_counter()
+                scraper.scrape_stock(ticker)
+                lat_cotacao.append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                scraper.scrape_historical_data(
+                    ticker,
+                    data_inicial=Scraper._date_to_str(data_inicial),
+                    data_final=Scraper._date_to_str(data_final)
+                )
+                lat_historico.append(time.perf_counter() - inicio)
+                valor = _rss_mb(scraper.driver.service.process.pid)
+                if valor is not None:
+                    rss.append(valor)
+    finally:
+        scraper.quit_driver()
+    return {
+        'perfil': perfil,
+        'inicializacao_s': inicializacao,
+        'cotacao_p50_s': statistics.median(lat_cotacao),
+        'cotacao_max_s': max(lat_cotacao),
+        'historico_p50_s': statistics.median(lat_historico),
+        'historico_max_s': max(lat_historico),
+        'rss_max_mb': max(rss) if rss else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos perfis de navegador do Scraper.")
+    parser.add_argument('--tickers', nargs='+', default=['BBDC4.SA', 'ITUB4.SA', 'AAPL'])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--perfis', nargs='+', default=list(Scraper.PERFIS))
+    parser.add_argument('--local', action='store_true', help="Usa o substituto local do Yahoo (fixtures ou sintéticos)")
+    parser.add_argument('--latencia', type=float, default=0.0, help="Latência (s) do substituto local")
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help="Fração de erros do substituto local")
+    args = parser.parse_args()
+
+    servidor = None
+    if args.local:
+        servidor = ServidorYahooLocal(sinteticos=True, latencia=args.latencia, taxa_erro=args.taxa_erro)
+        servidor.iniciar()
+    try:
+        resultados = [medir_perfil(p, args.tickers, args.repeticoes, servidor and servidor.base_url) for p in args.perfis]
+    finally:
+        if servidor:
+            servidor.parar()
+    colunas = list(resultados[0].keys())
+    print(' | '.join(f'{c:>16}' for c in colunas))
+    for r in resultados:
+        print(' | '.join(f'{v:>16.3f}' if isinstance(v, float) else f'{str(v):>16}' for v in r.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import datetime
+
+import pandas as pd
+
+from assets.ingestao import normalizar_historico
+
+
+def _bruto(**colunas):
+    linha = {'Date': 'Oct 7, 2025', 'Open': '10.00', 'High': '11.00', 'Low': '9.50',
+             'Close*': '10.50', 'Adj Close**': '10.40', 'Volume': '1,000'}
+    linha.update(colunas)
+    return pd.DataFrame([linha])
+
+
+def test_volume_com_ponto_de_milhar():
+    normalizado, rejeitadas = normalizar_historico(_bruto(Volume='1.234'))
+    assert rejeitadas.empty
+    assert normalizado.loc[0, 'volume'] == 1234
+
+
+def test_volume_e_precos_com_separadores():
+    normalizado, _ = normalizar_historico(_bruto(Volume='1.234.567', Open='1.234,56', High='1,300.00'))
+    linha = normalizado.iloc[0]
+    assert linha['data'] == datetime.date(2025, 10, 7)
+    assert linha['volume'] == 1234567
+    assert linha['preco_abertura'] == 1234.56
+    assert linha['maximo'] == 1300.0
+
+
+def test_ausencias_e_invalidos():
+    bruto = pd.concat([_bruto(Volume='N/A'), _bruto(Date='Oct 8, 2025', Open='abc')], ignore_index=True)
+    normalizado, rejeitadas = normalizar_historico(bruto)
+    assert normalizado.loc[0, 'volume'] is None
+    assert rejeitadas['motivo'].tolist() == ['Open inválido']
+
+
+def test_colunas_numericas():
+    bruto = _bruto()
+    bruto['Volume'] = [1234.0]
+    bruto['Open'] = [10.0]
+    normalizado, _ = normalizar_historico(bruto)
+    assert normalizado.loc[0, 'volume'] == 1234
+    assert normalizado.loc[0, 'preco_abertura'] == 10.0
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from assets.intraday import _agregar, _barras_de_cotacoes, _momentos_reais
+
+
+def _cotacoes(*pares):
+    return _barras_de_cotacoes(pd.DataFrame(
+        [{'ativo_id': 1, 'momento': pd.Timestamp(m), 'preco': p} for m, p in pares]
+    ))
+
+
+def _mesclar(existentes: pd.DataFrame, novas: pd.DataFrame) -> pd.DataFrame:
+    # Como em _gravar_barras: barras gravadas (momento = início) + barras das cotações novas
+    return _agregar(pd.concat([existentes, novas.rename(columns={'inicio': 'momento'})], ignore_index=True), '5min')
+
+
+def test_cotacao_atrasada_nao_vira_fechamento():
+    gravada = _agregar(_cotacoes(('2025-10-07 10:00:10', 1.0), ('2025-10-07 10:04:50', 4.0)), '5min')
+    atrasada = _agregar(_cotacoes(('2025-10-07 10:02:30', 100.0)), '5min')
+    barra = _mesclar(gravada.rename(columns={'inicio': 'momento'}), atrasada).iloc[0]
+    assert barra['abertura'] == 1.0
+    assert barra['fechamento'] == 4.0
+    assert barra['maximo'] == 100.0
+    assert barra['pontos'] == 3
+
+
+def test_cotacao_atrasada_anterior_vira_abertura_e_posterior_fechamento():
+    gravada = _agregar(_cotacoes(('2025-10-07 10:01:00', 2.0), ('2025-10-07 10:03:00', 3.0)), '5min')
+    atrasadas = _agregar(_cotacoes(('2025-10-07 10:00:05', 1.5), ('2025-10-07 10:04:59', 3.5)), '5min')
+    barra = _mesclar(gravada.rename(columns={'inicio': 'momento'}), atrasadas).iloc[0]
+    assert (barra['abertura'], barra['fechamento']) == (1.5, 3.5)
+
+
+def test_barra_sem_momentos_mantem_abertura_e_fechamento():
+    legada = _momentos_reais(pd.DataFrame([{
+        'ativo_id': 1, 'resolucao': '5min', 'momento': pd.Timestamp('2025-10-07 10:00'), 'abertura': 1.0,
+        'maximo': 4.0, 'minimo': 1.0, 'fechamento': 4.0, 'pontos': 2, 'primeiro_em': None, 'ultimo_em': None,
+    }]))
+    barra = _mesclar(legada, _agregar(_cotacoes(('2025-10-07 10:02:30', 100.0)), '5min')).iloc[0]
+    assert (barra['abertura'], barra['fechamento'], barra['maximo']) == (1.0, 4.0, 100.0)
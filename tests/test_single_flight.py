@@ -0,0 +1,21 @@
+import os
+import time
+
+from assets.single_flight import SingleFlight
+
+
+def test_poda_apaga_apenas_arquivos_antigos(tmp_path):
+    diretorio = tmp_path / 'singleflight'
+    voo = SingleFlight('teste', entre_processos=True, diretorio=str(diretorio), validade=60)
+    antigo = diretorio / 'teste-antigo'
+    outro_grupo = diretorio / 'outro-antigo'
+    for caminho in (antigo, outro_grupo):
+        caminho.write_text('{}')
+        os.utime(caminho, (time.time() - 120, time.time() - 120))
+
+    assert voo.executar('chave', lambda: 42) == 42
+
+    assert not antigo.exists()
+    assert outro_grupo.exists()
+    assert os.path.exists(voo._caminho('chave'))
+    assert os.path.exists(voo._caminho('chave') + '.lock')
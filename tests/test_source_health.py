@@ -0,0 +1,20 @@
+import time
+
+from assets.source_health import SaudeFonte
+
+
+def test_liberar_devolve_a_chamada_de_teste():
+    fonte = SaudeFonte('teste', falhas_consecutivas=1, tempo_aberto=0.05, taxa=1000, capacidade=10)
+    assert fonte.permitir()
+    fonte.registrar_falha(0.1, RuntimeError('falhou'))
+    assert fonte.estado()['circuito'] == 'aberto'
+    assert not fonte.permitir()
+
+    time.sleep(0.06)
+    assert fonte.permitir()  # chamada de teste do meio aberto
+    assert fonte.estado()['circuito'] == 'meio_aberto'
+    assert not fonte.permitir()
+
+    fonte.liberar()
+    assert fonte.permitir()
+    assert fonte.estado()['circuito'] == 'meio_aberto'